@@ -6,10 +6,11 @@ Provides REST API endpoints for batch job management and AI orchestration.
 
 import os
 import asyncio
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from typing import Dict, Any, List
 import logging
+import uuid
 from datetime import datetime
 
 from services.gemini_service import GeminiService, GeminiConfig
@@ -18,6 +19,12 @@ from services.human_approval_service import human_approval_service
 from services.universal_batch_service import UniversalBatchService, BatchRequest
 from services.batch_processor_service import batch_processor_service
 from services.playwright_service import playwright_service
+from services.job_store import job_store
+from services.browser_pool import browser_pool, warmup_enabled
+from services.shard_coordinator import shard_coordinator
+from services.event_loop import background_loop
+from services import metrics
+from services.profiler import lag_monitor_enabled, loop_monitor
 from websocket_service import websocket_service
 from utils.input_validation import InputValidator, ValidationError
 
@@ -35,6 +42,26 @@ CORS(app, origins=["*"])  # Allow all origins for development
 # Register blueprints
 from routes.automation import automation_bp
 app.register_blueprint(automation_bp)
+from routes.admin import admin_bp
+app.register_blueprint(admin_bp)
+
+
+def start_background_services():
+    """
+    Start the background work of a serving process
+
+    Called from the __main__ block and from gunicorn's post_worker_init hook
+    (gunicorn.conf.py), never at import: batch workers spawned by the worker
+    pool re-import this module and must not start any of it.
+    """
+    # Launch Chromium and open contexts now rather than on the first prompt
+    if warmup_enabled():
+        browser_pool.warm_in_background()
+    
+    # Watch the background event loop for callbacks that block it
+    if lag_monitor_enabled():
+        loop_monitor.start()
+
 
 # Initialize services
 gemini_config = GeminiConfig(
@@ -52,7 +79,7 @@ def get_orchestrator():
     """Get or create the global orchestrator instance"""
     global orchestrator
     if orchestrator is None:
-        if not gemini_config.api_key:
+        if gemini_config.requires_api_key and not gemini_config.api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         orchestrator = EnhancedAIOrchestrator(gemini_config)
         
@@ -67,10 +94,35 @@ def get_universal_batch_service():
     """Get or create the global universal batch service instance"""
     global universal_batch_service
     if universal_batch_service is None:
+        # The browser starts on first use, so status and list requests never launch one
         universal_batch_service = UniversalBatchService()
-        asyncio.run(universal_batch_service.initialize())
     return universal_batch_service
 
+LIST_QUERY_PARAMS = ('status', 'name', 'since', 'until', 'cursor', 'limit', 'fields')
+
+def parse_list_query() -> Dict[str, Any]:
+    """
+    Parse pagination, filter and projection query parameters
+    
+    ?status=running,paused&name=nightly&since=2025-01-01&until=2025-02-01
+    &cursor=<next_cursor>&limit=50&fields=id,name,status,progress
+    """
+    args = request.args
+    limit = args.get('limit', '50')
+    if not limit.isdigit():
+        raise ValueError('limit must be a positive integer')
+    
+    split = lambda value: [v.strip() for v in value.split(',') if v.strip()] if value else None
+    return {
+        'statuses': split(args.get('status')),
+        'name': args.get('name') or None,
+        'created_after': args.get('since') or None,
+        'created_before': args.get('until') or None,
+        'cursor': args.get('cursor') or None,
+        'limit': int(limit),
+        'fields': split(args.get('fields'))
+    }
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -140,10 +192,10 @@ def create_batch():
             prompt['text'] = InputValidator.sanitize_prompt_text(prompt['text'])
         
         orch = get_orchestrator()
-        batch_job = orch.create_batch_job(name, description, prompts)
+        batch_job = asyncio.run(orch.create_batch_job(name, description, prompts))
         
         return jsonify({
-            'job_id': batch_job.job_id,
+            'job_id': batch_job.id,
             'status': batch_job.status,
             'message': f'Batch job "{name}" created successfully'
         })
@@ -174,10 +226,13 @@ def get_batch_status(job_id: str):
     """Get the status of a batch job"""
     try:
         orch = get_orchestrator()
-        status_data = orch.get_job_status(job_id)
+        include_tasks = request.args.get('include_tasks', '').lower() in ('1', 'true')
+        status_data = asyncio.run(orch.get_job_status(job_id, include_tasks=include_tasks))
         
         return jsonify(status_data)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         logger.error(f"Error getting status for batch {job_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -187,7 +242,7 @@ def stop_batch(job_id: str):
     """Stop execution of a batch job"""
     try:
         orch = get_orchestrator()
-        result = orch.stop_job(job_id)
+        result = asyncio.run(orch.stop_job(job_id))
         
         return jsonify({
             'status': 'stopped',
@@ -242,7 +297,7 @@ def run_batch_combined():
         
         # Create batch request for universal service
         batch_request = BatchRequest(
-            batch_id=f'batch-{datetime.now().strftime("%Y%m%d-%H%M%S")}-{hash(name) % 10000}',
+            batch_id=f'batch-{uuid.uuid4()}',
             batch_name=name,
             target_url=batch_data.get('targetUrl', 'https://chat.openai.com'),
             prompts=prompts,
@@ -254,7 +309,7 @@ def run_batch_combined():
         
         # Use universal batch service
         universal_service = get_universal_batch_service()
-        result = asyncio.run(universal_service.start_batch(batch_request))
+        result = background_loop.submit(universal_service.start_batch(batch_request)).result()
         
         return jsonify({
             'job_id': batch_request.batch_id,
@@ -269,13 +324,25 @@ def run_batch_combined():
 
 @app.route('/api/batches', methods=['GET'])
 def list_batches():
-    """List all batch jobs"""
+    """
+    List batch jobs
+    
+    Without query parameters this returns the legacy {active_jobs, job_history}
+    payload. Any of status/name/since/until/cursor/limit/fields switches to a
+    paginated listing of job summaries (no task payloads) read straight from the
+    job store: {jobs: [...], next_cursor}.
+    """
     try:
+        if any(param in request.args for param in LIST_QUERY_PARAMS):
+            return jsonify(job_store.query_jobs(kind='enhanced', **parse_list_query()))
+        
         orch = get_orchestrator()
-        jobs_data = orch.list_jobs()
+        jobs_data = asyncio.run(orch.list_jobs())
         
         return jsonify(jobs_data)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error listing batches: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -287,7 +354,7 @@ def test_gemini():
         data = request.get_json() or {}
         prompt = data.get('prompt', 'Hello, this is a test prompt.')
         
-        if not gemini_config.api_key:
+        if gemini_config.requires_api_key and not gemini_config.api_key:
             return jsonify({
                 'success': False,
                 'error': 'GEMINI_API_KEY not configured'
@@ -350,7 +417,7 @@ def detect_platform():
             return jsonify({'error': 'URL is required'}), 400
         
         universal_service = get_universal_batch_service()
-        result = asyncio.run(universal_service.detect_platform(url))
+        result = background_loop.submit(universal_service.detect_platform(url)).result()
         
         return jsonify(result)
         
@@ -363,7 +430,7 @@ def pause_universal_batch(batch_id: str):
     """Pause an active universal batch"""
     try:
         universal_service = get_universal_batch_service()
-        result = asyncio.run(universal_service.pause_batch(batch_id))
+        result = background_loop.submit(universal_service.pause_batch(batch_id)).result()
         
         return jsonify(result)
         
@@ -376,7 +443,9 @@ def resume_universal_batch(batch_id: str):
     """Resume a paused universal batch"""
     try:
         universal_service = get_universal_batch_service()
-        result = asyncio.run(universal_service.resume_batch(batch_id))
+        result = background_loop.submit(universal_service.resume_batch(
+            batch_id, force=request.args.get('force', '').lower() in ('1', 'true')
+        )).result()
         
         return jsonify(result)
         
@@ -389,7 +458,7 @@ def cancel_universal_batch(batch_id: str):
     """Cancel an active universal batch"""
     try:
         universal_service = get_universal_batch_service()
-        result = asyncio.run(universal_service.cancel_batch(batch_id))
+        result = background_loop.submit(universal_service.cancel_batch(batch_id)).result()
         
         return jsonify(result)
         
@@ -425,27 +494,40 @@ def get_universal_batch_status(batch_id: str):
 
 @app.route('/api/universal/batches', methods=['GET'])
 def list_universal_batches():
-    """List all universal batches"""
+    """
+    List universal batches, newest first, one page at a time
+    
+    Supports the same status/name/since/until/cursor/limit/fields parameters
+    as /api/batches; follow next_cursor to fetch older batches.
+    """
     try:
-        universal_service = get_universal_batch_service()
-        batches = universal_service.get_all_batches()
-        
-        batch_list = []
-        for batch_id, status in batches.items():
-            batch_list.append({
-                'batch_id': status.batch_id,
-                'status': status.status,
-                'progress_percentage': status.progress_percentage,
-                'current_action': status.current_action,
-                'last_updated': status.last_updated
-            })
+        query = parse_list_query()
+        if not query['fields']:
+            query['fields'] = ['batch_id', 'status', 'progress_percentage', 'current_action', 'last_updated']
         
-        return jsonify({'batches': batch_list})
+        return jsonify(job_store.query_batches(kind='universal', **query))
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to list universal batches: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/cluster/status', methods=['GET'])
+def get_cluster_status():
+    """Live nodes, domain leases and routing stats as seen from this node"""
+    try:
+        return jsonify(shard_coordinator.get_status())
+        
+    except Exception as e:
+        logger.error(f"Failed to get cluster status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -464,4 +546,8 @@ if __name__ == '__main__':
     if not os.getenv('GEMINI_API_KEY'):
         logger.warning("GEMINI_API_KEY not set - some functionality may be limited")
     
+    # The debug reloader's parent only watches files; its child serves
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end batch throughput against the local simulated chat site
+
+Usage:
+    python benchmarks/bench_fake_platform.py [--platforms chatgpt,lovable.dev] [--drivers batch,universal,basic,enhanced]
+                                             [--prompts 20] [--delay lognormal:2:0.4] [--fail no_input=0.05]
+                                             [--llm-latency lognormal:0.6:0.3] [--llm-token-rate 80]
+                                             [--seed 1] [--save-baseline] [--tolerance 0.2]
+
+For every driver and platform, a fake_chat_site server is started on a free
+port and a batch of prompts is driven through it with a real browser:
+
+    batch       BatchProcessorService.process_batch
+    universal   UniversalBatchService.start_batch
+    basic       AIOrchestrator.run_batch_job
+    enhanced    EnhancedAIOrchestrator.run_batch_job (no human oversight)
+
+The orchestrators rewrite each prompt through the `standin` LLM backend,
+answered by an in-process fake_llm_server, so they run with no network.
+
+Reports prompts per minute and the p50/p99 per-prompt overhead: the
+prompt's navigate_and_submit trace duration minus the generation time the
+site recorded for it (LLM time is outside that trace). Results are compared with the stored baseline
+(benchmarks/baselines/fake_platform.json); a throughput drop or an overhead
+increase beyond --tolerance is a regression and exits with status 1.
+Needs Chromium (`playwright install chromium`); no network access.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep benchmark batches out of the real job store
+os.environ.setdefault('JOB_STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='bench-'), 'jobs.db'))
+os.environ.setdefault('BROWSER_WARMUP', 'false')
+
+from benchmarks.common import parse_failures, percentile  # noqa: E402
+from benchmarks.fake_chat_site import FAILURE_KINDS, FakeChatConfig, FakeChatSite  # noqa: E402
+from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines', 'fake_platform.json')
+
+DRIVERS = ('batch', 'universal', 'basic', 'enhanced')
+
+ORCHESTRATOR_DRIVERS = ('basic', 'enhanced')
+
+# Seconds between progress polls of a universal batch
+POLL_INTERVAL = 0.5
+
+
+async def drive_batch(url: str, prompts: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-prompt (text, status, trace) from BatchProcessorService"""
+    from services.batch_processor_service import BatchProcessorService
+
+    result = await BatchProcessorService().process_batch(f'bench-{uuid.uuid4().hex[:8]}', url, prompts, options)
+    return [
+        {'text': r['prompt_text'], 'status': r['status'], 'trace': (r.get('result') or {}).get('trace')}
+        for r in result.get('results', [])
+    ]
+
+
+async def drive_universal(url: str, prompts: List[Dict[str, Any]], options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-prompt (text, status, trace) from UniversalBatchService"""
+    from services.job_store import job_store
+    from services.universal_batch_service import BatchRequest, UniversalBatchService
+
+    service = UniversalBatchService()
+    batch_id = f'bench-{uuid.uuid4().hex[:8]}'
+    await service.start_batch(BatchRequest(
+        batch_id=batch_id, batch_name='benchmark', prompts=prompts, target_url=url,
+        platform_type='auto-detect', automation_mode='autonomous', options=options
+    ))
+    while batch_id in service.active_batches:
+        await asyncio.sleep(POLL_INTERVAL)
+    await service.cleanup()
+
+    records = job_store.get_prompt_results(batch_id, 0, len(prompts))['results']
+    return [
+        {'text': prompts[r['position']]['text'], 'status': r['status'], 'trace': r.get('trace')}
+        for r in records
+    ]
+
+
+async def drive_orchestrator(
+    driver: str, url: str, platform: str, prompts: List[Dict[str, Any]], llm_url: str
+) -> List[Dict[str, Any]]:
+    """Per-prompt (submitted text, status, trace) from one of the orchestrators"""
+    from services.gemini_service import GeminiConfig
+
+    config = GeminiConfig(api_key='', backend='standin', base_url=llm_url)
+    prompts = [{**p, 'platform': platform, 'target_url': url} for p in prompts]
+    if driver == 'basic':
+        from services.orchestrator_service import AIOrchestrator
+        orchestrator = AIOrchestrator(config)
+        job = await orchestrator.create_batch_job('benchmark', 'fake platform benchmark', prompts)
+    else:
+        from services.enhanced_orchestrator_service import EnhancedAIOrchestrator
+        orchestrator = EnhancedAIOrchestrator(config)
+        job = await orchestrator.create_batch_job(
+            'benchmark', 'fake platform benchmark', prompts, human_oversight_enabled=False
+        )
+    try:
+        await orchestrator.run_batch_job(job.id)
+    finally:
+        await orchestrator.playwright_service.cleanup()
+
+    outcomes = []
+    for task in job.tasks:
+        result = task.result or {}
+        outcomes.append({
+            # The site sees the LLM's rewrite, not the original prompt
+            'text': (result.get('gemini_response') or {}).get('response'),
+            'status': task.status,
+            'trace': find_span(result.get('trace'), 'navigate_and_submit'),
+        })
+    return outcomes
+
+
+def find_span(tree: Optional[Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+    """First span with the given name in a span tree, depth first"""
+    if not tree:
+        return None
+    if tree['name'] == name:
+        return tree
+    for child in tree.get('children', []):
+        found = find_span(child, name)
+        if found:
+            return found
+    return None
+
+
+async def run_case(driver: str, config: FakeChatConfig, count: int, llm_url: Optional[str] = None) -> Dict[str, Any]:
+    site = FakeChatSite(config).start()
+    run = uuid.uuid4().hex[:6]
+    prompts = [{'id': f'prompt_{i}', 'text': f'Benchmark prompt {i} of run {run}'} for i in range(count)]
+    options = {'wait_for_completion': True, 'max_retries': 1}
+    try:
+        started = time.perf_counter()
+        if driver == 'batch':
+            outcomes = await drive_batch(site.url, prompts, options)
+        elif driver == 'universal':
+            outcomes = await drive_universal(site.url, prompts, options)
+        else:
+            outcomes = await drive_orchestrator(driver, site.url, config.platform, prompts, llm_url)
+        elapsed = time.perf_counter() - started
+        generations = site.stats()['generations']
+    finally:
+        site.stop()
+
+    overheads = []
+    for outcome in outcomes:
+        generation = generations.get(outcome['text'])
+        if outcome['status'] != 'completed' or not outcome['trace'] or not generation:
+            continue
+        generated = generation['generation_seconds'] or 0
+        overheads.append(outcome['trace']['duration_ms'] - generated * 1000)
+
+    completed = sum(1 for o in outcomes if o['status'] == 'completed')
+    return {
+        'prompts': count,
+        'completed': completed,
+        'failed': count - completed,
+        'seconds': round(elapsed, 2),
+        'prompts_per_minute': round(completed / elapsed * 60, 2) if elapsed else 0.0,
+        'overhead_p50_ms': percentile(overheads, 50),
+        'overhead_p99_ms': percentile(overheads, 99),
+    }
+
+
+def regressions(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    found = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base.get('prompts_per_minute') and result['prompts_per_minute'] < base['prompts_per_minute'] * (1 - tolerance):
+            found.append(f"{key}: {result['prompts_per_minute']} prompts/min (baseline {base['prompts_per_minute']})")
+        for metric in ('overhead_p50_ms', 'overhead_p99_ms'):
+            if base.get(metric) and result[metric] is not None and result[metric] > base[metric] * (1 + tolerance):
+                found.append(f"{key}: {metric} {result[metric]:.0f} (baseline {base[metric]:.0f})")
+    return found
+
+
+def format_ms(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.0f}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--platforms', default='chatgpt,lovable.dev,v0.dev,claude.ai,generic')
+    parser.add_argument('--drivers', default=','.join(DRIVERS))
+    parser.add_argument('--prompts', type=int, default=20)
+    parser.add_argument('--delay', default='lognormal:2:0.4')
+    parser.add_argument('--fail', default='')
+    parser.add_argument('--llm-latency', default='lognormal:0.6:0.3')
+    parser.add_argument('--llm-token-rate', type=float, default=80.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    drivers = [d for d in args.drivers.split(',') if d]
+    unknown = set(drivers) - set(DRIVERS)
+    if unknown:
+        parser.error(f"unknown drivers: {', '.join(sorted(unknown))}")
+    failures = parse_failures(args.fail, FAILURE_KINDS)
+    llm = None
+    if set(drivers) & set(ORCHESTRATOR_DRIVERS):
+        llm = FakeLLMServer(FakeLLMConfig(args.llm_latency, args.llm_token_rate, seed=args.seed)).start()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'case':<28} {'ok':>4} {'fail':>4} {'prompts/min':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    for driver in drivers:
+        for platform in filter(None, args.platforms.split(',')):
+            config = FakeChatConfig(platform, args.delay, failures, args.seed)
+            key = f'{driver}/{platform}'
+            results[key] = result = asyncio.run(run_case(driver, config, args.prompts, llm and llm.url))
+            print(
+                f"{key:<28} {result['completed']:>4} {result['failed']:>4} {result['prompts_per_minute']:>12.2f} "
+                f"{format_ms(result['overhead_p50_ms']):>8} {format_ms(result['overhead_p99_ms']):>8}"
+            )
+    if llm:
+        llm.stop()
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'delay': args.delay, 'prompts': args.prompts, 'results': results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if (baseline.get('delay'), baseline.get('prompts')) != (args.delay, args.prompts):
+        print(f"Baseline was recorded with --delay {baseline.get('delay')} --prompts {baseline.get('prompts')}; comparing anyway")
+    found = regressions(results, baseline.get('results', {}), args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    if found:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the backend's pure-Python hot paths
+
+Usage:
+    python benchmarks/bench_hot_paths.py [-k broadcast] [--rounds 15] [--save] [--compare [PATH]]
+                                         [--tolerance 0.15]
+
+Each case builds a realistic fixture once, then times the call over several
+rounds, calibrating the iterations per round so that fast calls are not
+dominated by timer resolution. Cases with a per-round setup (validation with
+cold caches) run one iteration per round, with the setup outside the timing.
+
+    validation   validate_batch_data / sanitize_batch_data on 100 x 5000-char prompts
+    websocket    broadcast_to_channel to 10k subscribers (mock sockets, mixed encodings)
+    approvals    get_approval_stats over 100k decided approvals
+    jobs         get_job_status on a 5000-task enhanced job, with and without tasks
+    notify       _notify_websockets of a task_completed event and a 1000-task job
+
+--save writes the results, with the machine and commit, to
+benchmarks/results/. --compare reads a saved file (the newest one when no
+path is given) and exits with status 1 if a case's median is slower than
+the saved median by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Fixtures persist jobs; keep them out of the real job store
+os.environ.setdefault('JOB_STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='bench-'), 'jobs.db'))
+
+from benchmarks.bench_input_validation import clear_caches, make_batch  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Target duration of one timed round (seconds)
+MIN_ROUND_TIME = 0.05
+
+CASES: List['Case'] = []
+
+
+class Case:
+    def __init__(self, group: str, name: str, fixture: Callable[[], Dict[str, Any]]):
+        self.group = group
+        self.name = name
+        self.fixture = fixture
+
+    @property
+    def id(self) -> str:
+        return f'{self.group}/{self.name}'
+
+
+def bench(group: str, name: str):
+    """
+    Register a case; the decorated fixture returns {'run': callable, 'setup': optional callable}
+
+    Async callables are run to completion on a private event loop.
+    """
+    def register(fixture):
+        CASES.append(Case(group, name, fixture))
+        return fixture
+    return register
+
+
+# Fixtures
+
+def batch_payload(dirty: bool = False) -> Dict[str, Any]:
+    prompts = make_batch(100, 5000, dirty)
+    return {'batch': {
+        'name': 'Nightly regression prompts',
+        'description': 'Prompts replayed against every platform',
+        'platform': 'lovable',
+        'prompts': [{'id': f'prompt_{i}', 'text': text} for i, text in enumerate(prompts)],
+    }}
+
+
+@bench('validation', 'validate_batch_data[cold]')
+def validate_cold():
+    from utils.input_validation import InputValidator
+    data = batch_payload()
+    return {'run': lambda: InputValidator.validate_batch_data(data), 'setup': clear_caches}
+
+
+@bench('validation', 'validate_batch_data[cached]')
+def validate_cached():
+    from utils.input_validation import InputValidator
+    data = batch_payload()
+    return {'run': lambda: InputValidator.validate_batch_data(data)}
+
+
+@bench('validation', 'sanitize_batch_data[cold]')
+def sanitize_cold():
+    from utils.input_validation import InputValidator
+    data = batch_payload()
+    return {'run': lambda: InputValidator.sanitize_batch_data(data), 'setup': clear_caches}
+
+
+class MockSocket:
+    """Accepts frames without doing I/O"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, frame):
+        self.sent += 1
+
+
+@bench('websocket', 'broadcast_to_channel[10k]')
+def broadcast():
+    from websocket_service import WebSocketService
+    from utils.wire_format import ENCODING_JSON, ENCODING_MSGPACK, available_encodings
+    service = WebSocketService()
+    binary = ENCODING_MSGPACK in available_encodings()
+    for i in range(10_000):
+        socket = MockSocket()
+        service.clients.add(socket)
+        # Most clients follow the orchestrator; a tenth speak MessagePack
+        service.client_subscriptions[socket] = {'orchestrator'} if i % 4 else {'batches'}
+        service.client_encodings[socket] = ENCODING_MSGPACK if binary and i % 10 == 0 else ENCODING_JSON
+    message = {
+        'type': 'task_completed',
+        'data': {'job_id': 'job-1', 'task': {'id': 'job-1-task-7', 'status': 'completed', 'prompt': 'x' * 400}},
+        'timestamp': datetime.utcnow().isoformat(),
+    }
+    return {'run': lambda: service.broadcast_to_channel('orchestrator', dict(message))}
+
+
+@bench('approvals', 'get_approval_stats[100k]')
+def approval_stats():
+    from services.human_approval_service import (
+        ApprovalRequest, ApprovalStatus, ConfidenceLevel, HumanApprovalService
+    )
+    rng = random.Random(3)
+    service = HumanApprovalService()
+    started = datetime(2025, 1, 1)
+    statuses = (ApprovalStatus.APPROVED, ApprovalStatus.REJECTED, ApprovalStatus.TIMEOUT)
+    for i in range(100_000):
+        created = started + timedelta(seconds=i)
+        auto = rng.random() < 0.6
+        service.approval_history.append(ApprovalRequest(
+            id=f'approval-{i}', task_id=f'task-{i}', agent_id='enhanced-orchestrator',
+            action_type='execute_task', description='Execute task', context={},
+            confidence=rng.random(), confidence_level=ConfidenceLevel.MEDIUM,
+            status=ApprovalStatus.APPROVED if auto else rng.choice(statuses),
+            created_at=created.isoformat(),
+            responded_at=(created + timedelta(seconds=rng.uniform(0.5, 120))).isoformat(),
+            response_data={'auto_approved': True} if auto else {'reasoning': 'looks fine'},
+        ))
+    return {'run': service.get_approval_stats}
+
+
+def enhanced_job(tasks: int):
+    """An enhanced orchestrator holding one job with completed, failed and pending tasks"""
+    from services.enhanced_orchestrator_service import EnhancedAIOrchestrator
+    from services.gemini_service import GeminiConfig
+
+    # The stand-in backend is never called; it only avoids importing the Gemini SDK
+    orchestrator = EnhancedAIOrchestrator(GeminiConfig(api_key='', backend='standin'))
+    prompts = [{'text': f'Prompt {i}: ' + 'add a responsive pricing table ' * 20, 'platform': 'lovable'}
+               for i in range(tasks)]
+    job = asyncio.run(orchestrator.create_batch_job('benchmark', 'hot path benchmark', prompts))
+    for i, task in enumerate(job.tasks):
+        if i % 3 == 0:
+            continue
+        status = 'completed' if i % 3 == 1 else 'failed'
+        orchestrator._transition_task(job, task, 'processing')
+        if status == 'completed':
+            task.result = {'gemini_response': {'success': True, 'response': 'Create a pricing section. ' * 40}}
+        orchestrator._transition_task(job, task, status, error=None if status == 'completed' else 'Timeout')
+    return orchestrator, job
+
+
+@bench('jobs', 'get_job_status[5000]')
+def job_status():
+    orchestrator, job = enhanced_job(5000)
+    return {'run': lambda: orchestrator.get_job_status(job.id)}
+
+
+@bench('jobs', 'get_job_status[5000,tasks]')
+def job_status_tasks():
+    orchestrator, job = enhanced_job(5000)
+    return {'run': lambda: orchestrator.get_job_status(job.id, include_tasks=True)}
+
+
+def notifying_orchestrator(tasks: int):
+    from utils.wire_format import encode_message
+    orchestrator, job = enhanced_job(tasks)
+
+    async def callback(message):
+        # What the app's WebSocket callback costs before the broadcast fan-out
+        encode_message(message)
+
+    orchestrator.websocket_callbacks.append(callback)
+    return orchestrator, job
+
+
+@bench('notify', '_notify_websockets[task_completed]')
+def notify_task():
+    orchestrator, job = notifying_orchestrator(10)
+    task = job.tasks[1]
+    return {'run': lambda: orchestrator._notify_websockets('task_completed', {'task': task, 'job_id': job.id})}
+
+
+@bench('notify', '_notify_websockets[job_created,1000]')
+def notify_job():
+    orchestrator, job = notifying_orchestrator(1000)
+    return {'run': lambda: orchestrator._notify_websockets('job_created', job)}
+
+
+# Runner
+
+def as_sync(run: Callable, loop: asyncio.AbstractEventLoop) -> Callable[[], Any]:
+    probe = run()
+    if not asyncio.iscoroutine(probe):
+        return run
+    loop.run_until_complete(probe)
+    return lambda: loop.run_until_complete(run())
+
+
+def measure(case: Case, rounds: int, loop: asyncio.AbstractEventLoop) -> Dict[str, Any]:
+    fixture = case.fixture()
+    setup = fixture.get('setup')
+    if setup:
+        setup()
+    run = as_sync(fixture['run'], loop)
+
+    # Calibrate iterations per round from one warm call
+    started = time.perf_counter()
+    run()
+    single = time.perf_counter() - started
+    iterations = 1 if setup else max(1, int(MIN_ROUND_TIME / max(single, 1e-9)))
+
+    times = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run()
+        times.append((time.perf_counter() - started) / iterations)
+
+    return {
+        'rounds': rounds,
+        'iterations': iterations,
+        'min': min(times),
+        'max': max(times),
+        'mean': statistics.fmean(times),
+        'median': statistics.median(times),
+        'stddev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def machine_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def latest_results() -> Optional[str]:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.startswith('hot_paths-') and f.endswith('.json'))
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f}{unit}'
+    return f'{seconds / 1e-9:.0f}ns'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-k', dest='keyword', help='only cases whose id contains this')
+    parser.add_argument('--rounds', type=int, default=15)
+    parser.add_argument('--save', action='store_true')
+    parser.add_argument('--compare', nargs='?', const='latest', help='saved results file (default: newest)')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    # Rejections and job lifecycle messages would drown the table
+    logging.disable(logging.WARNING)
+
+    baseline_path = latest_results() if args.compare == 'latest' else args.compare
+    baseline: Dict[str, Any] = {}
+    if args.compare:
+        if not baseline_path or not os.path.exists(baseline_path):
+            parser.error('no saved results to compare with; run with --save first')
+        with open(baseline_path) as f:
+            baseline = json.load(f)['benchmarks']
+
+    cases = [c for c in CASES if not args.keyword or args.keyword in c.id]
+    loop = asyncio.new_event_loop()
+    results: Dict[str, Dict[str, Any]] = {}
+    regressions = []
+    print(f"{'case':<48} {'min':>10} {'median':>10} {'mean':>10} {'stddev':>10} {'ops/s':>10} {'vs saved':>9}")
+    for case in cases:
+        stats = results[case.id] = measure(case, args.rounds, loop)
+        change = ''
+        if case.id in baseline:
+            ratio = stats['median'] / baseline[case.id]['median'] - 1
+            change = f'{ratio:+.0%}'
+            if ratio > args.tolerance:
+                regressions.append(f"{case.id}: median {format_time(stats['median'])} "
+                                   f"(saved {format_time(baseline[case.id]['median'])}, {ratio:+.0%})")
+        print(
+            f"{case.id:<48} {format_time(stats['min']):>10} {format_time(stats['median']):>10} "
+            f"{format_time(stats['mean']):>10} {format_time(stats['stddev']):>10} "
+            f"{1 / stats['mean']:>10.1f} {change:>9}"
+        )
+    loop.close()
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        info = machine_info()
+        name = f"hot_paths-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{info['commit'] or 'nogit'}.json"
+        path = os.path.join(RESULTS_DIR, name)
+        with open(path, 'w') as f:
+            json.dump({'saved_at': datetime.utcnow().isoformat(), 'machine': info, 'benchmarks': results}, f, indent=2)
+        print(f"Saved {path}")
+
+    if args.compare:
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {baseline_path}")
+
+
+if __name__ == '__main__':
+    main()
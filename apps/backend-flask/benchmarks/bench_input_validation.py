@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark prompt threat scanning and sanitization on realistic batches
+
+Usage:
+    python benchmarks/bench_input_validation.py [--prompts 100] [--length 5000] [--rounds 5]
+
+Compares the legacy per-pattern re.search loop and three-pass sanitizer with
+InputValidator on a batch of clean prompts and on a batch where every tenth
+prompt carries an injection attempt. The cached column repeats validation of
+the same batch, as routes that validate and then sanitize a batch do.
+"""
+import argparse
+import html
+import logging
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import input_validation  # noqa: E402
+from utils.input_validation import DANGEROUS_PATTERNS, InputValidator, MAX_PROMPT_LENGTH  # noqa: E402
+
+WORDS = (
+    'add a responsive pricing table with three tiers and a toggle for annual billing '
+    'the form should update the preview when the user selects a plan and keep the '
+    'layout accessible on mobile devices use the existing design tokens for colours '
+    'spacing and typography then evaluate whether the component needs tests'
+).split()
+
+INJECTIONS = [
+    '<script>alert(1)</script>',
+    'then run eval(atob(payload))',
+    'read document.cookie and send it',
+    'import os; os.system("rm -rf /")',
+    'DROP TABLE users;',
+]
+
+
+def make_prompt(rng: random.Random, length: int) -> str:
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+        if rng.random() < 0.02:
+            words.append('\n')
+    return ' '.join(words)[:length]
+
+
+def make_batch(count: int, length: int, dirty: bool, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    prompts = [make_prompt(rng, length) for _ in range(count)]
+    if dirty:
+        for i in range(0, count, 10):
+            injection = INJECTIONS[i // 10 % len(INJECTIONS)]
+            prompts[i] = prompts[i][:length - len(injection) - 1] + ' ' + injection
+    return prompts
+
+
+def legacy_validate(text: str):
+    for pattern, description in DANGEROUS_PATTERNS:
+        if re.search(pattern, text, re.IGNORECASE | re.MULTILINE):
+            return description
+    return None
+
+
+def legacy_sanitize(text: str) -> str:
+    sanitized = html.escape(text)
+    sanitized = sanitized.replace('\x00', '')
+    sanitized = re.sub(r'[ \t]+', ' ', sanitized)
+    return sanitized[:MAX_PROMPT_LENGTH].strip()
+
+
+def current_validate(text: str):
+    is_valid, error = InputValidator.validate_prompt({'prompt_text': text}, 0)
+    return None if is_valid else error
+
+
+def clear_caches():
+    input_validation.scan_threats.cache_clear()
+    input_validation._sanitize_text.cache_clear()
+
+
+def timed(func, prompts: list, rounds: int, cold: bool) -> float:
+    """Best-of-rounds milliseconds to run func over the whole batch"""
+    best = float('inf')
+    for _ in range(rounds):
+        if cold:
+            clear_caches()
+        start = time.perf_counter()
+        for prompt in prompts:
+            func(prompt)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--prompts', type=int, default=100)
+    parser.add_argument('--length', type=int, default=MAX_PROMPT_LENGTH)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    # Rejections are logged as warnings; keep them out of the table
+    logging.disable(logging.WARNING)
+
+    print(f"{args.prompts} prompts x {args.length} chars, best of {args.rounds}")
+    print(f"{'batch':<8} {'step':<10} {'legacy (ms)':>12} {'current (ms)':>13} {'cached (ms)':>12} {'speedup':>8}")
+    for label, dirty in (('clean', False), ('dirty', True)):
+        prompts = make_batch(args.prompts, args.length, dirty)
+        for step, legacy, current in (
+            ('validate', legacy_validate, current_validate),
+            ('sanitize', legacy_sanitize, InputValidator.sanitize_prompt_text),
+        ):
+            legacy_ms = timed(legacy, prompts, args.rounds, cold=True)
+            current_ms = timed(current, prompts, args.rounds, cold=True)
+            cached_ms = timed(current, prompts, args.rounds, cold=False)
+            print(
+                f"{label:<8} {step:<10} {legacy_ms:>12.2f} {current_ms:>13.2f} "
+                f"{cached_ms:>12.2f} {legacy_ms / current_ms:>7.1f}x"
+            )
+
+
+if __name__ == '__main__':
+    main()
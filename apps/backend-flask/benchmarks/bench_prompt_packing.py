@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark packed against per-prompt Gemini requests for a batch of short prompts
+
+Usage:
+    python benchmarks/bench_prompt_packing.py [--prompts 48] [--words 12] [--latency lognormal:0.6:0.3]
+                                              [--token-rate 80] [--tokens 60] [--fail pack_drop=0.05]
+                                              [--max-concurrent 0] [--seed 1]
+
+Runs the same batch through GeminiService.process_batch twice, with
+pack=False and pack=True, against an in-process fake_llm_server (the
+`standin` backend), and reports wall-clock time, LLM requests and tokens
+as counted by the server, and how many prompts came back from a packed
+request or had to be retried alone. No network access needed.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import parse_failures  # noqa: E402
+from benchmarks.fake_llm_server import FAILURE_KINDS, WORDS, FakeLLMConfig, FakeLLMServer  # noqa: E402
+from services.gemini_service import GeminiConfig, GeminiService  # noqa: E402
+
+
+def make_prompts(count: int, words: int, seed: int):
+    rng = random.Random(seed)
+    return [f"{i}: " + ' '.join(rng.choice(WORDS) for _ in range(words)) for i in range(count)]
+
+
+def run_case(server: FakeLLMServer, prompts, pack: bool) -> Dict[str, Any]:
+    service = GeminiService(GeminiConfig(api_key='', backend='standin', base_url=server.url))
+    before = server.stats()
+    started = time.perf_counter()
+    results = asyncio.run(service.process_batch(prompts, context={'target_platform': 'lovable'}, pack=pack))
+    elapsed = time.perf_counter() - started
+    after = server.stats()
+
+    requests = sum(after['requests'].values()) - sum(before['requests'].values())
+    return {
+        'seconds': elapsed,
+        'ok': sum(1 for r in results if r['success']),
+        'failed': sum(1 for r in results if not r['success']),
+        'packed': sum(1 for r in results if r.get('packed')),
+        'requests': requests,
+        'prompt_tokens': after['tokens']['prompt'] - before['tokens']['prompt'],
+        'completion_tokens': after['tokens']['completion'] - before['tokens']['completion'],
+        'dropped': after['packed']['dropped'] - before['packed']['dropped'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--prompts', type=int, default=48)
+    parser.add_argument('--words', type=int, default=12, help='words per prompt')
+    parser.add_argument('--latency', default='lognormal:0.6:0.3', help='LLM time to first token distribution')
+    parser.add_argument('--token-rate', type=float, default=80.0)
+    parser.add_argument('--tokens', type=int, default=60, help='mean completion tokens per reply')
+    parser.add_argument('--fail', default='', help='e.g. pack_drop=0.05,error=0.01')
+    parser.add_argument('--max-concurrent', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.prompts, args.words, args.seed)
+    print(f"{'mode':<10} {'ok':>4} {'fail':>4} {'packed':>6} {'dropped':>7} {'requests':>8} "
+          f"{'prompt tok':>10} {'compl tok':>9} {'seconds':>8}")
+    for pack in (False, True):
+        server = FakeLLMServer(FakeLLMConfig(
+            args.latency, args.token_rate, args.tokens, parse_failures(args.fail, FAILURE_KINDS), args.max_concurrent, args.seed
+        )).start()
+        try:
+            result = run_case(server, prompts, pack)
+        finally:
+            server.stop()
+        print(
+            f"{'packed' if pack else 'single':<10} {result['ok']:>4} {result['failed']:>4} {result['packed']:>6} "
+            f"{result['dropped']:>7} {result['requests']:>8} {result['prompt_tokens']:>10} "
+            f"{result['completion_tokens']:>9} {result['seconds']:>8.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
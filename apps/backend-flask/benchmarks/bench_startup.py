@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark app import time and first-prompt browser latency
+
+Usage:
+    python benchmarks/bench_startup.py [--rounds 5] [--skip-browser]
+
+Import time is measured in fresh interpreters (what every gunicorn worker
+pays at boot), along with which heavy SDKs the import pulled in. First-prompt
+latency compares a cold PlaywrightService (launch Chromium, open a context,
+load a page) with one served from the warm BrowserPool. The browser part
+needs Chromium installed (`playwright install chromium`).
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('google.generativeai', 'playwright.async_api')
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+PAGE = 'data:text/html,<html><body><textarea></textarea></body></html>'
+
+
+def measure_import(rounds: int):
+    script = IMPORT_SCRIPT.format(heavy=HEAVY_MODULES)
+    env = {**os.environ, 'BROWSER_WARMUP': 'false'}
+    times, loaded = [], ''
+    for _ in range(rounds):
+        out = subprocess.run(
+            [sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        times.append(float(out[0]))
+        loaded = out[1] if len(out) > 1 else ''
+    return min(times), loaded
+
+
+async def first_prompt(warm: bool) -> float:
+    """Seconds until a fresh PlaywrightService has a page loaded"""
+    from services.browser_pool import BrowserPool
+    from services import playwright_service as module
+
+    pool = BrowserPool(size=1)
+    module.browser_pool = pool
+    if warm:
+        await pool.start()
+
+    service = module.PlaywrightService()
+    start = time.perf_counter()
+    await service.initialize()
+    await service.page.goto(PAGE)
+    elapsed = time.perf_counter() - start
+    await service.cleanup()
+    if pool.browser is not None:
+        await pool.browser.close()
+        await pool.playwright.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--skip-browser', action='store_true')
+    args = parser.parse_args()
+
+    seconds, loaded = measure_import(args.rounds)
+    print(f"import app: {seconds * 1000:.0f} ms (best of {args.rounds}); heavy SDKs loaded: {loaded or 'none'}")
+
+    if args.skip_browser:
+        return
+    try:
+        cold = min(asyncio.run(first_prompt(False)) for _ in range(args.rounds))
+        warm = min(asyncio.run(first_prompt(True)) for _ in range(args.rounds))
+    except Exception as e:
+        print(f"first prompt: skipped ({str(e).splitlines()[0]})")
+        return
+    print(f"first prompt, cold browser: {cold * 1000:.0f} ms")
+    print(f"first prompt, warm pool:    {warm * 1000:.0f} ms ({cold / warm:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark WebSocket wire encodings for typical broadcast messages
+
+Usage:
+    python benchmarks/bench_wire_format.py [--iterations 2000]
+
+Reports encode time and bytes per event for task_completed and
+approval_request messages with every encoding available in this environment.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import wire_format  # noqa: E402
+
+
+def make_task_completed(screenshot_bytes: int = 48_000) -> dict:
+    """A task_completed message as emitted by the enhanced orchestrator"""
+    job_id = str(uuid.uuid4())
+    screenshot = os.urandom(screenshot_bytes).hex()
+    return {
+        'type': 'task_completed',
+        'data': {
+            'task': {
+                'id': f'{job_id}-task-3',
+                'prompt': 'Add a responsive pricing table with three tiers and a toggle for annual billing. ' * 4,
+                'target_platform': 'lovable',
+                'status': 'completed',
+                'result': {
+                    'gemini_response': {
+                        'success': True,
+                        'response': 'Create a pricing section component. ' * 40,
+                        'usage': {'prompt_tokens': 212, 'completion_tokens': 480}
+                    },
+                    'automation_result': {
+                        'success': True,
+                        'message': 'Successfully submitted prompt to https://lovable.dev',
+                        'screenshot': screenshot,
+                        'selector_used': 'textarea[placeholder*="message"]',
+                        'platform': 'lovable.dev',
+                        'wait_strategy': 'button_state_change',
+                        'completion_info': {
+                            'success': True,
+                            'platform': 'lovable.dev',
+                            'strategy_used': 'button_state_change',
+                            'wait_time_seconds': 42.7,
+                            'checks_performed': 0,
+                            'ready_for_next': True
+                        },
+                        'wait_time_seconds': 42.7
+                    },
+                    'screenshots': {'final': screenshot}
+                },
+                'error': None,
+                'created_at': datetime.utcnow().isoformat(),
+                'completed_at': datetime.utcnow().isoformat(),
+                'approval_requests': [str(uuid.uuid4())],
+                'human_interventions': [],
+                'confidence_scores': {
+                    'complexity': 0.5, 'risk': 0.3, 'success_probability': 0.8, 'oversight_needed': 0.4
+                }
+            },
+            'job_id': job_id
+        },
+        'timestamp': datetime.utcnow().isoformat(),
+        'channel': 'orchestrator'
+    }
+
+
+def make_approval_request() -> dict:
+    """An approval_request message as emitted by the approval service"""
+    return {
+        'type': 'approval_request',
+        'data': {
+            'id': str(uuid.uuid4()),
+            'task_id': f'{uuid.uuid4()}-task-0',
+            'agent_id': 'enhanced-orchestrator',
+            'action_type': 'execute_task',
+            'description': 'Execute task: Build a login form with email validation and a forgot password link...',
+            'context': {
+                'task': {
+                    'id': 'task-0',
+                    'prompt': 'Build a login form with email validation and a forgot password link',
+                    'target_platform': 'lovable',
+                    'status': 'processing',
+                    'confidence_scores': {'complexity': 0.5, 'risk': 0.3}
+                },
+                'analysis': {
+                    'confidence_scores': {
+                        'complexity': 0.5, 'risk': 0.3, 'success_probability': 0.8, 'oversight_needed': 0.4
+                    },
+                    'overall_confidence': 0.71,
+                    'ai_analysis': 'The task is a standard UI change with low risk. ' * 10,
+                    'recommendation': 'proceed'
+                },
+                'job_config': {'step_by_step_mode': False, 'auto_approval_threshold': 0.8}
+            },
+            'confidence': 0.71,
+            'confidence_level': 'high',
+            'status': 'pending',
+            'auto_approve_threshold': 0.8,
+            'timeout_seconds': 300,
+            'created_at': datetime.utcnow().isoformat(),
+            'responded_at': None,
+            'response_data': None,
+            'screenshot_b64': None
+        },
+        'timestamp': datetime.utcnow().isoformat(),
+        'channel': 'orchestrator'
+    }
+
+
+def bench(label: str, encode, message: dict, iterations: int) -> dict:
+    payload = encode(message)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(message)
+    elapsed = time.perf_counter() - start
+    size = len(payload.encode('utf-8')) if isinstance(payload, str) else len(payload)
+    return {
+        'encoder': label,
+        'encode_us': elapsed / iterations * 1e6,
+        'bytes': size
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    encoders = [('json (stdlib)', lambda m: json.dumps(m))]
+    if wire_format.orjson is not None:
+        encoders.append(('json (orjson)', lambda m: wire_format.encode_message(m, wire_format.ENCODING_JSON)))
+    else:
+        encoders.append(('json (compact)', lambda m: wire_format.encode_message(m, wire_format.ENCODING_JSON)))
+    if wire_format.msgpack is not None:
+        encoders.append(('msgpack', lambda m: wire_format.encode_message(m, wire_format.ENCODING_MSGPACK)))
+    else:
+        print('msgpack not installed - binary encoding skipped')
+
+    messages = [
+        ('task_completed', make_task_completed()),
+        ('approval_request', make_approval_request()),
+    ]
+
+    print(f"{'message':<18} {'encoder':<16} {'encode (us)':>12} {'bytes/event':>12}")
+    for name, message in messages:
+        for label, encode in encoders:
+            row = bench(label, encode, message, args.iterations)
+            print(f"{name:<18} {row['encoder']:<16} {row['encode_us']:>12.1f} {row['bytes']:>12,}")
+
+
+if __name__ == '__main__':
+    main()
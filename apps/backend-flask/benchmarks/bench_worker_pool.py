@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark batch throughput of the multi-process worker pool
+
+Usage:
+    python benchmarks/bench_worker_pool.py [--prompts 200] [--workers 1,2,4,8]
+                                           [--cpu-ms 40] [--io-ms 20] [--crash-rate 0]
+
+Each simulated prompt burns --cpu-ms of pure-Python CPU (standing in for
+screenshot encoding and DOM polling on the Python side of Playwright) and
+then waits --io-ms (standing in for the page round trip). With --crash-rate
+workers die mid-prompt at that probability, exercising restart and re-queue.
+Prints prompts/second and speedup over one worker for each pool size.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.worker_pool import WorkerPool  # noqa: E402
+
+RUNNER = 'benchmarks.bench_worker_pool:SimulatedPromptRunner'
+
+
+class SimulatedPromptRunner:
+    """Stands in for a browser: CPU work, then an awaited round trip"""
+
+    async def start(self, target_url, options):
+        self.cpu_seconds = options['cpu_ms'] / 1000
+        self.io_seconds = options['io_ms'] / 1000
+        self.crash_rate = options['crash_rate']
+        self.rng = random.Random(os.getpid())
+
+    async def submit(self, prompt):
+        deadline = time.process_time() + self.cpu_seconds
+        total = 0
+        while time.process_time() < deadline:
+            total += sum(i * i for i in range(200))
+        if self.rng.random() < self.crash_rate:
+            os._exit(1)
+        await asyncio.sleep(self.io_seconds)
+        return {'status': 'completed', 'result': {'success': True}, 'retry_count': 0}
+
+    async def close(self):
+        pass
+
+
+async def run_pool(workers: int, prompts: int, options: dict) -> dict:
+    results = {}
+
+    async def source():
+        for position in range(prompts):
+            yield position, {'id': f'p{position}', 'text': f'Prompt {position}'}
+
+    async def on_event(kind, position, record):
+        if kind == 'result':
+            results[position] = record['status']
+
+    pool = WorkerPool(workers, 'https://lovable.dev', options, runner=RUNNER)
+    start = time.perf_counter()
+    stats = await pool.run(source(), on_event)
+    elapsed = time.perf_counter() - start
+    return {
+        'elapsed': elapsed,
+        'throughput': prompts / elapsed,
+        'completed': sum(1 for s in results.values() if s == 'completed'),
+        'stats': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--prompts', type=int, default=200)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--cpu-ms', type=float, default=40)
+    parser.add_argument('--io-ms', type=float, default=20)
+    parser.add_argument('--crash-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    options = {'cpu_ms': args.cpu_ms, 'io_ms': args.io_ms, 'crash_rate': args.crash_rate}
+    sizes = [int(n) for n in args.workers.split(',')]
+
+    print(f"{args.prompts} prompts, {args.cpu_ms}ms CPU + {args.io_ms}ms wait each, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'seconds':>9} {'prompts/s':>10} {'speedup':>8} {'done':>6} {'requeued':>9} {'restarts':>9}")
+    baseline = None
+    for size in sizes:
+        row = asyncio.run(run_pool(size, args.prompts, options))
+        baseline = baseline or row['throughput']
+        print(
+            f"{size:>7} {row['elapsed']:>9.2f} {row['throughput']:>10.1f} "
+            f"{row['throughput'] / baseline:>7.2f}x {row['completed']:>6} "
+            f"{row['stats']['requeued']:>9} {row['stats']['restarts']:>9}"
+        )
+
+
+if __name__ == '__main__':
+    main()
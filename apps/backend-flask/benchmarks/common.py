@@ -0,0 +1,26 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import math
+from typing import Dict, Iterable, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered), math.ceil(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def parse_failures(spec: str, kinds: Iterable[str]) -> Dict[str, float]:
+    """Injected failure rates from 'kind=rate,...', checking each kind against kinds"""
+    kinds = tuple(kinds)
+    failures = {}
+    for item in filter(None, (s.strip() for s in spec.split(','))):
+        kind, _, rate = item.partition('=')
+        if kind not in kinds:
+            raise ValueError(f"Unknown failure kind {kind}; expected one of {', '.join(kinds)}")
+        failures[kind] = float(rate)
+    return failures
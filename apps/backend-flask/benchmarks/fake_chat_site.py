@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Local simulated chat platform for offline benchmarks
+
+Usage:
+    python benchmarks/fake_chat_site.py [--platform chatgpt] [--port 8800]
+                                        [--delay lognormal:2:0.4] [--fail http_500=0.02,no_input=0.01]
+
+Serves a chat page laid out after one platform signature in the registry
+(config/platforms.json): its input, send button, processing indicators and
+completion markers, generated from the signature's selectors. Submitting a
+prompt streams a reply from the server over a generation time drawn from a
+delay distribution. While it streams, the processing indicators are shown and
+the send button is disabled; a stop button (when the signature has one)
+aborts the reply. The server records the generation time of every prompt at
+/stats, so a benchmark can separate simulated generation from automation
+overhead.
+
+Delay distributions (seconds): fixed:S, uniform:MIN:MAX,
+lognormal:MEDIAN:SIGMA, exponential:MEAN.
+
+Injected failures (probabilities): http_500 and rate_limited fail the page
+load, no_input serves the page without its chat input, hang streams a reply
+that never ends until stopped.
+"""
+import argparse
+import html
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import parse_failures  # noqa: E402
+from services.platform_registry import platform_registry  # noqa: E402
+
+FAILURE_KINDS = ('http_500', 'rate_limited', 'no_input', 'hang')
+
+# Seconds between streamed chunks of a reply
+STREAM_INTERVAL = 0.05
+
+_SELECTOR_PART = re.compile(r'''
+    (?P<tag>^[a-zA-Z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<cls>[\w-]+)
+  | \[(?P<attr>[\w-]+)(?:[*^$~|]?="(?P<value>[^"]*)")?\]
+  | :has-text\("(?P<text>[^"]*)"\)
+  | :not\([^)]*\)
+''', re.VERBOSE)
+
+_VOID_TAGS = {'input'}
+
+
+def parse_delay(spec: str):
+    """Sampler for a delay distribution spec, in seconds"""
+    kind, *args = spec.split(':')
+    values = [float(a) for a in args]
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown delay distribution: {spec}")
+
+
+def element_for(selector: str, default_tag: str = 'div') -> Dict[str, Any]:
+    """Element (tag, attributes, text) matched by a simple selector"""
+    selector = selector.split(',')[0].strip()
+    element = {'tag': default_tag, 'attrs': {}, 'classes': [], 'text': ''}
+    for match in _SELECTOR_PART.finditer(selector):
+        if match.group('tag'):
+            element['tag'] = match.group('tag')
+        elif match.group('id'):
+            element['attrs']['id'] = match.group('id')
+        elif match.group('cls'):
+            element['classes'].append(match.group('cls'))
+        elif match.group('attr'):
+            element['attrs'][match.group('attr')] = match.group('value') or ''
+        elif match.group('text') is not None:
+            element['text'] = match.group('text')
+    return element
+
+
+def render(element: Dict[str, Any], role: str, hidden: bool = False, text: Optional[str] = None) -> str:
+    attrs = dict(element['attrs'])
+    if element['classes']:
+        attrs['class'] = ' '.join(element['classes'])
+    attrs['data-fake-role'] = role
+    if hidden:
+        attrs['style'] = 'display:none'
+    rendered = ' '.join(f'{k}="{html.escape(v)}"' if v else k for k, v in attrs.items())
+    if element['tag'] in _VOID_TAGS:
+        return f"<{element['tag']} {rendered}>"
+    body = html.escape(text if text is not None else element['text'])
+    return f"<{element['tag']} {rendered}>{body}</{element['tag']}>"
+
+
+def build_page(platform: str, include_input: bool = True) -> str:
+    """Chat page for a registry platform (or generic)"""
+    signature = platform_registry.get(platform) or platform_registry.generic()
+    input_el = element_for(signature['input_selector'], 'textarea')
+    send_el = element_for(signature['submit_button'], 'button')
+    if not send_el['text']:
+        send_el['text'] = 'Send'
+
+    markers: List[str] = []
+    stop_rendered = False
+    for selector in signature.get('processing_indicators', []):
+        element = element_for(selector)
+        if 'stop' in (element['text'] + ' '.join(element['attrs'].values())).lower():
+            # The stop button doubles as a processing indicator
+            element['tag'] = 'button'
+            markers.append(render(element, 'stop', hidden=True, text=element['text'] or 'Stop'))
+            stop_rendered = True
+        else:
+            markers.append(render(element, 'processing', hidden=True, text=element['text'] or 'Working...'))
+    for selector in signature.get('completion_indicators', []):
+        element = element_for(selector)
+        # Indicators on the input or send button are covered by re-enabling them
+        if element['tag'] in ('textarea', 'input', 'button') or element['attrs'].get('contenteditable'):
+            continue
+        # Shown while idle, as after a finished reply
+        markers.append(render(element, 'complete', text=element['text'] or 'Done'))
+
+    chat_input = render(input_el, 'input') if include_input else ''
+    return PAGE_TEMPLATE.format(
+        title=html.escape(platform),
+        chat_input=chat_input,
+        send_button=render(send_el, 'send'),
+        markers='\n    '.join(markers),
+        stop_note='' if stop_rendered else '<!-- signature has no stop button -->',
+    )
+
+
+PAGE_TEMPLATE = """<!doctype html>
+<html>
+<head>
+  <meta charset="utf-8"><title>{title} (simulated)</title>
+  <style>[data-fake-role="input"] {{ display: block; min-width: 30em; min-height: 3em; border: 1px solid #999; }}</style>
+</head>
+<body>
+  <div id="messages"></div>
+  <form id="composer" onsubmit="return false">
+    {chat_input}
+    {send_button}
+    {markers}
+    {stop_note}
+  </form>
+  <script>
+    const input = document.querySelector('[data-fake-role="input"]');
+    const send = document.querySelector('[data-fake-role="send"]');
+    const stop = document.querySelector('[data-fake-role="stop"]');
+    const show = (role, visible) => document.querySelectorAll('[data-fake-role="' + role + '"]')
+        .forEach(el => el.style.display = visible ? '' : 'none');
+    let controller = null;
+
+    function readPrompt() {{
+      if (!input) return '';
+      return input.isContentEditable ? input.innerText : input.value;
+    }}
+
+    function setBusy(busy) {{
+      show('processing', busy);
+      show('stop', busy);
+      show('complete', !busy);
+      if (busy) {{ send.setAttribute('disabled', ''); }} else {{ send.removeAttribute('disabled'); }}
+      if (input && !input.isContentEditable) input.disabled = busy;
+    }}
+
+    async function submitPrompt() {{
+      const prompt = readPrompt().trim();
+      if (!prompt || controller) return;
+      const reply = document.createElement('div');
+      reply.className = 'reply';
+      document.getElementById('messages').appendChild(reply);
+      controller = new AbortController();
+      setBusy(true);
+      try {{
+        const response = await fetch('/generate', {{
+          method: 'POST', body: JSON.stringify({{prompt}}), signal: controller.signal
+        }});
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        while (true) {{
+          const {{done, value}} = await reader.read();
+          if (done) break;
+          reply.textContent += decoder.decode(value);
+        }}
+      }} catch (e) {{
+        reply.textContent += ' [stopped]';
+      }} finally {{
+        controller = null;
+        if (input) {{ if (input.isContentEditable) input.innerText = ''; else input.value = ''; }}
+        setBusy(false);
+      }}
+    }}
+
+    send.addEventListener('click', submitPrompt);
+    if (input) input.addEventListener('keydown', e => {{
+      if (e.key === 'Enter' && !e.shiftKey) {{ e.preventDefault(); submitPrompt(); }}
+    }});
+    if (stop) stop.addEventListener('click', () => controller && controller.abort());
+  </script>
+</body>
+</html>
+"""
+
+
+@dataclass
+class FakeChatConfig:
+    platform: str = 'chatgpt'
+    delay: str = 'lognormal:2:0.4'
+    failures: Dict[str, float] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+
+class FakeChatSite:
+    """Threaded local HTTP server for one simulated platform"""
+
+    def __init__(self, config: FakeChatConfig, host: str = '127.0.0.1', port: int = 0):
+        self.config = config
+        self._sample_delay = parse_delay(config.delay)
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self.generations: Dict[str, Dict[str, Any]] = {}
+        self.page_loads = {'ok': 0, **{kind: 0 for kind in FAILURE_KINDS}}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> 'FakeChatSite':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-chat-site', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _roll(self, kind: str) -> bool:
+        rate = self.config.failures.get(kind, 0)
+        with self._rng_lock:
+            return rate > 0 and self._rng.random() < rate
+
+    def _delay(self) -> float:
+        with self._rng_lock:
+            return max(0.0, self._sample_delay(self._rng))
+
+    def stats(self) -> Dict[str, Any]:
+        return {'platform': self.config.platform, 'page_loads': dict(self.page_loads), 'generations': dict(self.generations)}
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = 'text/html; charset=utf-8'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/stats':
+                    self._send(200, json.dumps(site.stats()).encode(), 'application/json')
+                    return
+                if path == '/favicon.ico':
+                    self._send(404, b'')
+                    return
+                if site._roll('http_500'):
+                    site.page_loads['http_500'] += 1
+                    self._send(500, b'<html><body>Internal Server Error</body></html>')
+                    return
+                if site._roll('rate_limited'):
+                    site.page_loads['rate_limited'] += 1
+                    self._send(429, b'<html><body>Too many requests</body></html>')
+                    return
+                include_input = not site._roll('no_input')
+                site.page_loads['ok' if include_input else 'no_input'] += 1
+                self._send(200, build_page(site.config.platform, include_input).encode())
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/generate':
+                    self._send(404, b'')
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                prompt = json.loads(self.rfile.read(length) or b'{}').get('prompt', '')
+                hang = site._roll('hang')
+                delay = math.inf if hang else site._delay()
+                started = time.monotonic()
+                record = {'generation_seconds': None, 'planned_seconds': None if hang else delay, 'status': 'streaming'}
+                site.generations[prompt] = record
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                status = 'completed'
+                try:
+                    token = 0
+                    while time.monotonic() - started < delay:
+                        chunk = f'token{token} '.encode()
+                        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                        self.wfile.flush()
+                        token += 1
+                        time.sleep(min(STREAM_INTERVAL, max(0.0, delay - (time.monotonic() - started))))
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client pressed stop
+                    status = 'stopped'
+                record['generation_seconds'] = time.monotonic() - started
+                record['status'] = status
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--platform', default='chatgpt',
+                        help=f"registry platform or generic ({', '.join(platform_registry.names())})")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--delay', default='lognormal:2:0.4')
+    parser.add_argument('--fail', default='', help='e.g. http_500=0.02,no_input=0.01')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    site = FakeChatSite(
+        FakeChatConfig(args.platform, args.delay, parse_failures(args.fail, FAILURE_KINDS), args.seed), args.host, args.port
+    )
+    print(f"Simulated {args.platform} at {site.url} (stats at {site.url}stats)")
+    try:
+        site._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-in for the LLM backend
+
+Usage:
+    python benchmarks/fake_llm_server.py [--port 8900] [--latency lognormal:0.6:0.3] [--token-rate 80]
+                                         [--tokens 120] [--fail error=0.02,rate_limited=0.05,pack_drop=0.02]
+                                         [--max-concurrent 8] [--seed 1]
+
+Answers POST /v1/generate ({"model", "prompt", "stream"}) the way the
+`standin` backend (services/llm_backends.py) expects: a JSON body with the
+text and token usage, or with "stream": true an NDJSON stream of text
+chunks ending with a usage line. Run the backend against it with
+LLM_BACKEND=standin LLM_STANDIN_URL=http://127.0.0.1:8900.
+
+Each response takes a time-to-first-token drawn from the latency
+distribution plus completion_tokens / token-rate seconds. Replies, token
+counts and injected failures are drawn from an RNG seeded with the seed, the
+prompt and how many times that prompt has been asked, so a run is
+reproducible however the requests interleave.
+
+Packed requests (GeminiService.process_batch) are answered with an indexed
+JSON array, one reply per task, the way the packing instructions ask.
+
+Injected failures (probabilities): error answers HTTP 500, rate_limited
+answers 429 with Retry-After, pack_drop leaves a task out of a packed reply.
+Requests beyond --max-concurrent are also answered 429. Counters are served
+at /stats.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import parse_failures  # noqa: E402
+from benchmarks.fake_chat_site import parse_delay  # noqa: E402
+from services.gemini_service import PACKED_TASKS_MARKER  # noqa: E402
+
+FAILURE_KINDS = ('error', 'rate_limited', 'pack_drop')
+
+# Seconds a 429 asks the client to wait
+RETRY_AFTER = 1
+
+# Completion tokens per streamed chunk
+STREAM_CHUNK_TOKENS = 8
+
+WORDS = (
+    'build', 'page', 'layout', 'component', 'button', 'form', 'header', 'responsive', 'style',
+    'state', 'route', 'list', 'card', 'modal', 'input', 'theme', 'grid', 'footer', 'navigation',
+    'data', 'table', 'chart', 'user', 'profile', 'settings', 'search', 'filter', 'update', 'add',
+)
+
+
+@dataclass
+class FakeLLMConfig:
+    latency: str = 'lognormal:0.6:0.3'
+    token_rate: float = 80.0
+    tokens: int = 120
+    failures: Dict[str, float] = field(default_factory=dict)
+    max_concurrent: int = 0  # 0 = unlimited
+    seed: int = 0
+
+
+class FakeLLMServer:
+    """Threaded local HTTP server answering generate requests"""
+
+    def __init__(self, config: FakeLLMConfig, host: str = '127.0.0.1', port: int = 0):
+        self.config = config
+        self._sample_latency = parse_delay(config.latency)
+        self._lock = threading.Lock()
+        self._asked: Dict[str, int] = {}
+        self.inflight = 0
+        self.counts = {'ok': 0, 'error': 0, 'rate_limited': 0, 'over_capacity': 0}
+        self.packed = {'requests': 0, 'tasks': 0, 'dropped': 0}
+        self.max_inflight = 0
+        self.tokens = {'prompt': 0, 'completion': 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeLLMServer':
+        threading.Thread(target=self._server.serve_forever, name='fake-llm-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': dict(self.counts),
+                'inflight': self.inflight,
+                'max_inflight': self.max_inflight,
+                'tokens': dict(self.tokens),
+                'packed': dict(self.packed),
+            }
+
+    def _rng(self, prompt: str) -> random.Random:
+        """RNG for this prompt's nth request, independent of request order"""
+        with self._lock:
+            asked = self._asked.get(prompt, 0)
+            self._asked[prompt] = asked + 1
+        digest = hashlib.sha256(f'{self.config.seed}:{asked}:{prompt}'.encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _reply(self, prompt: str, rng: random.Random):
+        """Reply text and its completion tokens; an indexed JSON array for packed prompts"""
+        def words():
+            return [rng.choice(WORDS) for _ in range(max(1, int(rng.uniform(0.5, 1.5) * self.config.tokens)))]
+
+        _, marker, tasks = prompt.partition(PACKED_TASKS_MARKER)
+        if not marker:
+            reply = words()
+            return ' '.join(reply), len(reply)
+
+        items, tokens, dropped = [], 0, 0
+        for task in json.loads(tasks):
+            if rng.random() < self.config.failures.get('pack_drop', 0):
+                dropped += 1
+                continue
+            reply = words()
+            tokens += len(reply)
+            items.append({'index': task['index'], 'response': ' '.join(reply)})
+        with self._lock:
+            self.packed['requests'] += 1
+            self.packed['tasks'] += len(items) + dropped
+            self.packed['dropped'] += dropped
+        return json.dumps(items), max(1, tokens)
+
+    def _enter(self) -> bool:
+        with self._lock:
+            if self.config.max_concurrent and self.inflight >= self.config.max_concurrent:
+                self.counts['over_capacity'] += 1
+                return False
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            return True
+
+    def _exit(self, outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+        with self._lock:
+            self.inflight -= 1
+            self.counts[outcome] += 1
+            self.tokens['prompt'] += prompt_tokens
+            self.tokens['completion'] += completion_tokens
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, data: Dict[str, Any]):
+                line = json.dumps(data).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if urlparse(self.path).path == '/stats':
+                    self._send(200, server.stats())
+                else:
+                    self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                if urlparse(self.path).path != '/v1/generate':
+                    self._send(404, {'error': 'not found'})
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                prompt = request.get('prompt', '')
+
+                if not server._enter():
+                    self._send(429, {'error': 'too many concurrent requests'}, {'Retry-After': str(RETRY_AFTER)})
+                    return
+                config = server.config
+                rng = server._rng(prompt)
+                if rng.random() < config.failures.get('rate_limited', 0):
+                    server._exit('rate_limited')
+                    self._send(429, {'error': 'rate limited'}, {'Retry-After': str(RETRY_AFTER)})
+                    return
+                fails = rng.random() < config.failures.get('error', 0)
+
+                prompt_tokens = len(prompt.split())
+                text, completion_tokens = server._reply(prompt, rng)
+                time.sleep(max(0.0, server._sample_latency(rng)))
+                if fails:
+                    server._exit('error')
+                    self._send(500, {'error': 'injected failure'})
+                    return
+
+                usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens}
+                token_seconds = 1 / config.token_rate if config.token_rate > 0 else 0.0
+                try:
+                    if not request.get('stream'):
+                        time.sleep(completion_tokens * token_seconds)
+                        self._send(200, {'text': text, 'usage': usage})
+                    else:
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'application/x-ndjson')
+                        self.send_header('Transfer-Encoding', 'chunked')
+                        self.end_headers()
+                        parts = text.split(' ')
+                        for start in range(0, len(parts), STREAM_CHUNK_TOKENS):
+                            chunk = parts[start:start + STREAM_CHUNK_TOKENS]
+                            time.sleep(len(chunk) * token_seconds)
+                            self._chunk({'text': ('' if start == 0 else ' ') + ' '.join(chunk)})
+                        self._chunk({'usage': usage})
+                        self.wfile.write(b'0\r\n\r\n')
+                    server._exit('ok', prompt_tokens, completion_tokens)
+                except (BrokenPipeError, ConnectionResetError):
+                    server._exit('error')
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', default='lognormal:0.6:0.3', help='time to first token distribution')
+    parser.add_argument('--token-rate', type=float, default=80.0, help='completion tokens per second')
+    parser.add_argument('--tokens', type=int, default=120, help='mean completion tokens')
+    parser.add_argument('--fail', default='', help='e.g. error=0.02,rate_limited=0.05,pack_drop=0.02')
+    parser.add_argument('--max-concurrent', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(FakeLLMConfig(
+        args.latency, args.token_rate, args.tokens, parse_failures(args.fail, FAILURE_KINDS), args.max_concurrent, args.seed
+    ), args.host, args.port)
+    print(f"LLM stand-in at {server.url} (stats at {server.url}/stats)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+HTTP load-test scenarios for the Flask API with stub browser and LLM backends
+
+Usage:
+    python benchmarks/load_test.py [--scenarios poll,list,create,process,health,mixed]
+                                   [--concurrency 1,8,32] [--duration 15] [--output results.json]
+    python benchmarks/load_test.py --target http://127.0.0.1:5055 ...
+    python benchmarks/load_test.py --serve [--port 5055]
+    gunicorn -w 4 -b 127.0.0.1:5055 'benchmarks.load_test:stub_app()'
+
+Without --target, the app is started in a subprocess (--serve) on the
+threaded development server, with:
+
+    browser   PlaywrightService runs without Chromium; a prompt takes a
+              simulated time drawn from --browser-delay (navigation included)
+    LLM       the `standin` backend against an in-process fake_llm_server
+
+Every scenario runs at each concurrency level for --duration seconds, with
+one HTTP keep-alive session per virtual user:
+
+    health    GET  /health
+    create    POST /api/run-batch (3-prompt universal batches)
+    poll      GET  /api/batches/<id>/status on 20 existing 200-task jobs
+    list      GET  /api/universal/batches
+    process   POST /api/automation/process-batch (2 prompts, waits for the batch)
+    mixed     all of the above, weighted towards polling
+
+Reports requests, errors, throughput and p50/p90/p99/max latency per
+endpoint. The sustained poll scenario shows the per-request asyncio.run
+cost and how latency grows with concurrency; the server's worst background
+event loop stall is printed after each run (in-process server only).
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.common import percentile  # noqa: E402
+from benchmarks.fake_chat_site import parse_delay  # noqa: E402
+
+DEFAULT_PORT = 5055
+
+# Seconds to wait for a spawned server to answer
+STARTUP_TIMEOUT = 60
+
+# Per-request client timeout; process-batch waits for its prompts
+REQUEST_TIMEOUT = 120
+
+POLL_JOBS = 20
+POLL_JOB_TASKS = 200
+
+PROMPT = 'Add a responsive pricing table with three tiers and a toggle for annual billing'
+
+
+# Stub server
+
+class StubPage:
+    """The few Page calls made outside _navigate_and_submit"""
+
+    def __init__(self):
+        self.url = 'about:blank'
+
+    async def goto(self, url: str, **kwargs):
+        self.url = url
+
+    async def title(self) -> str:
+        return 'Stub'
+
+    async def close(self):
+        pass
+
+
+def install_stub_browser(delay_spec: str, seed: int = 0):
+    """Replace PlaywrightService's browser with a simulated one"""
+    import asyncio
+    from services import tracing
+    from services.platform_profiles import GENERIC_PLATFORM, platform_from_url
+    from services.playwright_service import PlaywrightService
+
+    sample_delay = parse_delay(delay_spec)
+    rng = random.Random(seed)
+
+    async def initialize(self):
+        if not self._initialized:
+            self.page = StubPage()
+            self._initialized = True
+
+    async def navigate_and_submit(self, url, prompt, selector, wait_for_completion):
+        await self.use_session(url)
+        delay = max(0.0, sample_delay(rng))
+        with tracing.span('navigation'):
+            await self.page.goto(url)
+        with tracing.span('completion', strategy='stub'):
+            if wait_for_completion and prompt:
+                await asyncio.sleep(delay)
+        return {
+            'success': True,
+            'message': f'Successfully submitted prompt to {url}',
+            'selector_used': 'textarea',
+            'platform': platform_from_url(url) or GENERIC_PLATFORM,
+            'wait_time_seconds': delay,
+        }
+
+    PlaywrightService.initialize = initialize
+    PlaywrightService._navigate_and_submit = navigate_and_submit
+
+
+def stub_app(browser_delay: Optional[str] = None, llm_latency: Optional[str] = None):
+    """
+    The Flask app with the stub browser and a stand-in LLM
+
+    Settings come from the arguments or LOAD_TEST_BROWSER_DELAY and
+    LOAD_TEST_LLM_LATENCY, so gunicorn can call this as an app factory.
+    """
+    from benchmarks.fake_llm_server import FakeLLMConfig, FakeLLMServer
+
+    browser_delay = browser_delay or os.getenv('LOAD_TEST_BROWSER_DELAY', 'lognormal:0.5:0.3')
+    llm_latency = llm_latency or os.getenv('LOAD_TEST_LLM_LATENCY', 'lognormal:0.2:0.3')
+    llm = FakeLLMServer(FakeLLMConfig(latency=llm_latency, token_rate=400, tokens=60)).start()
+
+    os.environ.setdefault('JOB_STORE_PATH', os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'jobs.db'))
+    os.environ['LLM_BACKEND'] = 'standin'
+    os.environ['LLM_STANDIN_URL'] = llm.url
+    os.environ['BROWSER_WARMUP'] = 'false'
+    install_stub_browser(browser_delay)
+
+    from app import app
+    return app
+
+
+def serve(port: int, browser_delay: str, llm_latency: str):
+    import logging
+    from werkzeug.serving import make_server
+
+    app = stub_app(browser_delay, llm_latency)
+    # Request logging would dominate the profile of a load test
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    print(f"Stub backend on http://127.0.0.1:{port}", flush=True)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+# Scenarios
+
+Request = Callable[['VirtualUser'], Tuple[str, Any]]
+
+
+class VirtualUser:
+    def __init__(self, base: str, state: Dict[str, Any], seed: int):
+        import requests
+        self.base = base
+        self.state = state
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+
+    def get(self, path: str):
+        return self.session.get(self.base + path, timeout=REQUEST_TIMEOUT)
+
+    def post(self, path: str, body: Dict[str, Any]):
+        return self.session.post(self.base + path, json=body, timeout=REQUEST_TIMEOUT)
+
+
+def health(user: VirtualUser):
+    return 'GET /health', user.get('/health')
+
+
+def create(user: VirtualUser):
+    # Unique names: the route derives batch ids from the name and the second
+    name = f'load-{uuid.uuid4().hex[:12]}'
+    return 'POST /api/run-batch', user.post('/api/run-batch', {
+        'batch': {
+            'name': name,
+            'targetUrl': 'https://lovable.dev',
+            'prompts': [{'id': f'p{i}', 'text': f'{PROMPT} ({i})'} for i in range(3)],
+        },
+        'platform': 'lovable',
+        'options': {'automation_mode': 'autonomous'},
+    })
+
+
+def poll(user: VirtualUser):
+    job_id = user.rng.choice(user.state['job_ids'])
+    return 'GET /api/batches/<id>/status', user.get(f'/api/batches/{job_id}/status')
+
+
+def list_batches(user: VirtualUser):
+    return 'GET /api/universal/batches', user.get('/api/universal/batches?limit=50')
+
+
+def process(user: VirtualUser):
+    return 'POST /api/automation/process-batch', user.post('/api/automation/process-batch', {
+        'batch_id': f'load-{uuid.uuid4().hex[:12]}',
+        'target_url': 'https://lovable.dev',
+        'prompts': [{'id': f'p{i}', 'text': f'{PROMPT} ({i})'} for i in range(2)],
+        'options': {'max_retries': 1},
+    })
+
+
+SCENARIOS: Dict[str, List[Tuple[int, Request]]] = {
+    'health': [(1, health)],
+    'create': [(1, create)],
+    'poll': [(1, poll)],
+    'list': [(1, list_batches)],
+    'process': [(1, process)],
+    'mixed': [(60, poll), (20, list_batches), (10, health), (5, create), (5, process)],
+}
+
+
+def prepare(base: str, scenarios: List[str]) -> Dict[str, Any]:
+    """Jobs for the polling scenarios to read"""
+    state: Dict[str, Any] = {'job_ids': []}
+    if not {'poll', 'mixed'} & set(scenarios):
+        return state
+    user = VirtualUser(base, state, 0)
+    for n in range(POLL_JOBS):
+        response = user.post('/api/batches', {
+            'name': f'load-poll-{n}',
+            'prompts': [{'text': f'{PROMPT} ({i})', 'platform': 'lovable'} for i in range(POLL_JOB_TASKS)],
+        })
+        response.raise_for_status()
+        state['job_ids'].append(response.json()['job_id'])
+    return state
+
+
+def run_scenario(base: str, name: str, concurrency: int, duration: float, state: Dict[str, Any]) -> Dict[str, Any]:
+    weighted = SCENARIOS[name]
+    requests_, weights = [r for _, r in weighted], [w for w, _ in weighted]
+    samples: List[Tuple[str, float, bool]] = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def virtual_user(seed: int):
+        user = VirtualUser(base, state, seed)
+        local = []
+        while time.monotonic() < deadline:
+            request = user.rng.choices(requests_, weights)[0]
+            started = time.perf_counter()
+            try:
+                label, response = request(user)
+                ok = response.status_code < 400
+            except Exception:
+                label, ok = request.__name__, False
+            local.append((label, time.perf_counter() - started, ok))
+        with lock:
+            samples.extend(local)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for seed in range(concurrency):
+            pool.submit(virtual_user, seed)
+    elapsed = time.monotonic() - started
+
+    endpoints: Dict[str, Dict[str, Any]] = {}
+    for label in sorted({s[0] for s in samples}):
+        latencies = sorted(s[1] for s in samples if s[0] == label)
+        errors = sum(1 for s in samples if s[0] == label and not s[2])
+        endpoints[label] = {
+            'requests': len(latencies),
+            'errors': errors,
+            'error_rate': errors / len(latencies),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p90_ms': percentile(latencies, 90) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    return {'scenario': name, 'concurrency': concurrency, 'seconds': round(elapsed, 2), 'endpoints': endpoints}
+
+
+def loop_lag(base: str, token: Optional[str]) -> Optional[float]:
+    """Worst background event loop stall so far (ms), if the admin API is reachable"""
+    if not token:
+        return None
+    import requests
+    try:
+        response = requests.get(base + '/api/admin/loop-lag', headers={'X-Admin-Token': token}, timeout=5)
+        return response.json().get('max_lag_ms') if response.ok else None
+    except requests.RequestException:
+        return None
+
+
+def start_server(args) -> Tuple[subprocess.Popen, str, str]:
+    import requests
+    token = secrets.token_hex(16)
+    log = tempfile.NamedTemporaryFile(prefix='loadtest-server-', suffix='.log', delete=False)
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(args.port),
+         '--browser-delay', args.browser_delay, '--llm-latency', args.llm_latency],
+        stdout=log, stderr=subprocess.STDOUT, env={**os.environ, 'ADMIN_TOKEN': token}
+    )
+    base = f'http://127.0.0.1:{args.port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Stub server exited; see {log.name}")
+        try:
+            if requests.get(base + '/api/universal/batches', timeout=2).ok:
+                print(f"Stub server on {base} (log: {log.name})")
+                return process, base, token
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit(f"Stub server did not start in {STARTUP_TIMEOUT}s; see {log.name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scenarios', default='poll,list,create,process,health,mixed')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--target', help='base URL of an already running server')
+    parser.add_argument('--admin-token', default=os.getenv('ADMIN_TOKEN'), help='reads loop lag from --target')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--serve', action='store_true', help='only run the stub server')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--browser-delay', default='lognormal:0.5:0.3')
+    parser.add_argument('--llm-latency', default='lognormal:0.2:0.3')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.browser_delay, args.llm_latency)
+        return
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+
+    process = None
+    if args.target:
+        base, token = args.target.rstrip('/'), args.admin_token
+    else:
+        process, base, token = start_server(args)
+
+    results = []
+    try:
+        state = prepare(base, scenarios)
+        print(f"{'scenario':<9} {'vus':>4} {'endpoint':<38} {'reqs':>6} {'err%':>6} {'req/s':>8} "
+              f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for name in scenarios:
+            for concurrency in levels:
+                result = run_scenario(base, name, concurrency, args.duration, state)
+                result['loop_max_lag_ms'] = loop_lag(base, token)
+                results.append(result)
+                for label, e in result['endpoints'].items():
+                    print(
+                        f"{name:<9} {concurrency:>4} {label:<38} {e['requests']:>6} {e['error_rate']:>6.1%} "
+                        f"{e['throughput']:>8.1f} {e['p50_ms']:>8.1f} {e['p90_ms']:>8.1f} "
+                        f"{e['p99_ms']:>8.1f} {e['max_ms']:>8.1f}"
+                    )
+                if result['loop_max_lag_ms'] is not None:
+                    print(f"{'':<14} background event loop max lag so far: {result['loop_max_lag_ms']:.1f}ms")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target': base, 'duration': args.duration, 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Simulate domain-affinity sharding across several backend nodes
+
+Usage:
+    python benchmarks/sim_sharding.py [--nodes 4] [--domains 40] [--batches 2000]
+
+Each simulated node has its own ShardCoordinator and JobStore connection on
+a shared temporary SQLite file, as separate backend processes would. Batches
+land on a random node (as behind a plain load balancer) with target domains
+drawn from a skewed distribution. Without affinity the landing node runs the
+batch; with affinity it is routed to the domain's owner first. A batch is a
+warm hit when its node has served that domain before (browser session,
+platform cache and page already warm).
+
+Then one node stops heartbeating; once its heartbeat expires the script
+reports which domains changed owner. Only the dead node's domains should move.
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.job_store import JobStore  # noqa: E402
+from services.shard_coordinator import ShardCoordinator, domain_of  # noqa: E402
+
+HEARTBEAT_INTERVAL = 0.2
+NODE_TTL = 1.0
+
+
+def make_nodes(path: str, count: int):
+    nodes = {}
+    for i in range(count):
+        node_id = f'node-{i}'
+        nodes[node_id] = ShardCoordinator(
+            store=JobStore(path, flush_interval=0.01),
+            node_id=node_id,
+            node_url=f'http://127.0.0.1:{5000 + i}',
+            heartbeat_interval=HEARTBEAT_INTERVAL,
+            node_ttl=NODE_TTL,
+            lease_ttl=30.0
+        )
+    for coordinator in nodes.values():
+        coordinator._ensure_started()
+    for coordinator in nodes.values():
+        coordinator.refresh()
+    return nodes
+
+
+def run(nodes, urls, affinity: bool, rng: random.Random) -> float:
+    """Run batches and return the warm-hit rate"""
+    warm = 0
+    for url in urls:
+        landing = nodes[rng.choice(list(nodes))]
+        target = landing
+        if affinity:
+            owner = landing.route(url)
+            target = landing if owner['local'] else nodes[owner['node_id']]
+        warm += target.begin(url)['warm']
+        target.end(url)
+    return warm / len(urls)
+
+
+def owners(nodes, domains):
+    viewer = next(iter(nodes.values()))
+    return {domain: viewer.route(f'https://{domain}/')['node_id'] for domain in domains}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--domains', type=int, default=40)
+    parser.add_argument('--batches', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    domains = [f'app{i}.example.com' for i in range(args.domains)]
+    # Skewed popularity: a few platforms get most batches
+    weights = [1 / (i + 1) for i in range(args.domains)]
+    urls = [f'https://www.{d}/project' for d in rng.choices(domains, weights, k=args.batches)]
+
+    print(f"{args.nodes} nodes, {args.domains} domains, {args.batches} batches")
+    for affinity in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            nodes = make_nodes(os.path.join(tmp, 'jobs.db'), args.nodes)
+            rate = run(nodes, urls, affinity, random.Random(args.seed))
+            label = 'affinity routing' if affinity else 'random landing'
+            print(f"{label:<18} warm-hit rate {rate:6.1%}  cold starts {round((1 - rate) * len(urls)):>5}")
+            for coordinator in nodes.values():
+                coordinator.leave()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes = make_nodes(os.path.join(tmp, 'jobs.db'), args.nodes)
+        run(nodes, urls, True, random.Random(args.seed))
+        before = owners(nodes, domains)
+
+        # Crash node-0: heartbeats stop but nothing is deregistered
+        victim = 'node-0'
+        nodes[victim]._stop.set()
+        del nodes[victim]
+        time.sleep(NODE_TTL + 2 * HEARTBEAT_INTERVAL)
+        after = owners(nodes, domains)
+
+        moved = [d for d in domains if before[d] != after[d]]
+        orphaned = [d for d in domains if before[d] == victim]
+        print(f"\n{victim} stopped: {len(orphaned)} of {len(domains)} domains were on it")
+        print(f"domains that changed owner: {len(moved)} "
+              f"(all from {victim}: {set(moved) == set(orphaned)})")
+        assert all(after[d] != victim for d in domains)
+        assert domain_of('https://WWW.App1.example.com/x') == 'app1.example.com'
+        for coordinator in nodes.values():
+            coordinator.leave()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+"""
+Gunicorn settings, read from the working directory on start
+
+Each worker starts the app's background services once it has loaded the
+app, so they run in serving processes only.
+"""
+
+
+def post_worker_init(worker):
+    from app import start_background_services
+    start_background_services()
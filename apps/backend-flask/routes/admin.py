@@ -0,0 +1,80 @@
+"""
+Admin endpoints for diagnosing CPU hotspots and event loop stalls
+
+Disabled unless ADMIN_TOKEN is set; requests must send it in the
+X-Admin-Token header.
+"""
+from functools import wraps
+import hmac
+import logging
+import math
+import os
+from flask import Blueprint, Response, request, jsonify
+from services.profiler import loop_monitor, sampling_profiler
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN_HEADER = 'X-Admin-Token'
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+def require_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.getenv('ADMIN_TOKEN')
+        if not token:
+            return jsonify({'error': 'Admin endpoints are disabled'}), 404
+        if not hmac.compare_digest(request.headers.get(ADMIN_TOKEN_HEADER, ''), token):
+            return jsonify({'error': 'Invalid admin token'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@admin_bp.route('/profile', methods=['POST'])
+@require_admin
+def profile():
+    """
+    Profile this worker process for a number of seconds
+    
+    Query params:
+        seconds: profile duration (default 10, max 60)
+        format: collapsed (default) samples every thread's stack and returns
+            flamegraph-ready collapsed stacks; pstats runs cProfile on the
+            background event loop thread and returns a file for pstats.Stats
+    """
+    seconds = request.args.get('seconds', 10, type=float)
+    output = request.args.get('format', 'collapsed')
+    if not math.isfinite(seconds):
+        return jsonify({'error': 'seconds must be a finite number'}), 400
+    try:
+        if output == 'pstats':
+            stats = sampling_profiler.profile_loop(seconds)
+            return Response(
+                stats,
+                mimetype='application/octet-stream',
+                headers={'Content-Disposition': 'attachment; filename=event-loop.pstats'}
+            )
+        if output != 'collapsed':
+            return jsonify({'error': 'format must be collapsed or pstats'}), 400
+        result = sampling_profiler.sample(seconds)
+        return Response(
+            result['collapsed'],
+            mimetype='text/plain',
+            headers={'X-Profile-Samples': str(result['samples'])}
+        )
+        
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except TimeoutError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Profiling failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/loop-lag', methods=['GET'])
+@require_admin
+def loop_lag():
+    """Event loop lag monitor state and recent stalls with the blocking stack"""
+    return jsonify(loop_monitor.get_status())
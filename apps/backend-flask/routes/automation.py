@@ -2,18 +2,88 @@
 Automation endpoints for smart prompt injection
 MVP #1 Implementation
 """
-from flask import Blueprint, request, jsonify
-import asyncio
+from flask import Blueprint, Response, request, jsonify
+import json
 import logging
+import time
+import requests
 from services.batch_processor_service import batch_processor_service
+from services.event_loop import background_loop
 from services.playwright_service import playwright_service
-from utils.input_validation import InputValidator
+from services.shard_coordinator import FORWARDED_HEADER, shard_coordinator
+from services.retry_policy import circuit_breakers
+from services.tracing import flight_recorder
+from utils.input_validation import (
+    InputValidator,
+    MAX_PROMPTS_PER_STREAMED_BATCH,
+    MAX_STREAM_LINE_BYTES,
+)
 
 logger = logging.getLogger(__name__)
 
+# Prompts buffered before they are appended to the batch queue
+STREAM_CHUNK_SIZE = 200
+
+# Buffered prompts are appended at least this often on slow uploads
+STREAM_FLUSH_SECONDS = 0.5
+
+# Rejected lines reported back individually; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Bytes read from the client per chunk when forwarding a streamed batch
+FORWARD_CHUNK_BYTES = 64 * 1024
+
+# (connect, read) timeouts for forwarding a batch to its owning node; no
+# read timeout, since /process-batch answers only once the whole batch is
+# done and a timeout here would not stop the owner from running it
+FORWARD_TIMEOUT = (5, None)
+
 automation_bp = Blueprint('automation', __name__, url_prefix='/api/automation')
 
 
+def _forward_to_owner(target_url: str, streamed: bool = False):
+    """
+    Proxy the current request to the node that owns target_url's domain
+    
+    Returns:
+        The owner's response, or None if the batch should run on this node
+    """
+    if request.headers.get(FORWARDED_HEADER):
+        # Already routed once; never bounce between nodes
+        return None
+    
+    owner = shard_coordinator.route(target_url)
+    if owner['local']:
+        return None
+    
+    if streamed:
+        body = iter(lambda: request.stream.read(FORWARD_CHUNK_BYTES), b'')
+    else:
+        body = request.get_data()
+    
+    logger.info(f"Forwarding batch for {target_url} to node {owner['node_id']}")
+    upstream = requests.request(
+        request.method,
+        owner['url'].rstrip('/') + request.full_path.rstrip('?'),
+        data=body,
+        headers={
+            'Content-Type': request.headers.get('Content-Type', 'application/json'),
+            FORWARDED_HEADER: shard_coordinator.node_id
+        },
+        timeout=FORWARD_TIMEOUT,
+        stream=True
+    )
+    # Relay the owner's answer as it arrives instead of buffering it
+    response = Response(
+        upstream.iter_content(FORWARD_CHUNK_BYTES),
+        status=upstream.status_code,
+        content_type=upstream.headers.get('Content-Type', 'application/json')
+    )
+    response.headers['X-Shard-Node'] = owner['node_id']
+    response.call_on_close(upstream.close)
+    return response
+
+
 @automation_bp.route('/process-batch', methods=['POST'])
 def process_batch():
     """
@@ -29,7 +99,9 @@ def process_batch():
             ],
             "options": {
                 "wait_for_completion": true,
-                "max_retries": 3
+                "max_retries": 3,
+                "workers": 4,
+                "account": "team@example.com"
             }
         }
     """
@@ -58,28 +130,214 @@ def process_batch():
             logger.warning(f"Invalid automation request: {error}")
             return jsonify({'error': error}), 400
         
+        # Run on the node that owns this domain's browser sessions
+        forwarded = _forward_to_owner(target_url)
+        if forwarded is not None:
+            return forwarded
+        
         # SECURITY: Sanitize prompts
         for prompt in prompts:
             if 'text' in prompt:
                 prompt['text'] = InputValidator.sanitize_prompt_text(prompt['text'])
         
-        # Start batch processing asynchronously
-        result = asyncio.run(
+        # Run on the background loop, which owns the warm browser pool;
+        # the request still waits for the batch to finish
+        result = background_loop.submit(
             batch_processor_service.process_batch(
                 batch_id=batch_id,
                 target_url=target_url,
                 prompts=prompts,
                 options=options
             )
-        )
+        ).result()
         
-        return jsonify(result)
+        return jsonify(result), 200, {'X-Shard-Node': shard_coordinator.node_id}
         
     except Exception as e:
         logger.error(f"Batch processing error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
+def _parse_stream_line(raw: bytes, index: int):
+    """
+    Parse and validate one NDJSON prompt line
+    
+    Returns:
+        Tuple of (prompt dict or None, error message)
+    """
+    try:
+        item = json.loads(raw)
+    except ValueError:
+        return None, f"Prompt {index} is not valid JSON"
+    
+    if isinstance(item, str):
+        item = {'text': item}
+    if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+        return None, f"Prompt {index} must be a string or an object with a 'text' field"
+    
+    is_valid, error = InputValidator.validate_prompt({'prompt_text': item['text']}, index)
+    if not is_valid:
+        return None, error
+    
+    prompt = {'text': InputValidator.sanitize_prompt_text(item['text'])}
+    if item.get('id') is not None:
+        prompt['id'] = str(item['id'])[:200]
+    return prompt, ""
+
+
+@automation_bp.route('/process-batch/stream', methods=['POST'])
+def process_batch_stream():
+    """
+    Stream a large batch of prompts as NDJSON, one prompt per line
+    
+    Query:
+        batch_id, target_url, wait_for_completion (default true), max_retries (default 3),
+        workers (browser processes, default BATCH_WORKERS),
+        account (saved platform session to use, default SESSION_ACCOUNT)
+    
+    Body (application/x-ndjson):
+        {"id": "p1", "text": "Create a button"}
+        {"id": "p2", "text": "Add a form"}
+        "A bare JSON string is also accepted"
+    
+    Lines are validated and sanitized as they arrive and appended to the
+    batch's persistent queue; execution starts with the first accepted
+    prompt and continues in the background after the upload finishes.
+    Invalid lines are skipped and reported.
+    """
+    try:
+        batch_id = request.args.get('batch_id')
+        target_url = request.args.get('target_url')
+        options = {
+            'wait_for_completion': request.args.get('wait_for_completion', 'true').lower() not in ('0', 'false'),
+            'max_retries': request.args.get('max_retries', 3, type=int),
+            'workers': request.args.get('workers', type=int),
+            'account': request.args.get('account')
+        }
+        
+        if not batch_id or not target_url:
+            return jsonify({'error': 'batch_id and target_url query parameters are required'}), 400
+        
+        # SECURITY: Validate target URL
+        is_valid, error = InputValidator.validate_url(target_url)
+        if not is_valid:
+            logger.warning(f"Invalid target URL: {error}")
+            return jsonify({'error': error}), 400
+        
+        # Run on the node that owns this domain's browser sessions
+        forwarded = _forward_to_owner(target_url, streamed=True)
+        if forwarded is not None:
+            return forwarded
+        
+        accepted = 0
+        rejected = 0
+        errors = []
+        truncated = False
+        started = False
+        chunk = []
+        last_flush = time.monotonic()
+        
+        def flush():
+            nonlocal started, last_flush
+            if not chunk:
+                return
+            if not started:
+                batch_processor_service.open_stream(batch_id, target_url, options)
+                started = True
+            batch_processor_service.append_stream(batch_id, chunk)
+            chunk.clear()
+            last_flush = time.monotonic()
+        
+        index = 0
+        stream = request.stream
+        try:
+            while True:
+                raw = stream.readline(MAX_STREAM_LINE_BYTES)
+                if not raw:
+                    break
+                
+                if len(raw) == MAX_STREAM_LINE_BYTES and not raw.endswith(b'\n'):
+                    # Discard the rest of an oversized line
+                    while raw and not raw.endswith(b'\n'):
+                        raw = stream.readline(MAX_STREAM_LINE_BYTES)
+                    prompt, error = None, f"Prompt {index} exceeds maximum line length of {MAX_STREAM_LINE_BYTES} bytes"
+                elif not raw.strip():
+                    continue
+                else:
+                    prompt, error = _parse_stream_line(raw, index)
+                index += 1
+                
+                if prompt is None:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(error)
+                    continue
+                
+                if accepted >= MAX_PROMPTS_PER_STREAMED_BATCH:
+                    truncated = True
+                    break
+                
+                chunk.append(prompt)
+                accepted += 1
+                
+                # Start execution as soon as the first prompt is accepted
+                if not started or len(chunk) >= STREAM_CHUNK_SIZE or time.monotonic() - last_flush >= STREAM_FLUSH_SECONDS:
+                    flush()
+                
+                if batch_processor_service.active_batches[batch_id]['status'] != 'processing':
+                    # Stopped (or failed) while uploading
+                    break
+            
+            flush()
+        finally:
+            # Let the consumer finish once the queue drains, even if the
+            # client disconnected part way through the upload
+            if started:
+                batch_processor_service.close_stream(batch_id, rejected)
+        
+        if not started:
+            return jsonify({
+                'error': 'No valid prompts in stream',
+                'rejected': rejected,
+                'errors': errors
+            }), 400
+        
+        response = {
+            'batch_id': batch_id,
+            'status': batch_processor_service.active_batches[batch_id]['status'],
+            'accepted': accepted,
+            'rejected': rejected,
+            'errors': errors,
+            'truncated': truncated
+        }
+        if truncated:
+            response['message'] = f'Only the first {MAX_PROMPTS_PER_STREAMED_BATCH} prompts were accepted'
+        
+        return jsonify(response), 202, {'X-Shard-Node': shard_coordinator.node_id}
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Streamed batch error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@automation_bp.route('/batch-results/<batch_id>', methods=['GET'])
+def get_batch_results(batch_id: str):
+    """Page through per-prompt results of a streamed batch (?start=&limit=)"""
+    try:
+        results = batch_processor_service.get_batch_results(
+            batch_id,
+            start=request.args.get('start', 0, type=int),
+            limit=request.args.get('limit', 50, type=int)
+        )
+        return jsonify(results)
+        
+    except Exception as e:
+        logger.error(f"Error getting batch results: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @automation_bp.route('/batch-status/<batch_id>', methods=['GET'])
 def get_batch_status(batch_id: str):
     """Get current status of a batch"""
@@ -96,11 +354,42 @@ def get_batch_status(batch_id: str):
         return jsonify({'error': str(e)}), 500
 
 
+@automation_bp.route('/circuits', methods=['GET'])
+def get_circuits():
+    """Circuit breaker state per target domain on this node"""
+    try:
+        return jsonify(circuit_breakers.get_status())
+        
+    except Exception as e:
+        logger.error(f"Error getting circuit status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
+@automation_bp.route('/flight-recorder', methods=['GET'])
+def get_flight_recorder():
+    """
+    Slowest recent prompts with their phase breakdown
+    
+    Query params: limit (default 10), name (root span name, e.g.
+    navigate_and_submit or task)
+    """
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        return jsonify({
+            **flight_recorder.get_status(),
+            'slowest': flight_recorder.slowest(limit, request.args.get('name'))
+        })
+        
+    except Exception as e:
+        logger.error(f"Error reading flight recorder: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+
 @automation_bp.route('/stop-batch/<batch_id>', methods=['POST'])
 def stop_batch(batch_id: str):
     """Stop a running batch"""
     try:
-        success = asyncio.run(batch_processor_service.stop_batch(batch_id))
+        success = background_loop.submit(batch_processor_service.stop_batch(batch_id)).result()
         
         if success:
             return jsonify({
@@ -137,13 +426,13 @@ def test_automation():
         
         prompt = InputValidator.sanitize_prompt_text(prompt)
         
-        result = asyncio.run(
+        result = background_loop.submit(
             playwright_service.navigate_and_submit(
                 url=target_url,
                 prompt=prompt,
                 wait_for_completion=wait_for_completion
             )
-        )
+        ).result()
         
         return jsonify(result)
         
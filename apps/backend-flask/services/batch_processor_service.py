@@ -7,9 +7,23 @@ from datetime import datetime
 import logging
 
 from services.playwright_service import PlaywrightService
+from services.progress_coalescer import progress_coalescer
+from services.job_store import job_store
+from services.event_loop import background_loop
+from services.worker_pool import WorkerPool, worker_count
+from services.shard_coordinator import shard_coordinator
+from services.retry_policy import submit_with_retries
+from services import metrics
+from services.tracing import flight_recorder
 
 logger = logging.getLogger(__name__)
 
+# Queued prompts fetched per job store read while processing a streamed batch
+STREAM_FETCH_SIZE = 50
+
+# Seconds to wait for more prompts when execution catches up with an upload
+STREAM_POLL_INTERVAL = 0.25
+
 
 class BatchProcessorService:
     """
@@ -27,12 +41,16 @@ class BatchProcessorService:
         self.status_callbacks[batch_id] = callback
     
     async def _emit_status(self, batch_id: str, status_data: Dict[str, Any]):
-        """Emit status update via callback if registered"""
+        """
+        Emit status update via callback if registered
+        
+        Progress updates are coalesced per batch and rate limited; terminal
+        statuses (completed, failed, stopped) are delivered immediately.
+        """
         if batch_id in self.status_callbacks:
-            try:
-                await self.status_callbacks[batch_id](status_data)
-            except Exception as e:
-                logger.error(f"Status callback error: {str(e)}")
+            await progress_coalescer.publish(
+                batch_id, status_data, self.status_callbacks[batch_id]
+            )
     
     async def process_batch(
         self,
@@ -58,6 +76,7 @@ class BatchProcessorService:
         options = options or {}
         wait_for_completion = options.get('wait_for_completion', True)
         max_retries = options.get('max_retries', 3)
+        workers = worker_count(options.get('workers'))
         
         logger.info(f"🚀 Starting batch processing: {batch_id}")
         logger.info(f"📊 Target: {target_url}")
@@ -74,95 +93,39 @@ class BatchProcessorService:
             'started_at': datetime.now().isoformat(),
             'results': []
         }
+        self._persist(batch_id)
+        
+        # Hold this node's lease on the target domain while the batch runs
+        shard_coordinator.begin(target_url)
         
         try:
-            # Initialize Playwright
-            await self.playwright_service.initialize()
-            
-            # Navigate to target once
-            logger.info(f"🌐 Navigating to {target_url}")
-            await self.playwright_service.page.goto(target_url, wait_until='networkidle')
-            
-            # Process each prompt in sequence
-            for index, prompt_obj in enumerate(prompts):
-                prompt_text = prompt_obj.get('text', '')
-                prompt_id = prompt_obj.get('id', f'prompt_{index}')
+            if workers > 1:
+                # Spread prompts over worker processes, each with its own browser
+                records: Dict[int, Dict[str, Any]] = {}
                 
-                logger.info(f"\n{'='*60}")
-                logger.info(f"📍 Processing prompt {index + 1}/{len(prompts)}")
-                logger.info(f"🆔 Prompt ID: {prompt_id}")
-                logger.info(f"📝 Prompt text: {prompt_text[:100]}...")
-                logger.info(f"{'='*60}\n")
+                async def source():
+                    for index, prompt_obj in enumerate(prompts):
+                        yield index, prompt_obj
                 
-                # Update status
-                self.active_batches[batch_id]['current_prompt_index'] = index
-                await self._emit_status(batch_id, {
-                    'batch_id': batch_id,
-                    'status': 'processing',
-                    'current_prompt': index + 1,
-                    'total_prompts': len(prompts),
-                    'prompt_text': prompt_text[:100]
-                })
+                async def on_record(index: int, record: Dict[str, Any]):
+                    records[index] = record
                 
-                # Process with retries
-                retry_count = 0
-                success = False
-                result = None
+                await self._run_pool(batch_id, target_url, options, workers, source(), on_record)
+                self.active_batches[batch_id]['results'] = [records[i] for i in sorted(records)]
+            else:
+                # Initialize Playwright with the platform's saved session
+                await self.playwright_service.use_session(target_url, options.get('account'))
                 
-                while retry_count < max_retries and not success:
-                    try:
-                        # THE MAGIC: navigate_and_submit with wait_for_completion=True
-                        result = await self.playwright_service.navigate_and_submit(
-                            url=target_url,
-                            prompt=prompt_text,
-                            wait_for_completion=wait_for_completion
-                        )
-                        
-                        if result['success']:
-                            success = True
-                            logger.info(f"✅ Prompt {index + 1} completed successfully")
-                            logger.info(f"⏱️ Wait time: {result.get('wait_time_seconds', 0):.2f}s")
-                            
-                            self.active_batches[batch_id]['completed'] += 1
-                            self.active_batches[batch_id]['results'].append({
-                                'prompt_id': prompt_id,
-                                'prompt_text': prompt_text,
-                                'status': 'completed',
-                                'result': result,
-                                'retry_count': retry_count
-                            })
-                        else:
-                            raise Exception(result.get('error', 'Unknown error'))
-                            
-                    except Exception as e:
-                        retry_count += 1
-                        logger.warning(f"⚠️ Attempt {retry_count}/{max_retries} failed: {str(e)}")
-                        
-                        if retry_count < max_retries:
-                            logger.info(f"🔄 Retrying in 3 seconds...")
-                            await asyncio.sleep(3)
-                        else:
-                            logger.error(f"❌ Prompt {index + 1} failed after {max_retries} attempts")
-                            self.active_batches[batch_id]['failed'] += 1
-                            self.active_batches[batch_id]['results'].append({
-                                'prompt_id': prompt_id,
-                                'prompt_text': prompt_text,
-                                'status': 'failed',
-                                'error': str(e),
-                                'retry_count': retry_count
-                            })
-                
-                # Emit progress update
-                await self._emit_status(batch_id, {
-                    'batch_id': batch_id,
-                    'status': 'processing',
-                    'completed': self.active_batches[batch_id]['completed'],
-                    'failed': self.active_batches[batch_id]['failed'],
-                    'progress_percentage': ((index + 1) / len(prompts)) * 100
-                })
+                # Navigate to target once
+                logger.info(f"🌐 Navigating to {target_url}")
+                await self.playwright_service.page.goto(target_url, wait_until='networkidle')
                 
-                logger.info(f"✅ Prompt {index + 1}/{len(prompts)} complete")
-                logger.info(f"📊 Success: {self.active_batches[batch_id]['completed']} | Failed: {self.active_batches[batch_id]['failed']}")
+                # Process each prompt in sequence
+                for index, prompt_obj in enumerate(prompts):
+                    record = await self._process_prompt(
+                        batch_id, target_url, index, prompt_obj, wait_for_completion, max_retries
+                    )
+                    self.active_batches[batch_id]['results'].append(record)
             
             # Batch complete
             final_status = {
@@ -178,6 +141,7 @@ class BatchProcessorService:
             
             self.active_batches[batch_id]['status'] = 'completed'
             self.active_batches[batch_id]['completed_at'] = datetime.now().isoformat()
+            self._persist(batch_id, include_results=True)
             
             await self._emit_status(batch_id, final_status)
             
@@ -200,6 +164,7 @@ class BatchProcessorService:
             
             self.active_batches[batch_id]['status'] = 'failed'
             self.active_batches[batch_id]['error'] = str(e)
+            self._persist(batch_id, include_results=True)
             
             await self._emit_status(batch_id, error_status)
             
@@ -207,22 +172,363 @@ class BatchProcessorService:
             
         finally:
             # Cleanup
+            shard_coordinator.end(target_url)
             await self.playwright_service.cleanup()
+            await progress_coalescer.flush(batch_id)
+            progress_coalescer.discard(batch_id)
             if batch_id in self.status_callbacks:
                 del self.status_callbacks[batch_id]
     
+    async def _process_prompt(
+        self,
+        batch_id: str,
+        target_url: str,
+        index: int,
+        prompt_obj: Dict[str, Any],
+        wait_for_completion: bool,
+        max_retries: int
+    ) -> Dict[str, Any]:
+        """
+        Submit one prompt with retries, updating batch counters and emitting progress
+        
+        Returns:
+            Result record for the prompt (status completed or failed)
+        """
+        batch = self.active_batches[batch_id]
+        prompt_text = prompt_obj.get('text', '')
+        prompt_id = prompt_obj.get('id', f'prompt_{index}')
+        
+        logger.info(f"\n{'='*60}")
+        logger.info(f"📍 Processing prompt {index + 1}/{batch['total_prompts']}")
+        logger.info(f"🆔 Prompt ID: {prompt_id}")
+        logger.info(f"📝 Prompt text: {prompt_text[:100]}...")
+        logger.info(f"{'='*60}\n")
+        
+        # Update status
+        batch['current_prompt_index'] = index
+        self._persist(batch_id)
+        await self._emit_status(batch_id, {
+            'batch_id': batch_id,
+            'status': 'processing',
+            'current_prompt': index + 1,
+            'total_prompts': batch['total_prompts'],
+            'prompt_text': prompt_text[:100]
+        })
+        
+        async def submit():
+            # THE MAGIC: navigate_and_submit with wait_for_completion=True
+            return await self.playwright_service.navigate_and_submit(
+                url=target_url,
+                prompt=prompt_text,
+                wait_for_completion=wait_for_completion
+            )
+        
+        async def circuit_open(wait: float):
+            if batch.get('circuit') != 'open':
+                batch['circuit'] = 'open'
+                self._persist(batch_id)
+                await self._emit_status(batch_id, {
+                    'batch_id': batch_id,
+                    'status': 'processing',
+                    'circuit': 'open',
+                    'current_prompt': index + 1,
+                    'retry_in_seconds': round(wait, 1)
+                })
+        
+        # Process with error-classified retries behind the domain's circuit breaker
+        outcome = await submit_with_retries(
+            submit,
+            target_url,
+            max_retries,
+            restart_browser=self.playwright_service.cleanup,
+            should_stop=lambda: batch['status'] != 'processing',
+            on_circuit_open=circuit_open
+        )
+        batch.pop('circuit', None)
+        record = {'prompt_id': prompt_id, 'prompt_text': prompt_text, **outcome}
+        
+        if outcome['status'] == 'completed':
+            logger.info(f"✅ Prompt {index + 1} completed successfully")
+            logger.info(f"⏱️ Wait time: {outcome['result'].get('wait_time_seconds', 0):.2f}s")
+            batch['completed'] += 1
+        else:
+            logger.error(f"❌ Prompt {index + 1} failed after {outcome['retry_count']} attempts ({outcome['error_class']})")
+            batch['failed'] += 1
+        
+        # Emit progress update
+        self._persist(batch_id)
+        await self._emit_status(batch_id, {
+            'batch_id': batch_id,
+            'status': 'processing',
+            'completed': batch['completed'],
+            'failed': batch['failed'],
+            'progress_percentage': ((index + 1) / batch['total_prompts']) * 100
+        })
+        
+        logger.info(f"✅ Prompt {index + 1}/{batch['total_prompts']} complete")
+        logger.info(f"📊 Success: {batch['completed']} | Failed: {batch['failed']}")
+        
+        return record
+    
+    def open_stream(self, batch_id: str, target_url: str, options: Optional[Dict[str, Any]] = None):
+        """
+        Register a streamed batch and start executing it in the background
+        
+        Prompts are appended with append_stream while the upload is still in
+        progress; execution pulls them from the job store queue, so memory use
+        does not grow with batch size.
+        """
+        if batch_id in self.active_batches and self.active_batches[batch_id]['status'] == 'processing':
+            raise ValueError(f"Batch {batch_id} is already running")
+        
+        # The queue must be empty before the consumer starts: batch ids come
+        # from clients, and rows of an earlier upload would otherwise run again
+        job_store.clear_prompts(batch_id)
+        self.active_batches[batch_id] = {
+            'status': 'processing',
+            'streaming': True,
+            'upload_complete': False,
+            'total_prompts': 0,
+            'rejected_prompts': 0,
+            'completed': 0,
+            'failed': 0,
+            'current_prompt_index': 0,
+            'target_url': target_url,
+            'started_at': datetime.now().isoformat(),
+            'results': []
+        }
+        self._persist(batch_id, include_results=True)
+        background_loop.submit(self.process_stream(batch_id, target_url, options))
+    
+    def append_stream(self, batch_id: str, prompts: List[Dict[str, Any]]):
+        """Queue validated prompts for a streamed batch"""
+        batch = self.active_batches[batch_id]
+        job_store.append_prompts(batch_id, batch['total_prompts'], prompts)
+        batch['total_prompts'] += len(prompts)
+        self._persist(batch_id)
+    
+    def close_stream(self, batch_id: str, rejected: int = 0):
+        """Mark a streamed batch's upload as finished"""
+        batch = self.active_batches[batch_id]
+        batch['rejected_prompts'] = rejected
+        batch['upload_complete'] = True
+        self._persist(batch_id, include_results=True)
+    
+    async def process_stream(
+        self,
+        batch_id: str,
+        target_url: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a streamed batch from the job store queue
+        
+        Runs until the upload is complete and every queued prompt has been
+        processed, or the batch is stopped. Per-prompt results are written
+        back to the queue rather than kept in memory.
+        """
+        options = options or {}
+        wait_for_completion = options.get('wait_for_completion', True)
+        max_retries = options.get('max_retries', 3)
+        workers = worker_count(options.get('workers'))
+        batch = self.active_batches[batch_id]
+        
+        logger.info(f"🚀 Starting streamed batch processing: {batch_id}")
+        logger.info(f"📊 Target: {target_url}")
+        
+        async def complete(position: int, record: Dict[str, Any]):
+            job_store.complete_prompt(batch_id, position, record['status'], record)
+        
+        shard_coordinator.begin(target_url)
+        
+        try:
+            if workers > 1:
+                await self._run_pool(
+                    batch_id, target_url, options, workers, self._stream_source(batch_id), complete
+                )
+            else:
+                # Initialize Playwright with the platform's saved session
+                await self.playwright_service.use_session(target_url, options.get('account'))
+                
+                # Navigate to target once
+                logger.info(f"🌐 Navigating to {target_url}")
+                await self.playwright_service.page.goto(target_url, wait_until='networkidle')
+                
+                async for position, prompt_obj in self._stream_source(batch_id):
+                    record = await self._process_prompt(
+                        batch_id, target_url, position, prompt_obj, wait_for_completion, max_retries
+                    )
+                    await complete(position, record)
+            
+            if batch['status'] == 'processing':
+                batch['status'] = 'completed'
+            batch['completed_at'] = datetime.now().isoformat()
+            self._persist(batch_id, include_results=True)
+            
+            final_status = {
+                'batch_id': batch_id,
+                'status': batch['status'],
+                'total_prompts': batch['total_prompts'],
+                'completed': batch['completed'],
+                'failed': batch['failed'],
+                'started_at': batch['started_at'],
+                'completed_at': batch['completed_at']
+            }
+            await self._emit_status(batch_id, final_status)
+            
+            logger.info(f"\n🎉 Streamed batch {batch_id} {batch['status']}!")
+            logger.info(f"✅ Success: {batch['completed']}/{batch['total_prompts']}")
+            logger.info(f"❌ Failed: {batch['failed']}/{batch['total_prompts']}")
+            
+            return final_status
+            
+        except Exception as e:
+            logger.error(f"❌ Streamed batch processing error: {str(e)}")
+            
+            error_status = {
+                'batch_id': batch_id,
+                'status': 'failed',
+                'error': str(e),
+                'completed': batch['completed'],
+                'failed': batch['failed']
+            }
+            
+            batch['status'] = 'failed'
+            batch['error'] = str(e)
+            self._persist(batch_id, include_results=True)
+            
+            await self._emit_status(batch_id, error_status)
+            
+            return error_status
+            
+        finally:
+            shard_coordinator.end(target_url)
+            await self.playwright_service.cleanup()
+            await progress_coalescer.flush(batch_id)
+            progress_coalescer.discard(batch_id)
+            if batch_id in self.status_callbacks:
+                del self.status_callbacks[batch_id]
+    
+    async def _stream_source(self, batch_id: str):
+        """
+        Yield (position, prompt) pairs from a streamed batch's queue
+        
+        Waits for more prompts while the upload is still running and stops
+        early if the batch is stopped.
+        """
+        batch = self.active_batches[batch_id]
+        position = 0
+        while batch['status'] == 'processing':
+            # Only positions this upload has written
+            queued = job_store.next_prompts(batch_id, position, STREAM_FETCH_SIZE, end=batch['total_prompts'])
+            if not queued:
+                if batch['upload_complete']:
+                    return
+                # Execution has caught up with the upload
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+                continue
+            
+            for prompt_obj in queued:
+                if batch['status'] != 'processing':
+                    return
+                position = prompt_obj['position'] + 1
+                yield prompt_obj['position'], prompt_obj
+    
+    async def _run_pool(
+        self,
+        batch_id: str,
+        target_url: str,
+        options: Dict[str, Any],
+        workers: int,
+        source,
+        on_record: Callable
+    ):
+        """
+        Run a batch on a multi-process worker pool
+        
+        Counters, persistence and progress events are driven from worker
+        events, mirroring what _process_prompt does for a single browser.
+        """
+        batch = self.active_batches[batch_id]
+        batch['workers'] = workers
+        logger.info(f"🧵 Running batch {batch_id} on {workers} worker processes")
+        
+        async def on_event(kind: str, position: int, record: Dict[str, Any]):
+            if kind == 'started':
+                batch['current_prompt_index'] = position
+                await self._emit_status(batch_id, {
+                    'batch_id': batch_id,
+                    'status': 'processing',
+                    'current_prompt': position + 1,
+                    'total_prompts': batch['total_prompts'],
+                    'worker_id': record['worker_id']
+                })
+                return
+            
+            batch['completed' if record['status'] == 'completed' else 'failed'] += 1
+            # Worker processes have their own recorder; keep their traces here
+            trace = (record.get('result') or {}).get('trace')
+            if trace:
+                flight_recorder.record(trace)
+            await on_record(position, record)
+            self._persist(batch_id)
+            await self._emit_status(batch_id, {
+                'batch_id': batch_id,
+                'status': 'processing',
+                'completed': batch['completed'],
+                'failed': batch['failed'],
+                'progress_percentage': ((batch['completed'] + batch['failed']) / batch['total_prompts']) * 100
+            })
+        
+        pool = WorkerPool(workers, target_url, options)
+        batch['pool_stats'] = await pool.run(
+            source, on_event, should_stop=lambda: batch['status'] != 'processing'
+        )
+    
+    def get_batch_results(self, batch_id: str, start: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Page through per-prompt results of a streamed batch"""
+        return job_store.get_prompt_results(batch_id, start, limit)
+    
+    def _persist(self, batch_id: str, include_results: bool = False):
+        """
+        Write batch progress to the shared job store
+        
+        Per-prompt results (with screenshots) are only written once the batch
+        finishes, so progress updates stay small.
+        """
+        batch = self.active_batches[batch_id]
+        record = {'batch_id': batch_id, **batch}
+        if not include_results:
+            record['results'] = []
+        job_store.save_batch('automation', batch_id, record, sync=include_results)
+    
     def get_batch_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
         """Get current status of a batch"""
-        return self.active_batches.get(batch_id)
+        if batch_id in self.active_batches:
+            return self.active_batches[batch_id]
+        return job_store.get_batch(batch_id)
+    
+    def queue_depth(self) -> int:
+        """Prompts not yet finished across running batches"""
+        return sum(
+            batch['total_prompts'] - batch['completed'] - batch['failed']
+            for batch in list(self.active_batches.values())
+            if batch['status'] == 'processing'
+        )
     
     async def stop_batch(self, batch_id: str) -> bool:
         """Stop a running batch"""
         if batch_id in self.active_batches:
             self.active_batches[batch_id]['status'] = 'stopped'
-            await self.playwright_service.cleanup()
+            self._persist(batch_id, include_results=True)
+            # A streamed batch runs on the background loop and cleans up its
+            # own browser once it sees the stopped status
+            if not self.active_batches[batch_id].get('streaming'):
+                await self.playwright_service.cleanup()
             return True
         return False
 
 
 # Global service instance
 batch_processor_service = BatchProcessorService()
+metrics.QUEUE_DEPTH.track(batch_processor_service.queue_depth, service='automation')
@@ -0,0 +1,114 @@
+"""
+Browser Pool - a Chromium launched at startup with contexts opened ahead of use
+
+Launching Chromium and opening a context takes seconds, which otherwise
+lands on the first prompt of every process. With BROWSER_WARMUP set, the
+pool launches a browser on the background event loop as soon as the app is
+imported and keeps BROWSER_POOL_SIZE blank contexts ready. PlaywrightService
+instances running on that loop take a ready context instead of launching
+their own browser; the pool opens a replacement in the background.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Optional, Tuple
+import logging
+
+from services.event_loop import background_loop
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_OPTIONS = {
+    'headless': True,
+    'args': ['--no-sandbox', '--disable-dev-shm-usage']
+}
+
+CONTEXT_OPTIONS = {
+    'viewport': {'width': 1280, 'height': 720},
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+
+def warmup_enabled() -> bool:
+    return os.getenv('BROWSER_WARMUP', 'false').lower() in ('1', 'true', 'yes')
+
+
+class BrowserPool:
+    """Shared browser and ready contexts, owned by the background event loop"""
+
+    def __init__(self, size: int = 2):
+        self.size = max(1, size)
+        self.playwright = None
+        self.browser = None
+        self._idle: Deque[Tuple[Any, Any]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._refilling = False
+        self.stats = {'launch_seconds': None, 'acquired': 0, 'ready_hits': 0}
+
+    async def start(self):
+        """Launch the browser and open the ready contexts (idempotent)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.browser is not None and self.browser.is_connected():
+                return
+            from playwright.async_api import async_playwright
+
+            started = time.perf_counter()
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(**LAUNCH_OPTIONS)
+            self._loop = asyncio.get_running_loop()
+            await self._refill()
+            self.stats['launch_seconds'] = time.perf_counter() - started
+            logger.info(f"Browser pool warm: {len(self._idle)} contexts in {self.stats['launch_seconds']:.2f}s")
+
+    async def _new_context(self) -> Tuple[Any, Any]:
+        context = await self.browser.new_context(**CONTEXT_OPTIONS)
+        page = await context.new_page()
+        return context, page
+
+    async def _refill(self):
+        if self._refilling:
+            return
+        self._refilling = True
+        try:
+            while len(self._idle) < self.size and self.browser is not None and self.browser.is_connected():
+                self._idle.append(await self._new_context())
+        except Exception as e:
+            logger.warning(f"Failed to open a ready browser context: {str(e)}")
+        finally:
+            self._refilling = False
+
+    def available(self) -> bool:
+        """True if the pool is warm and owned by the calling event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return loop is self._loop and self.browser is not None and self.browser.is_connected()
+
+    async def acquire(self) -> Tuple[Any, Any, Any]:
+        """Take (browser, context, page); the caller closes the context, not the browser"""
+        self.stats['acquired'] += 1
+        if self._idle:
+            self.stats['ready_hits'] += 1
+            metrics.BROWSER_POOL_ACQUIRED.inc(ready='true')
+            context, page = self._idle.popleft()
+        else:
+            metrics.BROWSER_POOL_ACQUIRED.inc(ready='false')
+            context, page = await self._new_context()
+        asyncio.get_running_loop().create_task(self._refill())
+        return self.browser, context, page
+
+    def warm_in_background(self):
+        """Start the pool on the background loop without blocking the caller"""
+        background_loop.submit(self.start())
+
+
+# Global browser pool instance
+browser_pool = BrowserPool(size=int(os.getenv('BROWSER_POOL_SIZE', '2')))
+metrics.BROWSER_POOL_CONTEXTS.track(lambda: len(browser_pool._idle), state='ready')
+metrics.BROWSER_POOL_CONTEXTS.track(lambda: browser_pool.size, state='capacity')
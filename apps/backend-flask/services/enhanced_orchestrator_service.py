@@ -4,27 +4,42 @@ Enhanced AI Orchestrator with Human-in-the-Loop capabilities
 import asyncio
 import json
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 import logging
 from datetime import datetime
 import uuid
 
 from .gemini_service import GeminiService, GeminiConfig
 from .playwright_service import PlaywrightService
+from .platform_registry import platform_registry
 from .human_approval_service import HumanApprovalService, ApprovalStatus, human_approval_service
+from .progress_coalescer import progress_coalescer
+from .job_store import job_store
+from .job_progress import JobProgress
+from .prompt_cache import enhance_tasks, prompt_cache, prompt_fingerprint, record_usage
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
+# Finished jobs kept in memory; older ones are served from the job store
+JOB_HISTORY_LIMIT = 100
+
+ACTIVE_JOB_STATUSES = ('queued', 'running', 'paused')
+
 @dataclass
 class EnhancedBatchTask:
     id: str
     prompt: str
     target_platform: str
+    target_url: Optional[str] = None  # Overrides the platform's registry URL
+    fingerprint: Optional[str] = None  # Dedup key of the normalized prompt and platform
     status: str = 'pending'
     result: Optional[Dict] = None
     error: Optional[str] = None
     created_at: str = None
+    started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    token_usage: Optional[Dict[str, int]] = None  # Gemini tokens spent on this task
     approval_requests: List[str] = None  # List of approval request IDs
     human_interventions: List[Dict] = None  # List of human interventions
     confidence_scores: Dict[str, float] = None  # Confidence scores for different actions
@@ -32,6 +47,8 @@ class EnhancedBatchTask:
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow().isoformat()
+        if self.fingerprint is None:
+            self.fingerprint = prompt_fingerprint(self.prompt, self.target_platform)
         if self.approval_requests is None:
             self.approval_requests = []
         if self.human_interventions is None:
@@ -52,10 +69,13 @@ class EnhancedBatchJob:
     human_oversight_enabled: bool = True
     auto_approval_threshold: float = 0.8
     step_by_step_mode: bool = False
+    progress: Optional[JobProgress] = None  # Counters maintained by task transitions
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow().isoformat()
+        if self.progress is None:
+            self.progress = JobProgress.from_tasks(self.tasks)
 
 class EnhancedAIOrchestrator:
     def __init__(self, gemini_config: GeminiConfig):
@@ -88,7 +108,8 @@ class EnhancedAIOrchestrator:
             task = EnhancedBatchTask(
                 id=f"{job_id}-task-{i}",
                 prompt=prompt_data.get('text', ''),
-                target_platform=prompt_data.get('platform', 'lovable')
+                target_platform=prompt_data.get('platform', 'lovable'),
+                target_url=prompt_data.get('target_url')
             )
             tasks.append(task)
         
@@ -103,6 +124,9 @@ class EnhancedAIOrchestrator:
         )
         
         self.active_jobs[job_id] = job
+        self._persist_job(job)
+        for task in tasks:
+            self._persist_task(job, task)
         logger.info(f"Created enhanced batch job {job_id} with {len(tasks)} tasks")
         
         await self._notify_websockets('job_created', job)
@@ -117,6 +141,7 @@ class EnhancedAIOrchestrator:
         job = self.active_jobs[job_id]
         job.status = 'running'
         job.started_at = datetime.utcnow().isoformat()
+        self._persist_job(job)
         
         logger.info(f"Starting enhanced batch job {job_id} with human oversight: {job.human_oversight_enabled}")
         
@@ -126,21 +151,35 @@ class EnhancedAIOrchestrator:
             if job.step_by_step_mode:
                 # Process tasks one by one with approval for each
                 for task in job.tasks:
+                    if job.status == 'stopped':
+                        break
                     await self._process_single_task_with_oversight(task, job)
             else:
                 # Process in batches but with approval checkpoints
                 batch_size = 3
                 for i in range(0, len(job.tasks), batch_size):
+                    if job.status == 'stopped':
+                        break
                     batch_tasks = job.tasks[i:i + batch_size]
                     await self._process_task_batch_with_oversight(batch_tasks, job)
             
             # Calculate final job status
-            failed_tasks = [t for t in job.tasks if t.status == 'failed']
-            completed_tasks = [t for t in job.tasks if t.status == 'completed']
+            failed_count = job.progress.count('failed')
+            completed_count = job.progress.count('completed')
             
-            if len(failed_tasks) == 0:
+            # stop_job has already archived the job and notified clients
+            if job.status == 'stopped':
+                return {
+                    'job_id': job_id,
+                    'status': job.status,
+                    'total_tasks': job.progress.total,
+                    'completed_tasks': completed_count,
+                    'failed_tasks': failed_count
+                }
+            
+            if failed_count == 0:
                 job.status = 'completed'
-            elif len(completed_tasks) > 0:
+            elif completed_count > 0:
                 job.status = 'partial_success'
             else:
                 job.status = 'failed'
@@ -148,96 +187,104 @@ class EnhancedAIOrchestrator:
             job.completed_at = datetime.utcnow().isoformat()
             
             # Move to history
-            self.job_history.append(job)
-            del self.active_jobs[job_id]
+            self._archive_job(job)
             
             await self._notify_websockets('job_completed', job)
             
             return {
                 'job_id': job_id,
                 'status': job.status,
-                'total_tasks': len(job.tasks),
-                'completed_tasks': len(completed_tasks),
-                'failed_tasks': len(failed_tasks),
-                'human_interventions': sum(len(t.human_interventions) for t in job.tasks),
-                'approval_requests': sum(len(t.approval_requests) for t in job.tasks)
+                'total_tasks': job.progress.total,
+                'completed_tasks': completed_count,
+                'failed_tasks': failed_count,
+                'human_interventions': job.progress.human_interventions,
+                'approval_requests': job.progress.approval_requests
             }
             
         except Exception as e:
+            if job.status == 'stopped':
+                raise
             job.status = 'error'
             job.completed_at = datetime.utcnow().isoformat()
+            self._persist_job(job, sync=True)
             logger.error(f"Enhanced batch job {job_id} failed: {str(e)}")
             await self._notify_websockets('job_error', {'job': job, 'error': str(e)})
             raise
     
     async def _process_single_task_with_oversight(self, task: EnhancedBatchTask, job: EnhancedBatchJob):
         """Process a single task with human oversight"""
-        try:
-            task.status = 'processing'
-            await self._notify_websockets('task_started', {'task': task, 'job_id': job.id})
+        with tracing.trace('task', task_id=task.id, job_id=job.id) as root:
+            try:
+                self._transition_task(job, task, 'processing')
+                await self._notify_websockets('task_started', {'task': task, 'job_id': job.id})
             
-            # Step 1: Analyze task with AI to determine confidence and approach
-            analysis_result = await self._analyze_task_with_ai(task, job)
-            task.confidence_scores.update(analysis_result['confidence_scores'])
+                # Step 1: Analyze task with AI to determine confidence and approach
+                with tracing.span('analysis'):
+                    analysis_result = await self._analyze_task_with_ai(task, job)
+                job.progress.record_confidence(task, analysis_result['confidence_scores'])
             
-            # Step 2: Request approval if needed
-            if job.human_oversight_enabled:
-                approval_needed = self._requires_approval(task, job, analysis_result)
+                # Step 2: Request approval if needed
+                if job.human_oversight_enabled:
+                    approval_needed = self._requires_approval(task, job, analysis_result)
                 
-                if approval_needed:
-                    approval_request = await self.approval_service.request_approval(
-                        task_id=task.id,
-                        agent_id='enhanced-orchestrator',
-                        action_type='execute_task',
-                        description=f"Execute task: {task.prompt[:100]}...",
-                        context={
-                            'task': asdict(task),
-                            'analysis': analysis_result,
-                            'job_config': {
-                                'step_by_step_mode': job.step_by_step_mode,
-                                'auto_approval_threshold': job.auto_approval_threshold
-                            }
-                        },
-                        confidence=analysis_result['overall_confidence']
-                    )
+                    if approval_needed:
+                        approval_request = await self.approval_service.request_approval(
+                            task_id=task.id,
+                            agent_id='enhanced-orchestrator',
+                            action_type='execute_task',
+                            description=f"Execute task: {task.prompt[:100]}...",
+                            context={
+                                'task': asdict(task),
+                                'analysis': analysis_result,
+                                'job_config': {
+                                    'step_by_step_mode': job.step_by_step_mode,
+                                    'auto_approval_threshold': job.auto_approval_threshold
+                                }
+                            },
+                            confidence=analysis_result['overall_confidence']
+                        )
                     
-                    task.approval_requests.append(approval_request.id)
+                        job.progress.record_approval_request(task, approval_request.id)
                     
-                    # Wait for approval
-                    approval_response = await self.approval_service.wait_for_approval(
-                        approval_request.id, 
-                        timeout_seconds=300
-                    )
+                        # Wait for approval
+                        with tracing.span('approval_wait') as phase:
+                            approval_response = await self.approval_service.wait_for_approval(
+                                approval_request.id, 
+                                timeout_seconds=300
+                            )
+                            phase.set(status=approval_response.status.value)
                     
-                    if approval_response.status != ApprovalStatus.APPROVED:
-                        task.status = 'failed'
-                        task.error = f"Task rejected or timed out: {approval_response.status.value}"
+                        if approval_response.status != ApprovalStatus.APPROVED:
+                            error = f"Task rejected or timed out: {approval_response.status.value}"
                         
-                        if approval_response.response_data and approval_response.response_data.get('reasoning'):
-                            task.error += f" - {approval_response.response_data['reasoning']}"
+                            if approval_response.response_data and approval_response.response_data.get('reasoning'):
+                                error += f" - {approval_response.response_data['reasoning']}"
                         
-                        return
+                            self._transition_task(job, task, 'failed', error=error)
+                            return
                     
-                    # Apply any modifications from human approval
-                    if approval_response.response_data and approval_response.response_data.get('modifications'):
-                        modifications = approval_response.response_data['modifications']
-                        task.human_interventions.append({
-                            'type': 'modification',
-                            'changes': modifications,
-                            'timestamp': datetime.utcnow().isoformat()
-                        })
-                        # Apply modifications to task
-                        if 'prompt' in modifications:
-                            task.prompt = modifications['prompt']
+                        # Apply any modifications from human approval
+                        if approval_response.response_data and approval_response.response_data.get('modifications'):
+                            modifications = approval_response.response_data['modifications']
+                            job.progress.record_intervention(task, {
+                                'type': 'modification',
+                                'changes': modifications,
+                                'timestamp': datetime.utcnow().isoformat()
+                            })
+                            # Apply modifications to task
+                            if 'prompt' in modifications:
+                                task.prompt = modifications['prompt']
+                                task.fingerprint = prompt_fingerprint(task.prompt, task.target_platform)
             
-            # Step 3: Execute the task
-            await self._execute_enhanced_task(task, job)
+                # Step 3: Execute the task
+                await self._execute_enhanced_task(task, job)
             
-        except Exception as e:
-            task.status = 'failed'
-            task.error = str(e)
-            logger.error(f"Enhanced task {task.id} failed: {str(e)}")
-            await self._notify_websockets('task_failed', {'task': task, 'job_id': job.id, 'error': str(e)})
+            except Exception as e:
+                self._transition_task(job, task, 'failed', error=str(e))
+                logger.error(f"Enhanced task {task.id} failed: {str(e)}")
+                await self._notify_websockets('task_failed', {'task': task, 'job_id': job.id, 'error': str(e)})
+            finally:
+                self._attach_trace(job, task, root)
     
     async def _process_task_batch_with_oversight(self, tasks: List[EnhancedBatchTask], job: EnhancedBatchJob):
         """Process a batch of tasks with oversight"""
@@ -245,9 +292,9 @@ class EnhancedAIOrchestrator:
         approved_tasks = []
         
         for task in tasks:
-            task.status = 'analyzing'
+            self._transition_task(job, task, 'analyzing')
             analysis_result = await self._analyze_task_with_ai(task, job)
-            task.confidence_scores.update(analysis_result['confidence_scores'])
+            job.progress.record_confidence(task, analysis_result['confidence_scores'])
             
             if job.human_oversight_enabled and self._requires_approval(task, job, analysis_result):
                 # Request approval for this task
@@ -264,7 +311,7 @@ class EnhancedAIOrchestrator:
                     confidence=analysis_result['overall_confidence']
                 )
                 
-                task.approval_requests.append(approval_request.id)
+                job.progress.record_approval_request(task, approval_request.id)
                 
                 # For batch mode, we can continue with other tasks while waiting
                 # but we'll check approvals before execution
@@ -280,14 +327,17 @@ class EnhancedAIOrchestrator:
                         if approval_response.status == ApprovalStatus.APPROVED:
                             approved_tasks.append(task)
                     except:
-                        task.status = 'failed'
-                        task.error = 'Approval timeout or error'
+                        self._transition_task(job, task, 'failed', error='Approval timeout or error')
             else:
                 # No approval needed
                 approved_tasks.append(task)
         
-        # Execute approved tasks in parallel
-        execution_tasks = [self._execute_enhanced_task(task, job) for task in approved_tasks]
+        # Enhance the approved prompts together, then execute in parallel
+        with tracing.trace('enhance', job_id=job.id, tasks=len(approved_tasks)):
+            enhancements = await enhance_tasks(self.gemini_service, job.progress, approved_tasks)
+        execution_tasks = [
+            self._execute_enhanced_task(task, job, enhancements[task.id]) for task in approved_tasks
+        ]
         if execution_tasks:
             await asyncio.gather(*execution_tasks, return_exceptions=True)
     
@@ -310,10 +360,16 @@ class EnhancedAIOrchestrator:
             Return JSON format with confidence scores and reasoning.
             """
             
-            gemini_result = await self.gemini_service.process_prompt(
-                analysis_prompt,
-                context={'task_analysis': True}
+            # Identical prompts for the same platform share one analysis
+            gemini_result, source = await prompt_cache.get(
+                'analysis',
+                task.fingerprint,
+                lambda: self.gemini_service.process_prompt(analysis_prompt, context={'task_analysis': True})
             )
+            if source:
+                job.progress.record_reuse('analysis')
+            else:
+                record_usage(job.progress, task, gemini_result)
             
             if gemini_result['success']:
                 # Parse AI response for confidence scores
@@ -376,49 +432,69 @@ class EnhancedAIOrchestrator:
         
         return False
     
-    async def _execute_enhanced_task(self, task: EnhancedBatchTask, job: EnhancedBatchJob):
-        """Execute task with enhanced monitoring and screenshots"""
-        try:
-            task.status = 'processing'
+    async def _execute_enhanced_task(
+        self, 
+        task: EnhancedBatchTask, 
+        job: EnhancedBatchJob, 
+        gemini_result: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Execute task with enhanced monitoring and screenshots
+        
+        gemini_result is the task's enhancement when it was done for a group
+        of tasks; otherwise the prompt is enhanced here.
+        """
+        # A child span of the task trace, or its own trace for batch-mode tasks
+        with tracing.trace('execute', task_id=task.id, job_id=job.id) as execution:
+            try:
+                self._transition_task(job, task, 'processing')
             
-            # Step 1: Enhance prompt with Gemini
-            gemini_result = await self.gemini_service.process_prompt(
-                task.prompt,
-                context={'target_platform': task.target_platform}
-            )
+                # Step 1: Enhance prompt with Gemini
+                if gemini_result is None:
+                    with tracing.span('gemini'):
+                        gemini_result = (await enhance_tasks(self.gemini_service, job.progress, [task]))[task.id]
+                else:
+                    execution.set(packed=gemini_result.get('packed', False))
             
-            if not gemini_result['success']:
-                raise Exception(f"Gemini processing failed: {gemini_result['error']}")
+                if not gemini_result['success']:
+                    raise Exception(f"Gemini processing failed: {gemini_result['error']}")
             
-            enhanced_prompt = gemini_result['response']
+                enhanced_prompt = gemini_result['response']
             
-            # Step 2: Take screenshot before automation
-            await self.playwright_service.initialize()
+                # Step 2: Take screenshot before automation
+                await self.playwright_service.initialize()
             
-            # Step 3: Execute with Playwright with enhanced monitoring
-            automation_result = await self.playwright_service.navigate_and_submit(
-                url=f"https://{task.target_platform}.dev",  # Simplified URL logic
-                prompt=enhanced_prompt
-            )
+                # Step 3: Execute with Playwright with enhanced monitoring
+                url = task.target_url or platform_registry.url_for(task.target_platform)
+                automation_result = await self.playwright_service.navigate_and_submit(
+                    url=url,
+                    prompt=enhanced_prompt
+                )
+                if not automation_result['success']:
+                    raise Exception(f"Automation failed: {automation_result.get('error')}")
             
-            task.result = {
-                'gemini_response': gemini_result,
-                'automation_result': automation_result,
-                'screenshots': {
-                    'final': automation_result.get('screenshot', '')
+                task.result = {
+                    'gemini_response': gemini_result,
+                    'automation_result': automation_result,
+                    'screenshots': {
+                        'final': automation_result.get('screenshot', '')
+                    }
                 }
-            }
-            task.status = 'completed'
-            task.completed_at = datetime.utcnow().isoformat()
+                self._transition_task(job, task, 'completed')
             
-            await self._notify_websockets('task_completed', {'task': task, 'job_id': job.id})
+                await self._notify_websockets('task_completed', {'task': task, 'job_id': job.id})
             
-        except Exception as e:
-            task.status = 'failed'
-            task.error = str(e)
-            task.completed_at = datetime.utcnow().isoformat()
-            logger.error(f"Enhanced task {task.id} failed: {str(e)}")
-            await self._notify_websockets('task_failed', {'task': task, 'job_id': job.id, 'error': str(e)})
+            except Exception as e:
+                self._transition_task(job, task, 'failed', error=str(e))
+                logger.error(f"Enhanced task {task.id} failed: {str(e)}")
+                await self._notify_websockets('task_failed', {'task': task, 'job_id': job.id, 'error': str(e)})
+        if execution.parent is None:
+            self._attach_trace(job, task, execution)
+    
+    def _attach_trace(self, job: EnhancedBatchJob, task: EnhancedBatchTask, span: 'tracing.Span'):
+        """Store a finished task's phase breakdown in its result"""
+        task.result = {**(task.result or {}), 'trace': span.to_dict()}
+        self._persist_task(job, task)
     
     async def pause_job(self, job_id: str) -> Dict[str, Any]:
         """Pause a running job for human intervention"""
@@ -427,6 +503,7 @@ class EnhancedAIOrchestrator:
         
         job = self.active_jobs[job_id]
         job.status = 'paused'
+        self._persist_job(job)
         
         await self._notify_websockets('job_paused', job)
         
@@ -442,6 +519,7 @@ class EnhancedAIOrchestrator:
             raise ValueError(f"Job {job_id} is not paused")
         
         job.status = 'running'
+        self._persist_job(job)
         
         await self._notify_websockets('job_resumed', job)
         
@@ -474,14 +552,79 @@ class EnhancedAIOrchestrator:
             modifications=modifications
         )
     
+    def _transition_task(self, job: EnhancedBatchJob, task: EnhancedBatchTask, status: str, error: Optional[str] = None):
+        """Change a task's status, keeping job counters and the job store in step"""
+        job.progress.transition(task, status, error=error)
+        self._persist_task(job, task)
+    
+    def _job_fields(self, job: EnhancedBatchJob) -> Dict[str, Any]:
+        """Shallow job fields without tasks or counters"""
+        return {f.name: getattr(job, f.name) for f in fields(job) if f.name not in ('tasks', 'progress')}
+    
+    def _job_payload(self, job: EnhancedBatchJob) -> Dict[str, Any]:
+        """Job with its tasks and summarized counters, shaped like a job store row"""
+        return {
+            **self._job_fields(job),
+            'total_tasks': job.progress.total,
+            'summary': job.progress.summary(),
+            'tasks': [asdict(task) for task in job.tasks]
+        }
+    
+    def _persist_job(self, job: EnhancedBatchJob, sync: bool = False):
+        """Write the job row (without tasks) to the shared job store"""
+        job_data = self._job_fields(job)
+        job_data['total_tasks'] = job.progress.total
+        job_store.save_job('enhanced', job_data, summary=job.progress.summary(), sync=sync)
+    
+    def _persist_task(self, job: EnhancedBatchJob, task: EnhancedBatchTask):
+        """Write a single task row to the shared job store"""
+        position = int(task.id.rsplit('-', 1)[-1])
+        job_store.save_task(job.id, position, asdict(task))
+        self._persist_job(job)
+    
+    def _archive_job(self, job: EnhancedBatchJob):
+        """Move a finished job from active jobs into bounded in-memory history"""
+        self._persist_job(job, sync=True)
+        self.job_history.append(job)
+        if len(self.job_history) > JOB_HISTORY_LIMIT:
+            del self.job_history[:-JOB_HISTORY_LIMIT]
+        del self.active_jobs[job.id]
+    
     async def _notify_websockets(self, event_type: str, data: Any):
-        """Notify WebSocket clients"""
+        """Notify WebSocket clients, coalescing progress events per job"""
+        if isinstance(data, EnhancedBatchJob):
+            payload = self._job_payload(data)
+        elif isinstance(data, dict) and isinstance(data.get('job'), EnhancedBatchJob):
+            payload = {**data, 'job': self._job_payload(data['job'])}
+        else:
+            payload = asdict(data) if hasattr(data, '__dict__') else data
         message = {
             'type': event_type,
-            'data': asdict(data) if hasattr(data, '__dict__') else data,
+            'data': payload,
             'timestamp': datetime.utcnow().isoformat()
         }
         
+        if isinstance(data, EnhancedBatchJob):
+            job_id = data.id
+        elif isinstance(data, dict):
+            job_id = data.get('job_id') or getattr(data.get('job'), 'id', None)
+        else:
+            job_id = None
+        
+        if job_id is None:
+            await self._send_to_callbacks(message)
+            return
+        
+        # Progress events for the same job (or the same task of it) collapse into
+        # the latest one; terminal events flush whatever is pending first so
+        # ordering is preserved. Events of different tasks never merge.
+        key = job_id
+        if isinstance(data, dict) and isinstance(data.get('task'), EnhancedBatchTask):
+            key = f"{job_id}:{data['task'].id}"
+        await progress_coalescer.publish(key, message, self._send_to_callbacks)
+    
+    async def _send_to_callbacks(self, message: Dict[str, Any]):
+        """Deliver a message to every registered WebSocket callback"""
         for callback in self.websocket_callbacks:
             try:
                 await callback(message)
@@ -489,31 +632,36 @@ class EnhancedAIOrchestrator:
                 logger.error(f"WebSocket notification failed: {str(e)}")
     
     # All existing methods from original orchestrator
-    async def get_job_status(self, job_id: str) -> Dict[str, Any]:
-        """Get enhanced job status"""
+    async def get_job_status(self, job_id: str, include_tasks: bool = False) -> Dict[str, Any]:
+        """
+        Get enhanced job status
+        
+        Served from counters maintained on task transitions, so this is O(1)
+        unless include_tasks asks for the full task payloads.
+        """
         # Check active jobs first
         if job_id in self.active_jobs:
             job = self.active_jobs[job_id]
         else:
             # Check history
             job = next((j for j in self.job_history if j.id == job_id), None)
-            if not job:
+        
+        if not job:
+            # Jobs run by other workers or before a restart live in the store
+            stored = job_store.get_job(job_id, include_tasks=include_tasks)
+            if not stored:
                 raise ValueError(f"Job {job_id} not found")
+            summary = stored.pop('summary') or {}
+            return {'job': stored, **summary}
+        
+        job_data = self._job_fields(job)
+        job_data['total_tasks'] = job.progress.total
+        if include_tasks:
+            job_data['tasks'] = [asdict(task) for task in job.tasks]
         
         return {
-            'job': asdict(job),
-            'progress': {
-                'total': len(job.tasks),
-                'completed': len([t for t in job.tasks if t.status == 'completed']),
-                'failed': len([t for t in job.tasks if t.status == 'failed']),
-                'processing': len([t for t in job.tasks if t.status == 'processing']),
-                'pending': len([t for t in job.tasks if t.status == 'pending'])
-            },
-            'approval_stats': {
-                'total_approvals': sum(len(t.approval_requests) for t in job.tasks),
-                'human_interventions': sum(len(t.human_interventions) for t in job.tasks),
-                'average_confidence': sum(max(t.confidence_scores.values()) if t.confidence_scores else 0 for t in job.tasks) / len(job.tasks) if job.tasks else 0
-            }
+            'job': job_data,
+            **job.progress.summary()
         }
     
     async def stop_job(self, job_id: str) -> Dict[str, Any]:
@@ -531,8 +679,7 @@ class EnhancedAIOrchestrator:
         job.completed_at = datetime.utcnow().isoformat()
         
         # Move to history
-        self.job_history.append(job)
-        del self.active_jobs[job_id]
+        self._archive_job(job)
         
         await self._notify_websockets('job_stopped', job)
         
@@ -540,9 +687,23 @@ class EnhancedAIOrchestrator:
     
     async def list_jobs(self) -> Dict[str, Any]:
         """List all enhanced jobs"""
+        active_jobs = [self._job_payload(job) for job in self.active_jobs.values()]
+        job_history = []
+        
+        # Include jobs owned by other workers and finished jobs from the store
+        for job in job_store.list_jobs(kind='enhanced', limit=50):
+            if job['id'] in self.active_jobs:
+                continue
+            if job['status'] in ACTIVE_JOB_STATUSES:
+                job['tasks'] = job_store.get_tasks(job['id'])
+                active_jobs.append(job)
+            elif len(job_history) < 10:
+                job['tasks'] = job_store.get_tasks(job['id'])
+                job_history.append(job)
+        
         return {
-            'active_jobs': [asdict(job) for job in self.active_jobs.values()],
-            'job_history': [asdict(job) for job in self.job_history[-10:]]
+            'active_jobs': active_jobs,
+            'job_history': job_history
         }
     
     async def health_check(self) -> Dict[str, Any]:
@@ -0,0 +1,68 @@
+"""
+Background event loop - a long-lived asyncio loop on a daemon thread
+
+Request handlers use asyncio.run(), so any work they start dies with the
+request. Work that must outlive the request (for example a streamed batch
+that keeps executing after its upload finishes) is submitted here instead.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """Lazily started event loop thread, restarted after a fork"""
+
+    def __init__(self, name: str = 'background-loop'):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the running loop, starting its thread on first use"""
+        if self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(loop, ready), name=self.name, daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                self._pid = os.getpid()
+                logger.info(f"Started {self.name} event loop thread")
+        return self._loop
+
+    def _run(self, loop: asyncio.AbstractEventLoop, ready: threading.Event):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule a coroutine on the background loop from any thread"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+        future.add_done_callback(self._log_failure)
+        return future
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any):
+        """Run a plain callback on the background loop from any thread"""
+        self.get_loop().call_soon_threadsafe(callback, *args)
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Background task failed: {future.exception()}")
+
+
+# Global background loop instance
+background_loop = BackgroundLoop()
@@ -1,24 +1,87 @@
 import asyncio
 import json
+import os
 from typing import List, Dict, Any, Optional
-import google.generativeai as genai
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
+from services import metrics
+from services.llm_backends import create_backend, estimate_tokens
+from services.retry_policy import RATE_LIMITED, classify_error
+from services.token_budget import token_budget
+
 logger = logging.getLogger(__name__)
 
+# Pack short prompts of a batch into shared requests (see process_batch)
+PACK_PROMPTS = os.getenv('GEMINI_PACK_PROMPTS', 'true').lower() in ('1', 'true', 'yes')
+
+# Estimated input tokens per packed request, instructions included
+PACK_TOKEN_BUDGET = int(os.getenv('GEMINI_PACK_TOKEN_BUDGET', '2000'))
+
+# Prompts per packed request
+PACK_MAX_PROMPTS = int(os.getenv('GEMINI_PACK_MAX_PROMPTS', '16'))
+
+# Longer prompts are always sent on their own
+PACK_PROMPT_MAX_TOKENS = int(os.getenv('GEMINI_PACK_PROMPT_MAX_TOKENS', '300'))
+
+# Line that introduces the tasks of a packed request
+PACKED_TASKS_MARKER = 'Tasks (JSON array):'
+
+PACKED_INSTRUCTIONS = """You will receive several independent tasks as a JSON array of {"index", "prompt"} objects.
+Handle each task on its own, as if it were the only one, and write a clear, actionable response.
+Reply with only a JSON array holding one {"index": <task index>, "response": "<your response>"} object
+per task, using the same indexes, and no other text.
+"""
+
+
+def parse_packed_response(text: str, indexes: List[int]) -> Dict[int, str]:
+    """
+    Responses by index from a packed reply
+    
+    Items that are missing, duplicated, empty or not strings are left out,
+    as is everything when the reply is not a JSON array.
+    """
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end < start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+    
+    expected = set(indexes)
+    responses: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index, response = item.get('index'), item.get('response')
+        if type(index) is int and index in expected and index not in responses \
+                and isinstance(response, str) and response.strip():
+            responses[index] = response
+    return responses
+
 @dataclass
 class GeminiConfig:
     api_key: str
     model: str = "gemini-1.5-flash"
     temperature: float = 0.7
     max_tokens: int = 1000
+    backend: str = field(default_factory=lambda: os.getenv('LLM_BACKEND', 'gemini'))
+    base_url: Optional[str] = None  # Stand-in server; defaults to LLM_STANDIN_URL
+    stream: bool = False
+    
+    @property
+    def requires_api_key(self) -> bool:
+        return self.backend == 'gemini'
 
 class GeminiService:
     def __init__(self, config: GeminiConfig):
         self.config = config
-        genai.configure(api_key=config.api_key)
-        self.model = genai.GenerativeModel(config.model)
+        self.backend = create_backend(config)
+        # Running average of completion lengths, reserved from the token budget per request
+        self._expected_completion_tokens = config.max_tokens // 4
     
     async def process_prompt(self, prompt: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Process a single prompt through Gemini"""
@@ -27,53 +90,160 @@ class GeminiService:
             enhanced_prompt = self._enhance_prompt(prompt, context)
             
             # Generate response
-            response = await asyncio.get_event_loop().run_in_executor(
-                None, 
-                lambda: self.model.generate_content(enhanced_prompt)
-            )
+            completion = await self._generate(enhanced_prompt)
             
             return {
                 'success': True,
-                'response': response.text,
+                'response': completion.text,
                 'usage': {
-                    'prompt_tokens': len(enhanced_prompt.split()),
-                    'completion_tokens': len(response.text.split()) if response.text else 0
+                    'prompt_tokens': completion.prompt_tokens,
+                    'completion_tokens': completion.completion_tokens,
+                    'estimated': completion.estimated
                 }
             }
         except Exception as e:
             logger.error(f"Gemini processing failed: {str(e)}")
+            metrics.GEMINI_ERRORS.inc(model=self.config.model)
             return {
                 'success': False,
                 'error': str(e),
                 'response': None
             }
     
-    async def process_batch(self, prompts: List[str], context: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Process multiple prompts in parallel"""
-        tasks = [
-            self.process_prompt(prompt, context) 
-            for prompt in prompts
-        ]
+    async def _generate(self, text: str, replies: int = 1):
+        """
+        One backend call, timed and admitted against the token budget; raises on failure
+        
+        The reservation (prompt estimate plus the expected completion for each
+        of replies answers) is settled with the reported usage, or returned
+        when the call fails.
+        """
+        reserved = estimate_tokens(text) + self._expected_completion_tokens * replies
+        reserved = await token_budget.acquire(reserved)
+        try:
+            with metrics.GEMINI_REQUEST_SECONDS.time(model=self.config.model):
+                completion = await self.backend.generate(text)
+        except Exception as e:
+            token_budget.settle(reserved, 0)
+            if classify_error(e) == RATE_LIMITED:
+                token_budget.throttle()
+            raise
+        token_budget.settle(reserved, completion.total_tokens)
+        self._expected_completion_tokens = round(
+            0.8 * self._expected_completion_tokens + 0.2 * completion.completion_tokens / replies
+        )
+        return completion
+    
+    async def process_batch(
+        self, 
+        prompts: List[str], 
+        context: Dict[str, Any] = None, 
+        pack: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process multiple prompts in parallel
+        
+        With packing (GEMINI_PACK_PROMPTS, or pack), short prompts are grouped
+        into requests under PACK_TOKEN_BUDGET that ask for an indexed JSON
+        array back. Prompts whose item is missing or malformed in the reply,
+        and those of a failed packed request, are retried individually.
+        Results keep the order of prompts; packed ones carry 'packed': True and
+        their share of the request's usage.
+        """
+        pack = PACK_PROMPTS if pack is None else pack
+        tasks = []
+        if pack and len(prompts) > 1:
+            packed_indexes, single_indexes = self._plan_packs(prompts)
+            tasks.extend(self._process_pack(prompts, indexes, context) for indexes in packed_indexes)
+            tasks.extend(self._process_single(prompts[i], context, i) for i in single_indexes)
+        else:
+            tasks.extend(self._process_single(prompt, context, i) for i, prompt in enumerate(prompts))
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Handle exceptions
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    'success': False,
-                    'error': str(result),
-                    'prompt_index': i
-                })
-            else:
-                processed_results.append({
-                    **result,
-                    'prompt_index': i
-                })
+        processed_results: List[Optional[Dict[str, Any]]] = [None] * len(prompts)
+        for task_results in results:
+            if isinstance(task_results, Exception):
+                logger.error(f"Gemini batch task failed: {str(task_results)}")
+                continue
+            for i, result in task_results:
+                processed_results[i] = {**result, 'prompt_index': i}
+        for i, result in enumerate(processed_results):
+            if result is None:
+                processed_results[i] = {'success': False, 'error': 'Prompt was not processed', 'prompt_index': i}
         
         return processed_results
     
+    def _plan_packs(self, prompts: List[str]):
+        """Greedy in-order groups of short prompts under the token budget, and the prompts sent alone"""
+        budget = PACK_TOKEN_BUDGET - estimate_tokens(PACKED_INSTRUCTIONS)
+        packs: List[List[int]] = []
+        singles: List[int] = []
+        current: List[int] = []
+        used = 0
+        for i, prompt in enumerate(prompts):
+            tokens = estimate_tokens(prompt)
+            if tokens > PACK_PROMPT_MAX_TOKENS:
+                singles.append(i)
+                continue
+            if current and (used + tokens > budget or len(current) >= PACK_MAX_PROMPTS):
+                packs.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += tokens
+        if current:
+            packs.append(current)
+        
+        # A pack of one is just an individual request
+        singles.extend(pack[0] for pack in packs if len(pack) == 1)
+        return [pack for pack in packs if len(pack) > 1], sorted(singles)
+    
+    async def _process_single(self, prompt: str, context: Optional[Dict[str, Any]], index: int):
+        return [(index, await self.process_prompt(prompt, context))]
+    
+    async def _process_pack(self, prompts: List[str], indexes: List[int], context: Optional[Dict[str, Any]]):
+        """One packed request for prompts[indexes], falling back to individual calls per missing item"""
+        tasks = json.dumps([{'index': i, 'prompt': prompts[i]} for i in indexes], ensure_ascii=False)
+        packed_prompt = PACKED_INSTRUCTIONS
+        if context:
+            packed_prompt += f"\nContext for every task: {json.dumps(context)}\n"
+        packed_prompt += f"\n{PACKED_TASKS_MARKER}\n{tasks}\n"
+        
+        responses: Dict[int, str] = {}
+        try:
+            completion = await self._generate(packed_prompt, replies=len(indexes))
+            responses = parse_packed_response(completion.text, indexes)
+        except Exception as e:
+            logger.warning(f"Packed Gemini request for {len(indexes)} prompts failed: {str(e)}")
+            metrics.GEMINI_ERRORS.inc(model=self.config.model)
+        
+        results = []
+        if responses:
+            # Split the request's usage by each item's share of the text
+            prompt_weight = sum(estimate_tokens(prompts[i]) for i in responses)
+            completion_weight = sum(len(r) for r in responses.values()) or 1
+            for i, response in responses.items():
+                results.append((i, {
+                    'success': True,
+                    'response': response,
+                    'packed': True,
+                    'usage': {
+                        'prompt_tokens': round(completion.prompt_tokens * estimate_tokens(prompts[i]) / prompt_weight),
+                        'completion_tokens': round(completion.completion_tokens * len(response) / completion_weight),
+                        'estimated': completion.estimated
+                    }
+                }))
+        metrics.GEMINI_PACKED_PROMPTS.inc(len(responses), outcome='packed')
+        
+        missing = [i for i in indexes if i not in responses]
+        if missing:
+            logger.info(f"Packed request answered {len(responses)}/{len(indexes)} prompts; sending {len(missing)} individually")
+            metrics.GEMINI_PACKED_PROMPTS.inc(len(missing), outcome='fallback')
+            fallbacks = await asyncio.gather(*(self.process_prompt(prompts[i], context) for i in missing))
+            results.extend(zip(missing, fallbacks))
+        return results
+        
     def _enhance_prompt(self, prompt: str, context: Dict[str, Any] = None) -> str:
         """Enhance prompt with context and formatting"""
         if not context:
@@ -95,7 +265,9 @@ Please provide a clear, actionable response that considers the given context.
             return {
                 'status': 'healthy',
                 'api_accessible': test_response['success'],
-                'model': self.config.model
+                'model': self.config.model,
+                'backend': self.backend.name,
+                'token_budget': token_budget.snapshot()
             }
         except Exception as e:
             return {
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 from enum import Enum
 import logging
 
+from .job_store import job_store
+
 logger = logging.getLogger(__name__)
 
 class ApprovalStatus(Enum):
@@ -115,11 +117,13 @@ class HumanApprovalService:
             # Still notify observers but don't wait
             await self._notify_websockets('auto_approval', approval_request)
             self.approval_history.append(approval_request)
+            self._persist(approval_request)
             
             return approval_request
         
         # Store for human review
         self.pending_approvals[request_id] = approval_request
+        self._persist(approval_request, sync=True)
         
         # Notify via WebSocket
         await self._notify_websockets('approval_request', approval_request)
@@ -137,11 +141,15 @@ class HumanApprovalService:
     ) -> bool:
         """Human response to approval request"""
         
-        if approval_id not in self.pending_approvals:
-            logger.error(f"Approval request {approval_id} not found")
-            return False
+        if approval_id in self.pending_approvals:
+            approval_request = self.pending_approvals[approval_id]
+        else:
+            # The request may be waiting on another worker
+            approval_request = self._load(approval_id)
+            if not approval_request or approval_request.status != ApprovalStatus.PENDING:
+                logger.error(f"Approval request {approval_id} not found")
+                return False
         
-        approval_request = self.pending_approvals[approval_id]
         approval_request.status = decision
         approval_request.responded_at = datetime.utcnow().isoformat()
         approval_request.response_data = {
@@ -152,7 +160,8 @@ class HumanApprovalService:
         
         # Move to history
         self.approval_history.append(approval_request)
-        del self.pending_approvals[approval_id]
+        self.pending_approvals.pop(approval_id, None)
+        self._persist(approval_request, sync=True)
         
         # Notify via WebSocket
         await self._notify_websockets('approval_response', approval_request)
@@ -178,6 +187,13 @@ class HumanApprovalService:
                 # Not found anywhere
                 raise ValueError(f"Approval request {approval_id} not found")
             
+            # Pick up decisions made through another worker
+            stored = self._load(approval_id)
+            if stored and stored.status != ApprovalStatus.PENDING:
+                self.approval_history.append(stored)
+                del self.pending_approvals[approval_id]
+                return stored
+            
             # Still pending, wait a bit
             await asyncio.sleep(1)
         
@@ -193,6 +209,7 @@ class HumanApprovalService:
         # Move to history
         self.approval_history.append(approval_request)
         del self.pending_approvals[approval_id]
+        self._persist(approval_request, sync=True)
         
         # Notify timeout
         await self._notify_websockets('approval_timeout', approval_request)
@@ -251,6 +268,19 @@ class HumanApprovalService:
         self.auto_approval_settings.update(settings)
         logger.info(f"Updated auto-approval settings: {self.auto_approval_settings}")
     
+    def _persist(self, approval_request: ApprovalRequest, sync: bool = False):
+        """Write an approval request to the shared job store"""
+        job_store.save_approval(asdict(approval_request), sync=sync)
+    
+    def _load(self, approval_id: str) -> Optional[ApprovalRequest]:
+        """Load an approval request from the shared job store"""
+        record = job_store.get_approval(approval_id)
+        if not record:
+            return None
+        record['status'] = ApprovalStatus(record['status'])
+        record['confidence_level'] = ConfidenceLevel(record['confidence_level'])
+        return ApprovalRequest(**record)
+    
     def _determine_confidence_level(self, confidence: float) -> ConfidenceLevel:
         """Determine confidence level from confidence score"""
         if confidence < 0.3:
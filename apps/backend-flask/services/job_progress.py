@@ -0,0 +1,148 @@
+"""
+Job progress counters maintained incrementally on task state transitions
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+TERMINAL_TASK_STATUSES = ('completed', 'failed')
+
+
+def _max_confidence(scores: Optional[Dict[str, float]]) -> float:
+    return max(scores.values()) if scores else 0.0
+
+
+def _add_usage(totals: Optional[Dict[str, int]], usage: Dict[str, Any]) -> Dict[str, int]:
+    totals = totals if totals is not None else {'prompt_tokens': 0, 'completion_tokens': 0, 'estimated_tokens': 0}
+    prompt_tokens, completion_tokens = usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+    totals['prompt_tokens'] += prompt_tokens
+    totals['completion_tokens'] += completion_tokens
+    # Either one call's usage or totals being merged
+    if 'estimated_tokens' in usage:
+        totals['estimated_tokens'] += usage['estimated_tokens']
+    elif usage.get('estimated'):
+        totals['estimated_tokens'] += prompt_tokens + completion_tokens
+    return totals
+
+
+@dataclass
+class JobProgress:
+    """
+    Per-job aggregates kept in step with task transitions so that status
+    polls are O(1) regardless of job size
+    """
+    total: int = 0
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    confidence_total: float = 0.0
+    duration_total_seconds: float = 0.0
+    timed_tasks: int = 0
+    approval_requests: int = 0
+    human_interventions: int = 0
+    unique_prompts: int = 0
+    reused_results: Dict[str, int] = field(default_factory=dict)  # Gemini calls saved, by kind
+    token_usage: Optional[Dict[str, int]] = None
+    token_usage_by_platform: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_tasks(cls, tasks: List[Any]) -> 'JobProgress':
+        """Build counters for a freshly created (or reloaded) job"""
+        progress = cls(total=len(tasks))
+        progress.unique_prompts = len({getattr(task, 'fingerprint', None) or task.id for task in tasks})
+        for task in tasks:
+            progress.status_counts[task.status] = progress.status_counts.get(task.status, 0) + 1
+            progress.confidence_total += _max_confidence(getattr(task, 'confidence_scores', None))
+            progress.approval_requests += len(getattr(task, 'approval_requests', None) or [])
+            progress.human_interventions += len(getattr(task, 'human_interventions', None) or [])
+            if getattr(task, 'token_usage', None):
+                progress._add_platform_usage(task.target_platform, task.token_usage)
+        return progress
+
+    def transition(self, task: Any, status: str, error: Optional[str] = None):
+        """
+        Move a task to a new status, updating counters and timestamps
+
+        This is the only place task.status should be assigned.
+        """
+        previous = task.status
+        if previous != status:
+            self.status_counts[previous] = self.status_counts.get(previous, 0) - 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            task.status = status
+
+        now = datetime.utcnow()
+        if status == 'processing' and getattr(task, 'started_at', None) is None:
+            task.started_at = now.isoformat()
+
+        if error is not None:
+            task.error = error
+
+        if status in TERMINAL_TASK_STATUSES and previous not in TERMINAL_TASK_STATUSES:
+            task.completed_at = now.isoformat()
+            started_at = getattr(task, 'started_at', None)
+            if started_at:
+                self.duration_total_seconds += (now - datetime.fromisoformat(started_at)).total_seconds()
+                self.timed_tasks += 1
+
+    def record_confidence(self, task: Any, scores: Dict[str, float]):
+        """Merge new confidence scores into a task, keeping the aggregate in step"""
+        self.confidence_total -= _max_confidence(task.confidence_scores)
+        task.confidence_scores.update(scores)
+        self.confidence_total += _max_confidence(task.confidence_scores)
+
+    def record_approval_request(self, task: Any, approval_id: str):
+        task.approval_requests.append(approval_id)
+        self.approval_requests += 1
+
+    def record_intervention(self, task: Any, intervention: Dict[str, Any]):
+        task.human_interventions.append(intervention)
+        self.human_interventions += 1
+
+    def record_reuse(self, kind: str):
+        """Count a Gemini result reused from an identical prompt instead of requested"""
+        self.reused_results[kind] = self.reused_results.get(kind, 0) + 1
+
+    def record_usage(self, task: Any, usage: Dict[str, Any]):
+        """Add a Gemini call's token usage to the task, job and platform totals"""
+        task.token_usage = _add_usage(task.token_usage, usage)
+        self._add_platform_usage(task.target_platform, usage)
+
+    def _add_platform_usage(self, platform: str, usage: Dict[str, Any]):
+        self.token_usage = _add_usage(self.token_usage, usage)
+        self.token_usage_by_platform[platform] = _add_usage(self.token_usage_by_platform.get(platform), usage)
+
+    def count(self, status: str) -> int:
+        return self.status_counts.get(status, 0)
+
+    def summary(self, include_approvals: bool = True) -> Dict[str, Any]:
+        """Progress summary in the shape returned by get_job_status"""
+        summary = {
+            'progress': {
+                'total': self.total,
+                'completed': self.count('completed'),
+                'failed': self.count('failed'),
+                'processing': self.count('processing'),
+                'analyzing': self.count('analyzing'),
+                'pending': self.count('pending')
+            },
+            'timing': {
+                'total_task_seconds': self.duration_total_seconds,
+                'average_task_seconds': self.duration_total_seconds / self.timed_tasks if self.timed_tasks else 0
+            },
+            'dedup': {
+                'unique_prompts': self.unique_prompts,
+                'duplicate_tasks': self.total - self.unique_prompts,
+                'reused_results': dict(self.reused_results),
+                'gemini_calls_saved': sum(self.reused_results.values())
+            },
+            'tokens': {
+                **(self.token_usage or _add_usage(None, {})),
+                'by_platform': {platform: dict(usage) for platform, usage in self.token_usage_by_platform.items()}
+            }
+        }
+        if include_approvals:
+            summary['approval_stats'] = {
+                'total_approvals': self.approval_requests,
+                'human_interventions': self.human_interventions,
+                'average_confidence': self.confidence_total / self.total if self.total else 0
+            }
+        return summary
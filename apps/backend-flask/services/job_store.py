@@ -0,0 +1,726 @@
+"""
+Job Store - durable SQLite (WAL) storage for jobs, tasks, batches and approvals
+
+Every gunicorn worker opens the same database file, so a status request that
+lands on a different worker (or arrives after a restart) still finds the job.
+Writes are buffered and flushed in small transactions by a background thread;
+repeated updates to the same row between flushes collapse into one write.
+"""
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+
+from utils.wire_format import encode_message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'autopromptr.db'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT,
+    started_at TEXT,
+    completed_at TEXT,
+    updated_at REAL NOT NULL,
+    total_tasks INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_created ON jobs (kind, created_at, job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind_status_created ON jobs (kind, status, created_at, job_id);
+CREATE INDEX IF NOT EXISTS idx_jobs_name ON jobs (name);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_job_position ON tasks (job_id, position);
+CREATE INDEX IF NOT EXISTS idx_tasks_job_status ON tasks (job_id, status);
+
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT,
+    status TEXT NOT NULL,
+    total_prompts INTEGER NOT NULL DEFAULT 0,
+    completed_prompts INTEGER NOT NULL DEFAULT 0,
+    failed_prompts INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    updated_at REAL NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_batches_kind_status_updated ON batches (kind, status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_batches_kind_updated ON batches (kind, updated_at);
+CREATE INDEX IF NOT EXISTS idx_batches_kind_created ON batches (kind, created_at, batch_id);
+CREATE INDEX IF NOT EXISTS idx_batches_kind_status_created ON batches (kind, status, created_at, batch_id);
+
+CREATE TABLE IF NOT EXISTS batch_prompts (
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    prompt_id TEXT,
+    status TEXT NOT NULL,
+    text TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT,
+    payload TEXT,
+    PRIMARY KEY (batch_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    url TEXT,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS shard_leases (
+    domain TEXT PRIMARY KEY,
+    node_id TEXT NOT NULL,
+    epoch INTEGER NOT NULL DEFAULT 1,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shard_leases_node ON shard_leases (node_id);
+
+CREATE TABLE IF NOT EXISTS approvals (
+    approval_id TEXT PRIMARY KEY,
+    task_id TEXT,
+    status TEXT NOT NULL,
+    action_type TEXT,
+    created_at TEXT,
+    responded_at TEXT,
+    updated_at REAL NOT NULL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_approvals_status_created ON approvals (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_approvals_task ON approvals (task_id);
+"""
+
+PRIMARY_KEYS = {
+    'jobs': 'job_id',
+    'tasks': 'task_id',
+    'batches': 'batch_id',
+    'approvals': 'approval_id',
+}
+
+
+def _dumps(value: Any) -> str:
+    return encode_message(value)
+
+
+def _loads(value: Optional[str]) -> Any:
+    return json.loads(value) if value else None
+
+
+# Upper bound on rows returned by one page of a listing query
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: Optional[str], key: str) -> str:
+    """Opaque keyset cursor pointing just past (created_at, key)"""
+    raw = f"{created_at or ''}\x1f{key}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        created_at, key = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('\x1f', 1)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return created_at, key
+
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the requested top-level fields of a record"""
+    if not fields:
+        return record
+    return {name: record[name] for name in fields if name in record}
+
+
+class JobStore:
+    """SQLite-backed store with write-behind batching of row updates"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, flush_interval: float = 0.05):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._local = threading.local()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+    # Connections
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def _ensure_started(self):
+        """Open the writer and start the flush thread (again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._write_lock:
+            if self._pid == os.getpid():
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = self._connect()
+            self._writer.executescript(SCHEMA)
+            self._migrate(self._writer)
+            self._local = threading.local()
+            self._pid = os.getpid()
+            self._closed = False
+            self._thread = threading.Thread(target=self._flush_loop, name='job-store-writer', daemon=True)
+            self._thread.start()
+            logger.info(f"Job store opened at {self.path}")
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add columns introduced after a table was first created"""
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(batch_prompts)')}
+        if 'payload' not in columns:
+            conn.execute('ALTER TABLE batch_prompts ADD COLUMN payload TEXT')
+
+    def _reader(self) -> sqlite3.Connection:
+        self._ensure_started()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    # Write-behind
+
+    def _enqueue(self, table: str, row: Dict[str, Any], sync: bool = False):
+        self._ensure_started()
+        row['updated_at'] = time.time()
+        with self._pending_lock:
+            self._pending[(table, row[PRIMARY_KEYS[table]])] = row
+        if sync:
+            self.flush()
+        else:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait()
+            # Give concurrent updates a moment to coalesce into one transaction
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Job store flush failed: {str(e)}")
+
+    def flush(self):
+        """
+        Write all buffered rows in a single transaction
+
+        The write lock is held from taking the buffer to the commit, so
+        flushes commit in the order they took their rows and an older batch
+        can never replace a newer one.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                if not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+
+            grouped: Dict[Tuple[str, Tuple[str, ...]], List[Tuple]] = {}
+            for (table, _), row in pending.items():
+                columns = tuple(row.keys())
+                grouped.setdefault((table, columns), []).append(tuple(row[c] for c in columns))
+
+            try:
+                self._writer.execute('BEGIN IMMEDIATE')
+                for (table, columns), rows in grouped.items():
+                    placeholders = ', '.join('?' for _ in columns)
+                    self._writer.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                        rows
+                    )
+                self._writer.execute('COMMIT')
+            except Exception:
+                self._writer.execute('ROLLBACK')
+                # Put rows back unless a newer version was queued meanwhile
+                with self._pending_lock:
+                    for key, row in pending.items():
+                        self._pending.setdefault(key, row)
+                raise
+
+    def _write_many(self, sql: str, rows: List[Tuple]):
+        """Write rows immediately in one transaction, bypassing the write-behind buffer"""
+        self._write_statements([(sql, rows)])
+
+    def _write_statements(self, statements: List[Tuple[str, List[Tuple]]]):
+        """Run several (sql, rows) statements immediately in one transaction"""
+        self._ensure_started()
+        with self._write_lock:
+            try:
+                self._writer.execute('BEGIN IMMEDIATE')
+                for sql, rows in statements:
+                    self._writer.executemany(sql, rows)
+                self._writer.execute('COMMIT')
+            except Exception:
+                self._writer.execute('ROLLBACK')
+                raise
+
+    def _pending_row(self, table: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._pending_lock:
+            row = self._pending.get((table, key))
+            return dict(row) if row else None
+
+    def close(self):
+        """Flush outstanding writes and stop the writer thread"""
+        if self._pid != os.getpid():
+            return
+        self.flush()
+        self._closed = True
+        self._wakeup.set()
+
+    # Jobs and tasks
+
+    def save_job(self, kind: str, job: Dict[str, Any], summary: Optional[Dict[str, Any]] = None, sync: bool = False):
+        """Persist a job row; `job` is the job dict without its task list"""
+        payload = {k: v for k, v in job.items() if k != 'tasks'}
+        self._enqueue('jobs', {
+            'job_id': job['id'],
+            'kind': kind,
+            'name': job.get('name'),
+            'status': job.get('status', 'queued'),
+            'created_at': job.get('created_at'),
+            'started_at': job.get('started_at'),
+            'completed_at': job.get('completed_at'),
+            'total_tasks': job.get('total_tasks', len(job.get('tasks') or [])),
+            'summary': _dumps(summary) if summary is not None else None,
+            'payload': _dumps(payload)
+        }, sync=sync)
+
+    def save_task(self, job_id: str, position: int, task: Dict[str, Any], sync: bool = False):
+        """Persist a single task row"""
+        self._enqueue('tasks', {
+            'task_id': task['id'],
+            'job_id': job_id,
+            'position': position,
+            'status': task.get('status', 'pending'),
+            'payload': _dumps(task)
+        }, sync=sync)
+
+    def get_job(self, job_id: str, include_tasks: bool = False) -> Optional[Dict[str, Any]]:
+        """Load a job by id; returns the job dict with `summary` and optional `tasks`"""
+        row = self._pending_row('jobs', job_id)
+        if row is None:
+            found = self._reader().execute(
+                'SELECT * FROM jobs WHERE job_id = ?', (job_id,)
+            ).fetchone()
+            if found is None:
+                return None
+            row = dict(found)
+
+        job = _loads(row['payload']) or {}
+        job.update({
+            'id': row['job_id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'total_tasks': row['total_tasks'],
+            'summary': _loads(row['summary'])
+        })
+        if include_tasks:
+            job['tasks'] = self.get_tasks(job_id)
+        return job
+
+    def get_tasks(self, job_id: str) -> List[Dict[str, Any]]:
+        """Load all tasks of a job in submission order"""
+        self.flush()
+        rows = self._reader().execute(
+            'SELECT payload FROM tasks WHERE job_id = ? ORDER BY position', (job_id,)
+        ).fetchall()
+        return [_loads(r['payload']) for r in rows]
+
+    def list_jobs(self, kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """List job rows (without tasks), newest first"""
+        self.flush()
+        clauses, params = [], []
+        if kind:
+            clauses.append('kind = ?')
+            params.append(kind)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT * FROM jobs {where} ORDER BY created_at DESC, job_id DESC LIMIT ?',
+            (*params, limit)
+        ).fetchall()
+        jobs = []
+        for row in rows:
+            job = _loads(row['payload']) or {}
+            job.update({'id': row['job_id'], 'status': row['status'], 'summary': _loads(row['summary'])})
+            jobs.append(job)
+        return jobs
+
+    def _page(
+        self,
+        table: str,
+        kind: Optional[str],
+        statuses: Optional[List[str]],
+        name: Optional[str],
+        created_after: Optional[str],
+        created_before: Optional[str],
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """Keyset-paginated listing ordered by (created_at, id) descending"""
+        self.flush()
+        key_column = PRIMARY_KEYS[table]
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], []
+        if kind:
+            clauses.append('kind = ?')
+            params.append(kind)
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if name:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            escaped = name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if created_after:
+            clauses.append('created_at >= ?')
+            params.append(created_after)
+        if created_before:
+            clauses.append('created_at < ?')
+            params.append(created_before)
+        if cursor:
+            cursor_created, cursor_key = decode_cursor(cursor)
+            clauses.append(f'(created_at < ? OR (created_at = ? AND {key_column} < ?))')
+            params.extend([cursor_created, cursor_created, cursor_key])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT * FROM {table} {where} ORDER BY created_at DESC, {key_column} DESC LIMIT ?',
+            (*params, limit + 1)
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1][key_column])
+        return rows, next_cursor
+
+    def query_jobs(
+        self,
+        kind: Optional[str] = None,
+        statuses: Optional[List[str]] = None,
+        name: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        List job summaries (never task payloads) one page at a time
+        
+        Returns {'jobs': [...], 'next_cursor': str or None}.
+        """
+        rows, next_cursor = self._page(
+            'jobs', kind, statuses, name, created_after, created_before, cursor, limit
+        )
+        jobs = []
+        for row in rows:
+            job = _loads(row['payload']) or {}
+            job.update({
+                'id': row['job_id'],
+                'kind': row['kind'],
+                'status': row['status'],
+                'total_tasks': row['total_tasks'],
+                **(_loads(row['summary']) or {})
+            })
+            jobs.append(project(job, fields))
+        return {'jobs': jobs, 'next_cursor': next_cursor}
+
+    # Batches
+
+    def save_batch(self, kind: str, batch_id: str, record: Dict[str, Any], sync: bool = False):
+        """Persist a batch progress record"""
+        self._enqueue('batches', {
+            'batch_id': batch_id,
+            'kind': kind,
+            'name': record.get('batch_name') or record.get('name'),
+            'status': record.get('status', 'pending'),
+            'total_prompts': record.get('total_prompts', 0),
+            'completed_prompts': record.get('completed_prompts', record.get('completed', 0)),
+            'failed_prompts': record.get('failed_prompts', record.get('failed', 0)),
+            'created_at': record.get('created_at') or record.get('started_at') or '',
+            'payload': _dumps(record)
+        }, sync=sync)
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Load a batch progress record by id"""
+        row = self._pending_row('batches', batch_id)
+        if row is None:
+            found = self._reader().execute(
+                'SELECT payload FROM batches WHERE batch_id = ?', (batch_id,)
+            ).fetchone()
+            if found is None:
+                return None
+            row = dict(found)
+        return _loads(row['payload'])
+
+    def list_batches(self, kind: Optional[str] = None, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """List batch progress records, most recently updated first"""
+        self.flush()
+        clauses, params = [], []
+        if kind:
+            clauses.append('kind = ?')
+            params.append(kind)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._reader().execute(
+            f'SELECT payload FROM batches {where} ORDER BY updated_at DESC LIMIT ?',
+            (*params, limit)
+        ).fetchall()
+        return [_loads(r['payload']) for r in rows]
+
+    def query_batches(
+        self,
+        kind: Optional[str] = None,
+        statuses: Optional[List[str]] = None,
+        name: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        List batch progress records one page at a time
+        
+        Returns {'batches': [...], 'next_cursor': str or None}.
+        """
+        rows, next_cursor = self._page(
+            'batches', kind, statuses, name, created_after, created_before, cursor, limit
+        )
+        return {
+            'batches': [project(_loads(row['payload']), fields) for row in rows],
+            'next_cursor': next_cursor
+        }
+
+    # Batch prompt queue
+
+    def append_prompts(self, batch_id: str, start: int, prompts: List[Dict[str, Any]], replace: bool = False):
+        """
+        Append prompts to a batch's durable queue at positions start, start+1, ...
+        
+        Written synchronously so a consumer polling next_prompts never sees
+        a gap in positions. With replace, rows left from an earlier run of
+        the same batch_id are deleted in the same transaction.
+        """
+        now = time.time()
+        rows = []
+        for offset, prompt in enumerate(prompts):
+            # Fields other than id and text (e.g. confidence) travel in payload
+            extra = {k: v for k, v in prompt.items() if k not in ('id', 'text')}
+            rows.append((
+                batch_id, start + offset, prompt.get('id') or f'prompt_{start + offset}', 'pending',
+                prompt['text'], now, _dumps(extra) if extra else None
+            ))
+        statements = [(
+            'INSERT OR REPLACE INTO batch_prompts '
+            '(batch_id, position, prompt_id, status, text, updated_at, payload) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )]
+        if replace:
+            statements.insert(0, ('DELETE FROM batch_prompts WHERE batch_id = ?', [(batch_id,)]))
+        self._write_statements(statements)
+
+    def clear_prompts(self, batch_id: str):
+        """Drop a batch's queued prompts and their results"""
+        self._write_many('DELETE FROM batch_prompts WHERE batch_id = ?', [(batch_id,)])
+
+    def next_prompts(self, batch_id: str, start: int, limit: int, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Queued prompts at start <= position < end (if given), in order (without results)"""
+        rows = self._reader().execute(
+            'SELECT position, prompt_id, status, text, payload FROM batch_prompts '
+            'WHERE batch_id = ? AND position >= ? AND position < ? ORDER BY position LIMIT ?',
+            (batch_id, start, end if end is not None else 2 ** 62, limit)
+        ).fetchall()
+        return [
+            {
+                **(_loads(r['payload']) or {}),
+                'position': r['position'], 'id': r['prompt_id'], 'status': r['status'], 'text': r['text']
+            }
+            for r in rows
+        ]
+
+    def complete_prompt(self, batch_id: str, position: int, status: str, result: Optional[Dict[str, Any]] = None):
+        """Record the outcome of a queued prompt"""
+        self._write_many(
+            'UPDATE batch_prompts SET status = ?, result = ?, updated_at = ? WHERE batch_id = ? AND position = ?',
+            [(status, _dumps(result) if result is not None else None, time.time(), batch_id, position)]
+        )
+
+    def get_prompt_results(self, batch_id: str, start: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """
+        Page through a queued batch's prompts and their results
+        
+        Returns {'results': [...], 'next_position': int or None}.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows = self._reader().execute(
+            'SELECT position, prompt_id, status, result FROM batch_prompts '
+            'WHERE batch_id = ? AND position >= ? ORDER BY position LIMIT ?',
+            (batch_id, start, limit + 1)
+        ).fetchall()
+        next_position = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_position = rows[-1]['position'] + 1
+        return {
+            'results': [
+                {
+                    'position': r['position'],
+                    'prompt_id': r['prompt_id'],
+                    'status': r['status'],
+                    **(_loads(r['result']) or {})
+                }
+                for r in rows
+            ],
+            'next_position': next_position
+        }
+
+    # Cluster membership and shard leases
+
+    def heartbeat_node(self, node_id: str, url: Optional[str]):
+        """Register a node or refresh its heartbeat"""
+        now = time.time()
+        self._write_many(
+            'INSERT INTO nodes (node_id, url, started_at, heartbeat_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(node_id) DO UPDATE SET url = excluded.url, heartbeat_at = excluded.heartbeat_at',
+            [(node_id, url, now, now)]
+        )
+
+    def remove_node(self, node_id: str):
+        """Deregister a node and drop its leases (graceful shutdown)"""
+        self._write_many('DELETE FROM shard_leases WHERE node_id = ?', [(node_id,)])
+        self._write_many('DELETE FROM nodes WHERE node_id = ?', [(node_id,)])
+
+    def live_nodes(self, ttl: float) -> List[Dict[str, Any]]:
+        """Nodes whose last heartbeat is within ttl seconds"""
+        rows = self._reader().execute(
+            'SELECT node_id, url, started_at, heartbeat_at FROM nodes WHERE heartbeat_at >= ? ORDER BY node_id',
+            (time.time() - ttl,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_lease(self, domain: str) -> Optional[Dict[str, Any]]:
+        """Current lease row for a domain, expired or not"""
+        row = self._reader().execute(
+            'SELECT domain, node_id, epoch, expires_at FROM shard_leases WHERE domain = ?', (domain,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def acquire_lease(self, domain: str, node_id: str, ttl: float, steal_from: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Take or renew the lease on a domain
+        
+        The lease moves to node_id if it is free, expired, already held by
+        node_id, or held by one of steal_from (nodes known to be dead). The
+        epoch increments whenever the holder changes. Returns the lease row
+        after the attempt; compare its node_id to see who holds it.
+        """
+        now = time.time()
+        dead = list(steal_from or [])
+        dead_clause = f" OR shard_leases.node_id IN ({', '.join('?' for _ in dead)})" if dead else ''
+        self._write_many(
+            'INSERT INTO shard_leases (domain, node_id, epoch, expires_at) VALUES (?, ?, 1, ?) '
+            'ON CONFLICT(domain) DO UPDATE SET '
+            'epoch = shard_leases.epoch + (shard_leases.node_id != excluded.node_id), '
+            'node_id = excluded.node_id, expires_at = excluded.expires_at '
+            f'WHERE shard_leases.node_id = excluded.node_id OR shard_leases.expires_at < ?{dead_clause}',
+            [(domain, node_id, now + ttl, now, *dead)]
+        )
+        return self.get_lease(domain)
+
+    def renew_leases(self, node_id: str, domains: List[str], ttl: float):
+        """Extend every listed lease still held by node_id"""
+        if not domains:
+            return
+        expires_at = time.time() + ttl
+        self._write_many(
+            'UPDATE shard_leases SET expires_at = ? WHERE domain = ? AND node_id = ?',
+            [(expires_at, domain, node_id) for domain in domains]
+        )
+
+    def list_leases(self) -> List[Dict[str, Any]]:
+        """All shard leases, expired or not"""
+        rows = self._reader().execute(
+            'SELECT domain, node_id, epoch, expires_at FROM shard_leases ORDER BY domain'
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    # Approvals
+
+    def save_approval(self, approval: Dict[str, Any], sync: bool = False):
+        """Persist an approval request"""
+        status = approval.get('status', 'pending')
+        self._enqueue('approvals', {
+            'approval_id': approval['id'],
+            'task_id': approval.get('task_id'),
+            # asdict() keeps the ApprovalStatus enum; the column holds its value
+            'status': getattr(status, 'value', status),
+            'action_type': approval.get('action_type'),
+            'created_at': approval.get('created_at'),
+            'responded_at': approval.get('responded_at'),
+            'payload': _dumps(approval)
+        }, sync=sync)
+
+    def get_approval(self, approval_id: str) -> Optional[Dict[str, Any]]:
+        """Load an approval request by id"""
+        row = self._pending_row('approvals', approval_id)
+        if row is None:
+            found = self._reader().execute(
+                'SELECT payload FROM approvals WHERE approval_id = ?', (approval_id,)
+            ).fetchone()
+            if found is None:
+                return None
+            row = dict(found)
+        return _loads(row['payload'])
+
+
+# Global store instance
+job_store = JobStore(
+    path=os.getenv('JOB_STORE_PATH', DEFAULT_DB_PATH),
+    flush_interval=float(os.getenv('JOB_STORE_FLUSH_INTERVAL', '0.05'))
+)
@@ -0,0 +1,163 @@
+"""
+LLM backends - the model call behind GeminiService
+
+GeminiService builds the prompt, records metrics and turns errors into
+result dicts; a backend only turns prompt text into a completion. The
+`gemini` backend calls the Google SDK. The `standin` backend calls a local
+stand-in server (benchmarks/fake_llm_server.py) with configurable latency,
+token rate and injected errors, so both orchestrators run end to end with
+no network and no quota.
+
+Selected with LLM_BACKEND (gemini | standin); the stand-in is reached at
+LLM_STANDIN_URL. Token counts come from the backend's usage report, or from
+estimate_tokens when a response carries none.
+"""
+import asyncio
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STANDIN_URL = 'http://127.0.0.1:8900'
+
+# Seconds before a stand-in request is abandoned
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '60'))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    estimated: bool = False  # Counts come from estimate_tokens, not the backend
+
+    @classmethod
+    def from_usage(cls, prompt: str, text: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        """Completion with the reported counts, estimating any that are missing"""
+        estimated = prompt_tokens is None or completion_tokens is None
+        return cls(
+            text,
+            prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+            completion_tokens if completion_tokens is not None else (estimate_tokens(text) if text else 0),
+            estimated
+        )
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class RateLimitedError(Exception):
+    """The backend answered 429; the message keeps '429' so retry classification sees it"""
+
+
+class LLMBackend(ABC):
+    name = ''
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> Completion:
+        """Completion of the prompt text with its token counts"""
+
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, api_key: str, model: str):
+        # Imported here: the SDK takes most of a second to import and only
+        # Gemini-backed endpoints need it
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model)
+
+    async def generate(self, prompt: str) -> Completion:
+        response = await asyncio.get_event_loop().run_in_executor(
+            None,
+            lambda: self.model.generate_content(prompt)
+        )
+        text = response.text
+        usage = getattr(response, 'usage_metadata', None)
+        return Completion.from_usage(
+            prompt,
+            text,
+            getattr(usage, 'prompt_token_count', None),
+            getattr(usage, 'candidates_token_count', None)
+        )
+
+
+class StandInBackend(LLMBackend):
+    """Client for the local stand-in server; one keep-alive session per executor thread"""
+    name = 'standin'
+
+    def __init__(self, base_url: str, model: str, stream: bool = False):
+        self.url = base_url.rstrip('/') + '/v1/generate'
+        self.model = model
+        self.stream = stream
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+    def _request(self, prompt: str) -> Completion:
+        body = {'model': self.model, 'prompt': prompt, 'stream': self.stream}
+        with self._session().post(self.url, json=body, stream=self.stream, timeout=LLM_REQUEST_TIMEOUT) as response:
+            if response.status_code == 429:
+                raise RateLimitedError(
+                    f"429 Rate limited by stand-in (retry after {response.headers.get('Retry-After', '?')}s)"
+                )
+            if response.status_code != 200:
+                raise RuntimeError(f"Stand-in returned HTTP {response.status_code}")
+            if not self.stream:
+                data = response.json()
+                usage = data.get('usage') or {}
+                return Completion.from_usage(
+                    prompt, data['text'], usage.get('prompt_tokens'), usage.get('completion_tokens')
+                )
+
+            # NDJSON: text chunks, then a final line with the usage
+            chunks = []
+            usage: Optional[Dict[str, Any]] = None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if 'error' in event:
+                    raise RuntimeError(f"Stand-in stream failed: {event['error']}")
+                if 'text' in event:
+                    chunks.append(event['text'])
+                usage = event.get('usage', usage)
+            if usage is None:
+                raise RuntimeError('Stand-in stream ended without usage')
+            return Completion.from_usage(
+                prompt, ''.join(chunks), usage.get('prompt_tokens'), usage.get('completion_tokens')
+            )
+
+    async def generate(self, prompt: str) -> Completion:
+        return await asyncio.get_event_loop().run_in_executor(None, self._request, prompt)
+
+
+BACKENDS = ('gemini', 'standin')
+
+
+def create_backend(config) -> LLMBackend:
+    """Backend named by config.backend (a GeminiConfig)"""
+    if config.backend == 'gemini':
+        return GeminiBackend(config.api_key, config.model)
+    if config.backend == 'standin':
+        return StandInBackend(
+            config.base_url or os.getenv('LLM_STANDIN_URL', DEFAULT_STANDIN_URL), config.model, config.stream
+        )
+    raise ValueError(f"Unknown LLM backend {config.backend}; expected one of {', '.join(BACKENDS)}")
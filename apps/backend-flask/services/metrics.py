@@ -0,0 +1,234 @@
+"""
+Metrics - counters, gauges and histograms exposed in Prometheus text format
+
+A small in-process registry rather than prometheus_client: recording a value
+is a dict lookup and a few additions under a lock, so it can sit on the
+prompt hot path. Every gunicorn worker (and every batch worker process)
+keeps its own registry; /metrics reports the process that serves it.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Seconds; spans sub-second probes to multi-minute completion waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}', *self._samples()]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in values]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time from callables registered with track()"""
+    kind = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def track(self, function: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = function
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                values[key] = function()
+            except Exception:
+                continue
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {value}' for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the with-block, also when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        """Text exposition format, version 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Global registry and the pipeline's metrics
+registry = MetricsRegistry()
+
+GEMINI_REQUEST_SECONDS = registry.histogram(
+    'autopromptr_gemini_request_seconds', 'Gemini generate_content latency', ['model']
+)
+GEMINI_ERRORS = registry.counter(
+    'autopromptr_gemini_errors_total', 'Failed Gemini requests', ['model']
+)
+GEMINI_PACKED_PROMPTS = registry.counter(
+    'autopromptr_gemini_packed_prompts_total', 'Prompts of packed Gemini requests by outcome', ['outcome']
+)
+GEMINI_DEDUP = registry.counter(
+    'autopromptr_gemini_dedup_total', 'Gemini calls saved by reusing the result of an identical prompt', ['kind', 'source']
+)
+GEMINI_TOKENS = registry.counter(
+    'autopromptr_gemini_tokens_total', 'Gemini tokens spent by target platform', ['platform', 'type']
+)
+GEMINI_BUDGET_AVAILABLE = registry.gauge(
+    'autopromptr_gemini_budget_available_tokens', 'Tokens left in the per-minute Gemini budget'
+)
+GEMINI_BUDGET_WAITING = registry.gauge(
+    'autopromptr_gemini_budget_waiting', 'Gemini requests waiting for token budget'
+)
+GEMINI_BUDGET_WAIT_SECONDS = registry.histogram(
+    'autopromptr_gemini_budget_wait_seconds', 'Time Gemini requests waited for token budget'
+)
+NAVIGATION_SECONDS = registry.histogram(
+    'autopromptr_navigation_seconds', 'Page navigation time before submitting a prompt', ['platform']
+)
+SELECTOR_PROBE_SECONDS = registry.histogram(
+    'autopromptr_selector_probe_seconds', 'Time spent finding the chat input', ['platform']
+)
+PROCESSING_START_SECONDS = registry.histogram(
+    'autopromptr_processing_start_wait_seconds', 'Wait for the target to start processing a prompt', ['platform']
+)
+COMPLETION_WAIT_SECONDS = registry.histogram(
+    'autopromptr_completion_wait_seconds', 'Wait for the target to finish processing a prompt', ['platform', 'outcome']
+)
+SCREENSHOT_SECONDS = registry.histogram(
+    'autopromptr_screenshot_seconds', 'Verification screenshot capture time', ['platform']
+)
+PROMPTS = registry.counter(
+    'autopromptr_prompts_total', 'Prompts submitted through the browser', ['platform', 'status']
+)
+WEBSOCKET_BROADCAST_SECONDS = registry.histogram(
+    'autopromptr_websocket_broadcast_seconds', 'Time to deliver one broadcast to every recipient', ['scope'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+QUEUE_DEPTH = registry.gauge(
+    'autopromptr_queue_depth', 'Prompts waiting in active batches', ['service']
+)
+BROWSER_POOL_CONTEXTS = registry.gauge(
+    'autopromptr_browser_pool_contexts', 'Browser pool contexts by state', ['state']
+)
+BROWSER_POOL_ACQUIRED = registry.counter(
+    'autopromptr_browser_pool_acquired_total', 'Contexts taken from the browser pool', ['ready']
+)
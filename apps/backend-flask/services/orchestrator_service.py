@@ -1,30 +1,46 @@
 import asyncio
 import json
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 import logging
 from datetime import datetime
 import uuid
 
 from .gemini_service import GeminiService, GeminiConfig
 from .playwright_service import PlaywrightService
+from .platform_registry import platform_registry
+from .job_store import job_store
+from .job_progress import JobProgress
+from .prompt_cache import enhance_tasks, prompt_fingerprint
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
+# Finished jobs kept in memory; older ones are served from the job store
+JOB_HISTORY_LIMIT = 100
+
+ACTIVE_JOB_STATUSES = ('queued', 'running', 'paused')
+
 @dataclass
 class BatchTask:
     id: str
     prompt: str
     target_platform: str
+    target_url: Optional[str] = None  # Overrides the platform's registry URL
+    fingerprint: Optional[str] = None  # Dedup key of the normalized prompt and platform
     status: str = 'pending'
     result: Optional[Dict] = None
     error: Optional[str] = None
     created_at: str = None
+    started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    token_usage: Optional[Dict[str, int]] = None  # Gemini tokens spent on this task
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow().isoformat()
+        if self.fingerprint is None:
+            self.fingerprint = prompt_fingerprint(self.prompt, self.target_platform)
 
 @dataclass
 class BatchJob:
@@ -36,10 +52,13 @@ class BatchJob:
     created_at: str = None
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    progress: Optional[JobProgress] = None  # Counters maintained by task transitions
     
     def __post_init__(self):
         if self.created_at is None:
             self.created_at = datetime.utcnow().isoformat()
+        if self.progress is None:
+            self.progress = JobProgress.from_tasks(self.tasks)
 
 class AIOrchestrator:
     def __init__(self, gemini_config: GeminiConfig):
@@ -57,7 +76,8 @@ class AIOrchestrator:
             task = BatchTask(
                 id=f"{job_id}-task-{i}",
                 prompt=prompt_data.get('text', ''),
-                target_platform=prompt_data.get('platform', 'lovable')
+                target_platform=prompt_data.get('platform', 'lovable'),
+                target_url=prompt_data.get('target_url')
             )
             tasks.append(task)
         
@@ -69,6 +89,9 @@ class AIOrchestrator:
         )
         
         self.active_jobs[job_id] = job
+        self._persist_job(job)
+        for task in tasks:
+            self._persist_task(job, task)
         logger.info(f"Created batch job {job_id} with {len(tasks)} tasks")
         
         return job
@@ -81,6 +104,7 @@ class AIOrchestrator:
         job = self.active_jobs[job_id]
         job.status = 'running'
         job.started_at = datetime.utcnow().isoformat()
+        self._persist_job(job)
         
         logger.info(f"Starting batch job {job_id}")
         
@@ -88,16 +112,28 @@ class AIOrchestrator:
             # Process tasks in parallel batches
             batch_size = 3  # Process 3 tasks at a time
             for i in range(0, len(job.tasks), batch_size):
+                if job.status == 'stopped':
+                    break
                 batch_tasks = job.tasks[i:i + batch_size]
-                await self._process_task_batch(batch_tasks)
+                await self._process_task_batch(job, batch_tasks)
             
             # Check overall job status
-            failed_tasks = [t for t in job.tasks if t.status == 'failed']
-            completed_tasks = [t for t in job.tasks if t.status == 'completed']
+            failed_count = job.progress.count('failed')
+            completed_count = job.progress.count('completed')
             
-            if len(failed_tasks) == 0:
+            # stop_job has already archived the job
+            if job.status == 'stopped':
+                return {
+                    'job_id': job_id,
+                    'status': job.status,
+                    'total_tasks': job.progress.total,
+                    'completed_tasks': completed_count,
+                    'failed_tasks': failed_count
+                }
+            
+            if failed_count == 0:
                 job.status = 'completed'
-            elif len(completed_tasks) > 0:
+            elif completed_count > 0:
                 job.status = 'partial_success'
             else:
                 job.status = 'failed'
@@ -105,82 +141,132 @@ class AIOrchestrator:
             job.completed_at = datetime.utcnow().isoformat()
             
             # Move to history
-            self.job_history.append(job)
-            del self.active_jobs[job_id]
+            self._archive_job(job)
             
             return {
                 'job_id': job_id,
                 'status': job.status,
-                'total_tasks': len(job.tasks),
-                'completed_tasks': len(completed_tasks),
-                'failed_tasks': len(failed_tasks)
+                'total_tasks': job.progress.total,
+                'completed_tasks': completed_count,
+                'failed_tasks': failed_count
             }
             
         except Exception as e:
+            if job.status == 'stopped':
+                raise
             job.status = 'error'
             job.completed_at = datetime.utcnow().isoformat()
+            self._persist_job(job, sync=True)
             logger.error(f"Batch job {job_id} failed: {str(e)}")
             raise
     
-    async def _process_task_batch(self, tasks: List[BatchTask]):
+    async def _process_task_batch(self, job: BatchJob, tasks: List[BatchTask]):
         """Process a batch of tasks in parallel"""
+        for task in tasks:
+            self._transition_task(job, task, 'processing')
+        
+        # Step 1: Enhance the group's prompts with Gemini
+        with tracing.trace('enhance', job_id=job.id, tasks=len(tasks)):
+            enhancements = await enhance_tasks(self.gemini_service, job.progress, tasks)
+        
         async def process_single_task(task: BatchTask):
-            try:
-                task.status = 'processing'
-                
-                # Step 1: Enhance prompt with Gemini
-                gemini_result = await self.gemini_service.process_prompt(
-                    task.prompt,
-                    context={'target_platform': task.target_platform}
-                )
+            with tracing.trace('task', task_id=task.id, job_id=job.id) as root:
+                try:
+                    gemini_result = enhancements[task.id]
+                    root.set(packed=gemini_result.get('packed', False))
                 
-                if not gemini_result['success']:
-                    raise Exception(f"Gemini processing failed: {gemini_result['error']}")
+                    if not gemini_result['success']:
+                        raise Exception(f"Gemini processing failed: {gemini_result['error']}")
                 
-                enhanced_prompt = gemini_result['response']
+                    enhanced_prompt = gemini_result['response']
                 
-                # Step 2: Execute with Playwright
-                automation_result = await self.playwright_service.execute_prompt(
-                    enhanced_prompt, 
-                    task.target_platform
-                )
+                    # Step 2: Execute with Playwright
+                    url = task.target_url or platform_registry.url_for(task.target_platform)
+                    automation_result = await self.playwright_service.navigate_and_submit(
+                        url=url,
+                        prompt=enhanced_prompt
+                    )
+                    if not automation_result['success']:
+                        raise Exception(f"Automation failed: {automation_result.get('error')}")
                 
-                task.result = {
-                    'gemini_response': gemini_result,
-                    'automation_result': automation_result
-                }
-                task.status = 'completed'
-                task.completed_at = datetime.utcnow().isoformat()
+                    task.result = {
+                        'gemini_response': gemini_result,
+                        'automation_result': automation_result
+                    }
+                    self._transition_task(job, task, 'completed')
                 
-            except Exception as e:
-                task.status = 'failed'
-                task.error = str(e)
-                task.completed_at = datetime.utcnow().isoformat()
-                logger.error(f"Task {task.id} failed: {str(e)}")
+                except Exception as e:
+                    self._transition_task(job, task, 'failed', error=str(e))
+                    logger.error(f"Task {task.id} failed: {str(e)}")
+            task.result = {**(task.result or {}), 'trace': root.to_dict()}
+            self._persist_task(job, task)
         
         # Run tasks in parallel
         await asyncio.gather(*[process_single_task(task) for task in tasks])
     
-    async def get_job_status(self, job_id: str) -> Dict[str, Any]:
-        """Get status of a batch job"""
+    def _transition_task(self, job: BatchJob, task: BatchTask, status: str, error: Optional[str] = None):
+        """Change a task's status, keeping job counters and the job store in step"""
+        job.progress.transition(task, status, error=error)
+        self._persist_task(job, task)
+    
+    def _job_fields(self, job: BatchJob) -> Dict[str, Any]:
+        """Shallow job fields without tasks or counters"""
+        return {f.name: getattr(job, f.name) for f in fields(job) if f.name not in ('tasks', 'progress')}
+    
+    def _job_payload(self, job: BatchJob) -> Dict[str, Any]:
+        """Job with its tasks and summarized counters, shaped like a job store row"""
+        return {
+            **self._job_fields(job),
+            'total_tasks': job.progress.total,
+            'summary': job.progress.summary(include_approvals=False),
+            'tasks': [asdict(task) for task in job.tasks]
+        }
+    
+    def _persist_job(self, job: BatchJob, sync: bool = False):
+        """Write the job row (without tasks) to the shared job store"""
+        job_data = self._job_fields(job)
+        job_data['total_tasks'] = job.progress.total
+        job_store.save_job('basic', job_data, summary=job.progress.summary(include_approvals=False), sync=sync)
+    
+    def _persist_task(self, job: BatchJob, task: BatchTask):
+        """Write a single task row to the shared job store"""
+        position = int(task.id.rsplit('-', 1)[-1])
+        job_store.save_task(job.id, position, asdict(task))
+        self._persist_job(job)
+    
+    def _archive_job(self, job: BatchJob):
+        """Move a finished job from active jobs into bounded in-memory history"""
+        self._persist_job(job, sync=True)
+        self.job_history.append(job)
+        if len(self.job_history) > JOB_HISTORY_LIMIT:
+            del self.job_history[:-JOB_HISTORY_LIMIT]
+        del self.active_jobs[job.id]
+    
+    async def get_job_status(self, job_id: str, include_tasks: bool = False) -> Dict[str, Any]:
+        """Get status of a batch job, with task payloads only when include_tasks is set"""
         # Check active jobs first
         if job_id in self.active_jobs:
             job = self.active_jobs[job_id]
         else:
             # Check history
             job = next((j for j in self.job_history if j.id == job_id), None)
-            if not job:
+        
+        if not job:
+            # Jobs run by other workers or before a restart live in the store
+            stored = job_store.get_job(job_id, include_tasks=include_tasks)
+            if not stored:
                 raise ValueError(f"Job {job_id} not found")
+            summary = stored.pop('summary') or {}
+            return {'job': stored, **summary}
+        
+        job_data = self._job_fields(job)
+        job_data['total_tasks'] = job.progress.total
+        if include_tasks:
+            job_data['tasks'] = [asdict(task) for task in job.tasks]
         
         return {
-            'job': asdict(job),
-            'progress': {
-                'total': len(job.tasks),
-                'completed': len([t for t in job.tasks if t.status == 'completed']),
-                'failed': len([t for t in job.tasks if t.status == 'failed']),
-                'processing': len([t for t in job.tasks if t.status == 'processing']),
-                'pending': len([t for t in job.tasks if t.status == 'pending'])
-            }
+            'job': job_data,
+            **job.progress.summary(include_approvals=False)
         }
     
     async def stop_job(self, job_id: str) -> Dict[str, Any]:
@@ -191,23 +277,36 @@ class AIOrchestrator:
         job = self.active_jobs[job_id]
         
         # Stop playwright operations
-        await self.playwright_service.stop_all_operations()
+        await self.playwright_service.cleanup()
         
         # Update job status
         job.status = 'stopped'
         job.completed_at = datetime.utcnow().isoformat()
         
         # Move to history
-        self.job_history.append(job)
-        del self.active_jobs[job_id]
+        self._archive_job(job)
         
         return {'status': 'stopped', 'job_id': job_id}
     
     async def list_jobs(self) -> Dict[str, Any]:
         """List all jobs (active and historical)"""
+        active_jobs = [self._job_payload(job) for job in self.active_jobs.values()]
+        job_history = []
+        
+        # Include jobs owned by other workers and finished jobs from the store
+        for job in job_store.list_jobs(kind='basic', limit=50):
+            if job['id'] in self.active_jobs:
+                continue
+            if job['status'] in ACTIVE_JOB_STATUSES:
+                job['tasks'] = job_store.get_tasks(job['id'])
+                active_jobs.append(job)
+            elif len(job_history) < 10:  # Last 10 jobs
+                job['tasks'] = job_store.get_tasks(job['id'])
+                job_history.append(job)
+        
         return {
-            'active_jobs': [asdict(job) for job in self.active_jobs.values()],
-            'job_history': [asdict(job) for job in self.job_history[-10:]]  # Last 10 jobs
+            'active_jobs': active_jobs,
+            'job_history': job_history
         }
     
     async def health_check(self) -> Dict[str, Any]:
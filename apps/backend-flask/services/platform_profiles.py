@@ -0,0 +1,122 @@
+"""
+Platform Profiles - URL-first platform detection with a per-domain cache
+
+Platforms in the registry are recognised from the hostname alone. Other
+domains get one combined DOM probe (a single page.evaluate over every
+signature's input selector); the result is cached per host with a TTL, so
+detection costs nothing for every later prompt and request on that domain.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+import logging
+
+from services.platform_registry import platform_registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds a DOM-probed platform profile stays valid
+PROFILE_TTL = float(os.getenv('PLATFORM_PROFILE_TTL', '3600'))
+
+GENERIC_PLATFORM = 'generic'
+
+# Matches any element a chat prompt could be typed into
+CHAT_INPUT_SELECTOR = 'textarea, input[type="text"], div[contenteditable="true"]'
+
+# Returns the index of the first selector that matches, and whether the page
+# has any chat input at all, in one round trip
+_PROBE_SCRIPT = """
+([selectors, chatInput]) => {
+    let match = -1;
+    for (let i = 0; i < selectors.length && match < 0; i++) {
+        try {
+            if (document.querySelector(selectors[i])) match = i;
+        } catch (e) {}
+    }
+    return [match, document.querySelector(chatInput) !== null];
+}
+"""
+
+
+def host_of(url: str) -> str:
+    """Cache key for a URL: lowercased host and port"""
+    return urlparse(url).netloc.lower()
+
+
+def platform_from_url(url: str) -> Optional[str]:
+    """Platform signature name for a URL's hostname, or None if unknown"""
+    host = urlparse(url).hostname
+    return platform_registry.platform_for_host(host) if host else None
+
+
+class PlatformProfileCache:
+    """Per-host platform profiles with a TTL, shared by every page in the process"""
+
+    def __init__(self, ttl: float = PROFILE_TTL):
+        self.ttl = ttl
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'url_hits': 0, 'cache_hits': 0, 'probes': 0}
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        """Profile from the URL or the cache; None means a DOM probe is needed"""
+        platform = platform_from_url(url)
+        if platform:
+            self.stats['url_hits'] += 1
+            return {'platform': platform, 'source': 'url', 'has_chat_input': True}
+
+        key = host_of(url)
+        with self._lock:
+            profile = self._profiles.get(key)
+            # Profiles probed against an older registry may name removed platforms
+            if profile and profile['expires_at'] > time.time() and profile['registry_version'] == platform_registry.version:
+                self.stats['cache_hits'] += 1
+                return profile
+            self._profiles.pop(key, None)
+        return None
+
+    def store(self, url: str, platform: str, has_chat_input: bool) -> Dict[str, Any]:
+        profile = {
+            'platform': platform,
+            'source': 'dom',
+            'has_chat_input': has_chat_input,
+            'expires_at': time.time() + self.ttl,
+            'registry_version': platform_registry.version
+        }
+        with self._lock:
+            self._profiles[host_of(url)] = profile
+        return profile
+
+    async def probe(self, page, url: str) -> Dict[str, Any]:
+        """
+        Classify a loaded page with one DOM round trip and cache the result
+
+        Args:
+            page: Playwright page already showing url
+            url: URL whose host the profile is cached under
+        """
+        self.stats['probes'] += 1
+        input_selectors = platform_registry.input_selectors()
+        names = list(input_selectors)
+        try:
+            match, has_chat_input = await page.evaluate(
+                _PROBE_SCRIPT, [list(input_selectors.values()), CHAT_INPUT_SELECTOR]
+            )
+        except Exception as e:
+            # Do not cache a failed probe; the next request tries again
+            logger.warning(f"Platform DOM probe failed for {host_of(url)}: {str(e)}")
+            return {'platform': GENERIC_PLATFORM, 'source': 'dom', 'has_chat_input': False}
+
+        platform = names[match] if match >= 0 else GENERIC_PLATFORM
+        logger.info(f"Platform for {host_of(url)} probed from DOM: {platform}")
+        return self.store(url, platform, has_chat_input)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+# Global profile cache instance
+platform_profiles = PlatformProfileCache()
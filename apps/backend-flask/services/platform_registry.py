@@ -0,0 +1,156 @@
+"""
+Platform Registry - platform signatures loaded from config/platforms.json
+
+The registry is the single source of selectors, wait strategies and
+reported chat details for every supported platform. Hosts are indexed by
+suffix, so a lookup walks the labels of one hostname instead of scanning
+every platform. Each web platform's indicator lists are also joined into
+one selector, so a poll is a single query. The file is re-read when its
+mtime changes: a new platform needs only a file edit, in every worker,
+without a restart.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_PATH = os.getenv(
+    'PLATFORM_REGISTRY_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'platforms.json')
+)
+
+# Seconds between checks of the registry file's mtime
+RELOAD_CHECK_INTERVAL = 2.0
+
+REQUIRED_FIELDS = ('input_selector', 'submit_button', 'processing_indicators', 'completion_indicators', 'wait_strategy')
+
+
+def visible_selector(selectors: List[str]) -> str:
+    """One Playwright selector matching the first visible element of any of selectors"""
+    return f"{', '.join(selectors)} >> visible=true" if selectors else ''
+
+
+def _compile_signature(name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    missing = [field for field in REQUIRED_FIELDS if field not in config]
+    if missing:
+        raise ValueError(f"Platform '{name}' is missing {', '.join(missing)}")
+    return {
+        **config,
+        'processing_selector': visible_selector(config['processing_indicators']),
+        'completion_selector': visible_selector(config['completion_indicators'])
+    }
+
+
+class _Snapshot:
+    """One parsed version of the registry file; replaced whole on reload"""
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        self.version = version
+        self.platforms: Dict[str, Dict[str, Any]] = {}
+        self.host_index: Dict[str, str] = {}
+        for name, config in data['platforms'].items():
+            if config.get('type') == 'local':
+                self.platforms[name] = dict(config)
+                continue
+            self.platforms[name] = _compile_signature(name, config)
+            for host in config.get('hosts', []):
+                host = host.lower().lstrip('.')
+                if host in self.host_index:
+                    raise ValueError(f"Host '{host}' is claimed by both {self.host_index[host]} and {name}")
+                self.host_index[host] = name
+        self.generic = _compile_signature('generic', data['generic'])
+        # Probe order follows file order
+        self.input_selectors = {
+            name: config['input_selector']
+            for name, config in self.platforms.items()
+            if config.get('type') != 'local'
+        }
+
+
+class PlatformRegistry:
+    """Hot-reloading registry of platform signatures"""
+
+    def __init__(self, path: str = DEFAULT_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._snapshot: Optional[_Snapshot] = None
+
+    def _current(self) -> _Snapshot:
+        """Return the loaded snapshot, reloading it if the file changed"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+                return self._snapshot
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime != self._mtime or self._snapshot is None:
+                    # Recorded before parsing so a broken file is reported once per edit
+                    self._mtime = mtime
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    version = self._snapshot.version + 1 if self._snapshot else 1
+                    self._snapshot = _Snapshot(data, version)
+                    logger.info(f"Loaded {len(self._snapshot.platforms)} platform signatures from {self.path}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if self._snapshot is None:
+                    raise
+                # Keep serving the last good registry while the file is being fixed
+                logger.error(f"Failed to reload platform registry {self.path}: {str(e)}")
+            return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """Increments on every successful reload"""
+        return self._current().version
+
+    def platform_for_host(self, hostname: str) -> Optional[str]:
+        """Platform whose hosts include hostname or one of its parent domains"""
+        index = self._current().host_index
+        host = hostname.lower()
+        while host:
+            platform = index.get(host)
+            if platform:
+                return platform
+            _, _, host = host.partition('.')
+        return None
+
+    def get(self, platform: str) -> Optional[Dict[str, Any]]:
+        return self._current().platforms.get(platform)
+
+    def url_for(self, platform: str) -> str:
+        """
+        Home URL of a web platform, by name or its first label ('lovable' -> lovable.dev)
+
+        Platforms without hosts in the registry (unlisted ones, desktop
+        editors) fall back to https://<platform>.dev.
+        """
+        platforms = self._current().platforms
+        name = platform.lower()
+        config = platforms.get(name) or next(
+            (c for n, c in platforms.items() if n.split('.')[0] == name), None
+        )
+        hosts = (config or {}).get('hosts')
+        return f'https://{hosts[0]}' if hosts else f'https://{name}.dev'
+
+    def generic(self) -> Dict[str, Any]:
+        return self._current().generic
+
+    def input_selectors(self) -> Dict[str, str]:
+        """Input selector of every web platform, in file order"""
+        return self._current().input_selectors
+
+    def names(self) -> List[str]:
+        return list(self._current().platforms)
+
+
+# Global registry instance
+platform_registry = PlatformRegistry()
@@ -2,20 +2,52 @@
 Playwright service for web automation with smart waiting
 """
 import asyncio
-from typing import Dict, Any, Optional, List
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+import os
+import time
+from typing import TYPE_CHECKING, Dict, Any, Optional, List, Tuple
+from urllib.parse import urlparse
+from services.browser_pool import CONTEXT_OPTIONS, LAUNCH_OPTIONS, browser_pool
 from services.target_completion_detector import TargetCompletionDetector
+from services.platform_profiles import GENERIC_PLATFORM, platform_from_url, platform_profiles
+from services import metrics, tracing
+from services.session_store import session_store
 import logging
 
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page
+
 logger = logging.getLogger(__name__)
 
+# Seconds between re-saves of a context's storage state (picks up rotated cookies)
+SESSION_REFRESH_INTERVAL = float(os.getenv('SESSION_REFRESH_INTERVAL', '300'))
+
+# Path fragments that mean a saved session was rejected and we landed on a login page
+LOGIN_PATH_MARKERS = ('login', 'signin', 'sign-in', 'auth')
+
 class PlaywrightService:
-    def __init__(self):
+    def __init__(self, account: Optional[str] = None):
         self.playwright = None
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
-        self.page: Optional[Page] = None
+        self.browser: Optional['Browser'] = None
+        self.context: Optional['BrowserContext'] = None
+        self.page: Optional['Page'] = None
         self._initialized = False
+        # False when the browser belongs to the shared warm pool
+        self._owns_browser = True
+        self.account = account or os.getenv('SESSION_ACCOUNT', 'default')
+        # (platform, account) whose storage state the current context carries
+        self._session_key: Optional[Tuple[str, str]] = None
+        self._session_loaded = False
+        self._session_saved_at = 0.0
+        # Serializes prompts on the single page; created in the loop that uses it
+        self._page_lock: Optional[asyncio.Lock] = None
+        self._page_lock_loop = None
+
+    def _lock_for_page(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._page_lock_loop is not loop:
+            self._page_lock = asyncio.Lock()
+            self._page_lock_loop = loop
+        return self._page_lock
 
     async def initialize(self):
         """Initialize Playwright browser"""
@@ -23,32 +55,105 @@ class PlaywrightService:
             return
         
         try:
+            if browser_pool.available():
+                # Reuse the warm browser and take a context opened ahead of time
+                self.browser, self.context, self.page = await browser_pool.acquire()
+                self._owns_browser = False
+                self._initialized = True
+                return
+            
+            # Imported here so endpoints that never drive a browser skip it
+            from playwright.async_api import async_playwright
+            
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage']
-            )
-            self.context = await self.browser.new_context(
-                viewport={'width': 1280, 'height': 720},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            self.page = await self.context.new_page()
+            self.browser = await self.playwright.chromium.launch(**LAUNCH_OPTIONS)
+            self._owns_browser = True
+            await self._open_context()
             self._initialized = True
         except Exception as e:
             raise Exception(f"Failed to initialize Playwright: {str(e)}")
 
+    async def _open_context(self, storage_state: Optional[Dict[str, Any]] = None):
+        self.context = await self.browser.new_context(**CONTEXT_OPTIONS, storage_state=storage_state)
+        self.page = await self.context.new_page()
+
+    async def use_session(self, url: str, account: Optional[str] = None):
+        """
+        Make the current context carry the saved session for url's platform
+
+        Opens a fresh context with the stored cookies and localStorage when the
+        platform or account changes, so navigation lands on the chat UI
+        without a login flow. A no-op while the session is already in use.
+        """
+        if account:
+            self.account = account
+        if not self._initialized:
+            await self.initialize()
+
+        platform = platform_from_url(url)
+        key = (platform, self.account) if platform else None
+        if key == self._session_key:
+            return
+
+        state = session_store.load(*key) if key else None
+        if state is None and self._session_key is None:
+            # Nothing to load and nothing to hand back; keep the current context
+            self._session_key = key
+            self._session_loaded = False
+            return
+
+        await self.save_session(force=True)
+        await self.page.close()
+        await self.context.close()
+        await self._open_context(state)
+        self._session_key = key
+        self._session_loaded = state is not None
+        self._session_saved_at = time.monotonic() if state is not None else 0.0
+        if state is not None:
+            logger.info(f"🔑 Restored saved session for {platform}/{self.account}")
+
+    async def save_session(self, force: bool = False):
+        """Persist the context's storage state, at most every SESSION_REFRESH_INTERVAL"""
+        if not self._session_key or not self.context or not session_store.enabled:
+            return
+        if not force and time.monotonic() - self._session_saved_at < SESSION_REFRESH_INTERVAL:
+            return
+        try:
+            state = await self.context.storage_state()
+            session_store.save(*self._session_key, state)
+            self._session_saved_at = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Failed to save session for {self._session_key[0]}: {str(e)}")
+
+    def _check_session(self):
+        """Drop a loaded session that the platform redirected to a login page"""
+        if not self._session_loaded:
+            return
+        path = urlparse(self.page.url).path.lower()
+        if any(marker in path for marker in LOGIN_PATH_MARKERS):
+            logger.warning(f"Saved session for {self._session_key[0]}/{self._session_key[1]} expired; discarding it")
+            session_store.delete(*self._session_key)
+            self._session_loaded = False
+
     async def cleanup(self):
         """Clean up Playwright resources"""
         try:
+            await self.save_session(force=True)
             if self.page:
                 await self.page.close()
             if self.context:
                 await self.context.close()
-            if self.browser:
+            if self.browser and self._owns_browser:
                 await self.browser.close()
             if self.playwright:
                 await self.playwright.stop()
+            self.playwright = None
+            self.browser = None
+            self.context = None
+            self.page = None
             self._initialized = False
+            self._session_key = None
+            self._session_loaded = False
         except Exception as e:
             print(f"Warning: Error during cleanup: {str(e)}")
 
@@ -61,50 +166,87 @@ class PlaywrightService:
             prompt: Text prompt to submit
             selector: Optional input field selector
             wait_for_completion: Whether to wait for target to finish processing (MVP #1 feature)
+        
+        Called outside a trace, the result carries a 'trace' span tree with the
+        time spent in each phase; under a caller's trace the phases are recorded
+        in that trace instead.
+        Concurrent calls (the orchestrators run tasks in parallel) take turns on
+        the page.
         """
+        async with self._lock_for_page():
+            with tracing.trace('navigate_and_submit', url=url, prompt_chars=len(prompt)) as root:
+                result = await self._navigate_and_submit(url, prompt, selector, wait_for_completion)
+                root.set(success=result['success'], platform=result.get('platform'))
+        if root.parent is None:
+            result['trace'] = root.to_dict()
+        return result
+
+    async def probe_platform(self, url: str) -> Dict[str, Any]:
+        """
+        Load a URL and probe its chat interface into a platform profile
+
+        Takes the page lock like navigate_and_submit, so a probe never
+        navigates the page away from a prompt that is still running.
+        """
+        await self.initialize()
+        async with self._lock_for_page():
+            await self.page.goto(url, wait_until='domcontentloaded', timeout=30000)
+            return await platform_profiles.probe(self.page, url)
+
+    async def _navigate_and_submit(self, url: str, prompt: str, selector: Optional[str], wait_for_completion: bool) -> Dict[str, Any]:
+        platform = platform_from_url(url) or GENERIC_PLATFORM
         try:
-            if not self._initialized:
-                await self.initialize()
+            with tracing.span('session'):
+                await self.use_session(url)
 
             logger.info(f"🎯 Starting automation for {url}")
             
             # Navigate to the target URL
-            await self.page.goto(url, wait_until='networkidle', timeout=30000)
+            with metrics.NAVIGATION_SECONDS.time(platform=platform), tracing.span('navigation'):
+                await self.page.goto(url, wait_until='networkidle', timeout=30000)
+            self._check_session()
             logger.info("✅ Navigation complete")
             
             # Initialize completion detector
             detector = TargetCompletionDetector(self.page)
-            platform_info = await detector.detect_platform()
+            with tracing.span('detect_platform'):
+                platform_info = await detector.detect_platform()
+            platform = platform_info.platform_type
             logger.info(f"🔍 Detected platform: {platform_info.platform_type}")
             
             # Find input field if selector not provided
-            if not selector:
-                # Try common selectors for input fields
-                selectors = [
-                    'textarea[placeholder*="prompt"]',
-                    'textarea[placeholder*="message"]', 
-                    'input[type="text"]',
-                    'textarea',
-                    '[contenteditable="true"]'
-                ]
+            probe_started = time.perf_counter()
+            with tracing.span('selector_probe'):
+                if not selector:
+                    # Try common selectors for input fields
+                    selectors = [
+                        'textarea[placeholder*="prompt"]',
+                        'textarea[placeholder*="message"]', 
+                        'input[type="text"]',
+                        'textarea',
+                        '[contenteditable="true"]'
+                    ]
                 
-                for sel in selectors:
-                    try:
-                        await self.page.wait_for_selector(sel, timeout=5000)
-                        selector = sel
-                        logger.info(f"📝 Found input field: {sel}")
-                        break
-                    except:
-                        continue
+                    for sel in selectors:
+                        try:
+                            await self.page.wait_for_selector(sel, timeout=5000)
+                            selector = sel
+                            logger.info(f"📝 Found input field: {sel}")
+                            break
+                        except:
+                            continue
                 
-                if not selector:
-                    return {
-                        'success': False,
-                        'error': 'Could not find input field on the page'
-                    }
+                    if not selector:
+                        metrics.PROMPTS.inc(platform=platform, status='failed')
+                        return {
+                            'success': False,
+                            'error': 'Could not find input field on the page'
+                        }
+            metrics.SELECTOR_PROBE_SECONDS.observe(time.perf_counter() - probe_started, platform=platform)
 
             # Fill the prompt
-            await self.page.fill(selector, prompt)
+            with tracing.span('fill'):
+                await self.page.fill(selector, prompt)
             logger.info(f"✍️ Filled prompt ({len(prompt)} chars)")
             
             # Try to submit - look for submit button or press Enter
@@ -115,21 +257,24 @@ class PlaywrightService:
                 '[data-testid="send-button"]'
             ]
             
-            submitted = False
-            for submit_sel in submit_selectors:
-                try:
-                    if await self.page.is_visible(submit_sel):
-                        await self.page.click(submit_sel)
-                        submitted = True
-                        logger.info(f"🚀 Submitted via button: {submit_sel}")
-                        break
-                except:
-                    continue
-            
-            if not submitted:
-                # Try pressing Enter as fallback
-                await self.page.press(selector, 'Enter')
-                logger.info("🚀 Submitted via Enter key")
+            with tracing.span('submit') as phase:
+                submitted = False
+                for submit_sel in submit_selectors:
+                    try:
+                        if await self.page.is_visible(submit_sel):
+                            await self.page.click(submit_sel)
+                            submitted = True
+                            logger.info(f"🚀 Submitted via button: {submit_sel}")
+                            break
+                    except:
+                        continue
+            
+                if not submitted:
+                    # Try pressing Enter as fallback
+                    await self.page.press(selector, 'Enter')
+                    logger.info("🚀 Submitted via Enter key")
+            
+                phase.set(method='button' if submitted else 'enter')
             
             # THE MVP #1 MAGIC: Wait for target to finish processing
             completion_result = {'success': True, 'wait_time_seconds': 0}
@@ -137,18 +282,34 @@ class PlaywrightService:
                 logger.info("⏳ Waiting for target system to finish processing...")
                 
                 # First wait for processing to start
-                await detector.wait_for_processing_to_start(timeout=10)
+                with metrics.PROCESSING_START_SECONDS.time(platform=platform), tracing.span('processing_start') as phase:
+                    started = await detector.wait_for_processing_to_start(timeout=10)
+                    phase.set(started=started)
                 
                 # Then wait for completion
-                completion_result = await detector.wait_for_completion(timeout=300)
+                completion_started = time.perf_counter()
+                with tracing.span('completion', strategy=platform_info.wait_strategy) as phase:
+                    completion_result = await detector.wait_for_completion(timeout=300)
+                    phase.set(success=completion_result['success'])
+                metrics.COMPLETION_WAIT_SECONDS.observe(
+                    time.perf_counter() - completion_started,
+                    platform=platform,
+                    outcome='completed' if completion_result['success'] else 'failed'
+                )
                 
                 if not completion_result['success']:
                     logger.warning(f"⚠️ Completion wait failed: {completion_result.get('error')}")
             
             # Take screenshot for verification
-            screenshot = await self.page.screenshot(type='png')
+            with metrics.SCREENSHOT_SECONDS.time(platform=platform), tracing.span('screenshot'):
+                screenshot = await self.page.screenshot(type='png')
             screenshot_b64 = screenshot.hex()
             
+            # Keep the saved session fresh for the next context
+            with tracing.span('save_session'):
+                await self.save_session()
+            metrics.PROMPTS.inc(platform=platform, status='completed')
+            
             return {
                 'success': True,
                 'message': f'Successfully submitted prompt to {url}',
@@ -162,6 +323,7 @@ class PlaywrightService:
             
         except Exception as e:
             logger.error(f"❌ Automation failed: {str(e)}")
+            metrics.PROMPTS.inc(platform=platform, status='failed')
             return {
                 'success': False,
                 'error': f'Automation failed: {str(e)}'
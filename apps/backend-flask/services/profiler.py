@@ -0,0 +1,210 @@
+"""
+Profiler - on-demand sampling profiles and an event-loop lag watchdog
+
+The sampling profiler reads every thread's stack (the background event loop,
+executor threads, request threads) at a fixed interval for a requested
+duration and aggregates them into collapsed stacks, the input format of
+flamegraph.pl and speedscope. A deterministic cProfile run of the event loop
+thread is also available as a pstats dump.
+
+The lag monitor keeps a heartbeat coroutine on the background loop and a
+watchdog thread beside it. When the heartbeat is late by more than the
+threshold, the watchdog captures the loop thread's stack while it is still
+blocked, so the callback responsible shows up in the stall record.
+"""
+import asyncio
+import cProfile
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Optional, Tuple
+import logging
+
+from services.event_loop import background_loop
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Longest profile a request may ask for (seconds)
+MAX_PROFILE_SECONDS = 60.0
+
+# Heartbeat lateness that counts as a blocked loop (milliseconds)
+LOOP_LAG_THRESHOLD_MS = float(os.getenv('LOOP_LAG_THRESHOLD_MS', '100'))
+
+# Seconds between heartbeats
+LOOP_HEARTBEAT_INTERVAL = 0.05
+
+# Stall records kept
+MAX_STALLS = 50
+
+LOOP_LAG_SECONDS = metrics.registry.histogram(
+    'autopromptr_event_loop_lag_seconds', 'Background event loop heartbeat lateness',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+
+def lag_monitor_enabled() -> bool:
+    return os.getenv('LOOP_LAG_MONITOR', 'true').lower() in ('1', 'true', 'yes')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+def _stack(frame) -> Tuple[str, ...]:
+    """Frame labels from the outermost call to the innermost"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class SamplingProfiler:
+    """Samples all thread stacks; one profile runs at a time"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._busy = threading.Lock()
+
+    def sample(self, duration: float) -> Dict[str, Any]:
+        """
+        Sample every other thread for duration seconds
+
+        Returns:
+            Dict with collapsed stacks ('thread;outer;...;inner count' lines),
+            the number of samples and the sampled duration
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError('A profile is already running')
+        try:
+            duration = min(max(duration, self.interval), MAX_PROFILE_SECONDS)
+            own = threading.get_ident()
+            counts: StackCounter = StackCounter()
+            samples = 0
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    counts[(names.get(ident, str(ident)),) + _stack(frame)] += 1
+                samples += 1
+                time.sleep(self.interval)
+            collapsed = [f"{';'.join(stack)} {count}" for stack, count in counts.most_common()]
+            return {'duration_seconds': duration, 'samples': samples, 'collapsed': '\n'.join(collapsed) + '\n'}
+        finally:
+            self._busy.release()
+
+    def profile_loop(self, duration: float) -> bytes:
+        """
+        Run cProfile inside the background loop thread for duration seconds
+
+        Returns:
+            marshalled stats, the format pstats.Stats loads from a file
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError('A profile is already running')
+        try:
+            duration = min(max(duration, 0.1), MAX_PROFILE_SECONDS)
+            profile = cProfile.Profile()
+            stopped = threading.Event()
+
+            def stop():
+                profile.disable()
+                stopped.set()
+
+            background_loop.call_soon(profile.enable)
+            time.sleep(duration)
+            background_loop.call_soon(stop)
+            if not stopped.wait(timeout=MAX_PROFILE_SECONDS):
+                raise TimeoutError('Event loop did not respond; see the lag monitor stalls')
+            profile.create_stats()
+            return marshal.dumps(profile.stats)
+        finally:
+            self._busy.release()
+
+
+class LoopLagMonitor:
+    """Heartbeat on the background loop plus a watchdog thread that catches stalls"""
+
+    def __init__(self, threshold_ms: float = LOOP_LAG_THRESHOLD_MS, interval: float = LOOP_HEARTBEAT_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=MAX_STALLS)
+        self.max_lag = 0.0
+        self._beat = 0.0
+        self._loop_thread: Optional[int] = None
+        self._current_stall: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        # Process that runs the monitor; a forked worker starts its own
+        self._pid: Optional[int] = None
+
+    def start(self):
+        """Start the heartbeat and watchdog (idempotent per process)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        self._beat = time.monotonic()
+        background_loop.submit(self._heartbeat())
+        threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True).start()
+        logger.info(f"Event loop lag monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    async def _heartbeat(self):
+        self._loop_thread = threading.get_ident()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                self.max_lag = max(self.max_lag, lag)
+                self._beat = now
+                if self._current_stall is not None:
+                    # The stall is over; record how long the loop was blocked
+                    self._current_stall['blocked_ms'] = round(lag * 1000, 1)
+                    self._current_stall = None
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval / 2)
+            with self._lock:
+                late = time.monotonic() - self._beat - self.interval
+                if late < self.threshold or self._current_stall is not None or self._loop_thread is None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread)
+                stall = {
+                    'detected_at': datetime.utcnow().isoformat(),
+                    'blocked_ms': None,
+                    'stack': list(_stack(frame)) if frame is not None else [],
+                }
+                self._current_stall = stall
+                self.stalls.append(stall)
+            logger.warning(
+                f"⏱️ Event loop blocked for over {late * 1000:.0f}ms in "
+                f"{stall['stack'][-1] if stall['stack'] else 'unknown'}"
+            )
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self._pid == os.getpid(),
+                'threshold_ms': self.threshold * 1000,
+                'max_lag_ms': round(self.max_lag * 1000, 1),
+                'stalls': list(self.stalls),
+            }
+
+
+# Global instances
+sampling_profiler = SamplingProfiler()
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,145 @@
+"""
+Progress coalescer - merges bursts of per-batch progress updates and
+flushes them to the broadcast path at a bounded rate
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Any, Callable, Awaitable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Batch/job statuses that end a run and must never be delayed
+TERMINAL_STATUSES = {
+    'completed', 'failed', 'stopped', 'cancelled', 'error', 'partial_success'
+}
+
+# Event types that must reach clients immediately
+TERMINAL_EVENT_TYPES = {
+    'job_created', 'job_completed', 'job_error', 'job_stopped',
+    'job_paused', 'job_resumed', 'task_completed', 'task_failed',
+    'approval_request', 'approval_response', 'approval_timeout', 'auto_approval'
+}
+
+SendCallable = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def is_terminal_message(message: Dict[str, Any]) -> bool:
+    """Return True if a message must bypass rate limiting"""
+    if message.get('type') in TERMINAL_EVENT_TYPES:
+        return True
+    return message.get('status') in TERMINAL_STATUSES
+
+
+class ProgressCoalescer:
+    """
+    Coalesces progress updates per key (batch or job id).
+
+    The first update for a key is sent immediately; updates arriving within
+    the rate window are merged into a single pending message that is flushed
+    on the trailing edge. Terminal messages flush anything pending for the key
+    and are then sent straight away.
+    """
+
+    def __init__(self, max_updates_per_second: float = 2.0):
+        self.min_interval = 1.0 / max_updates_per_second if max_updates_per_second > 0 else 0.0
+        self._last_sent: Dict[str, float] = {}
+        self._pending: Dict[str, Tuple[Dict[str, Any], SendCallable]] = {}
+        self._flush_handles: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.TimerHandle]] = {}
+        self.stats = {'published': 0, 'sent': 0, 'coalesced': 0, 'bypassed': 0}
+
+    async def publish(
+        self,
+        key: str,
+        message: Dict[str, Any],
+        send: SendCallable,
+        terminal: Optional[bool] = None
+    ):
+        """Publish a message for a key, merging it with any pending update"""
+        self.stats['published'] += 1
+
+        if terminal is None:
+            terminal = is_terminal_message(message)
+
+        if terminal:
+            self.stats['bypassed'] += 1
+            await self.flush(key)
+            await self._send(key, message, send)
+            self._last_sent.pop(key, None)
+            return
+
+        if self.min_interval == 0:
+            await self._send(key, message, send)
+            return
+
+        now = time.monotonic()
+        if key not in self._pending and now - self._last_sent.get(key, 0.0) >= self.min_interval:
+            await self._send(key, message, send)
+            return
+
+        if key in self._pending:
+            self.stats['coalesced'] += 1
+            merged = {**self._pending[key][0], **message}
+        else:
+            merged = dict(message)
+        self._pending[key] = (merged, send)
+
+        # A flush scheduled on a per-request loop that has since closed never
+        # fires; reschedule it on the current loop
+        scheduled = self._flush_handles.get(key)
+        if scheduled and scheduled[0].is_closed():
+            del self._flush_handles[key]
+
+        if key not in self._flush_handles:
+            delay = max(0.0, self._last_sent.get(key, 0.0) + self.min_interval - now)
+            loop = asyncio.get_running_loop()
+            self._flush_handles[key] = (loop, loop.call_later(
+                delay, lambda: loop.create_task(self.flush(key))
+            ))
+
+    async def flush(self, key: str):
+        """Send any pending update for a key right away"""
+        scheduled = self._flush_handles.pop(key, None)
+        if scheduled:
+            scheduled[1].cancel()
+
+        pending = self._pending.pop(key, None)
+        if pending:
+            message, send = pending
+            await self._send(key, message, send)
+
+    async def flush_all(self):
+        """Flush pending updates for every key"""
+        for key in list(self._pending.keys()):
+            await self.flush(key)
+
+    def discard(self, key: str):
+        """Drop pending state for a key without sending"""
+        scheduled = self._flush_handles.pop(key, None)
+        if scheduled:
+            scheduled[1].cancel()
+        self._pending.pop(key, None)
+        self._last_sent.pop(key, None)
+
+    async def _send(self, key: str, message: Dict[str, Any], send: SendCallable):
+        self._last_sent[key] = time.monotonic()
+        self.stats['sent'] += 1
+        try:
+            await send(message)
+        except Exception as e:
+            logger.error(f"Progress send failed for {key}: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get coalescing statistics"""
+        return {
+            **self.stats,
+            'pending_keys': len(self._pending),
+            'max_updates_per_second': (1.0 / self.min_interval) if self.min_interval else None
+        }
+
+
+# Global coalescer instance
+progress_coalescer = ProgressCoalescer(
+    max_updates_per_second=float(os.getenv('PROGRESS_MAX_UPDATES_PER_SECOND', '2'))
+)
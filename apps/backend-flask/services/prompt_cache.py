@@ -0,0 +1,229 @@
+"""
+Prompt Cache - dedup of identical Gemini work across tasks and batches
+
+Tasks carry a fingerprint of their normalized prompt and target platform,
+computed when the batch is created. Gemini results (analysis, enhancement)
+are looked up by fingerprint: a result enhanced recently is reused, a call
+already in flight for the same fingerprint is awaited instead of repeated,
+and duplicates within one call are computed once and fanned out to every
+matching task.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from services import metrics
+from services.job_progress import JobProgress
+
+logger = logging.getLogger(__name__)
+
+# Successful results kept for reuse by later batches
+PROMPT_CACHE_SIZE = int(os.getenv('PROMPT_CACHE_SIZE', '1000'))
+
+# Seconds a cached result stays valid; 0 keeps dedup to calls in flight
+PROMPT_CACHE_TTL = float(os.getenv('PROMPT_CACHE_TTL', '3600'))
+
+_WHITESPACE = re.compile(r'\s+')
+
+# (result, source) where source is None for a result computed by this call,
+# 'cache' for a stored result and 'inflight' for one shared with another call
+Lookup = Tuple[Dict[str, Any], Optional[str]]
+
+
+def normalize_prompt(text: str) -> str:
+    """Prompt text with Unicode compatibility forms folded and whitespace collapsed"""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text or '')).strip()
+
+
+def prompt_fingerprint(text: str, platform: str) -> str:
+    """Dedup key for a prompt sent to a platform"""
+    normalized = normalize_prompt(text)
+    return hashlib.sha256(f'{platform}\n{normalized}'.encode()).hexdigest()[:32]
+
+
+class PromptResultCache:
+    """Successful results by (kind, fingerprint) with single-flight for calls in progress"""
+
+    def __init__(self, size: int = PROMPT_CACHE_SIZE, ttl: float = PROMPT_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._results: 'OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'shared': 0, 'misses': 0}
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key: Tuple[str, str], result: Dict[str, Any]):
+        if self.ttl <= 0 or self.size <= 0 or not result.get('success'):
+            return
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+
+    async def get_many(
+        self,
+        kind: str,
+        fingerprints: Iterable[str],
+        compute: Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+    ) -> Dict[str, Lookup]:
+        """
+        Results for each distinct fingerprint
+
+        Args:
+            kind: Kind of Gemini work ('analysis', 'enhancement')
+            fingerprints: Fingerprints wanted; duplicates are looked up once
+            compute: Called once with the fingerprints neither cached nor in
+                flight; returns their results by fingerprint
+
+        Only successful results are cached; a failure is still shared with
+        the calls that were waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        found: Dict[str, Lookup] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        owned: Dict[str, asyncio.Future] = {}
+        with self._lock:
+            for fingerprint in dict.fromkeys(fingerprints):
+                key = (kind, fingerprint)
+                cached = self._cached(key)
+                if cached is not None:
+                    self.stats['hits'] += 1
+                    found[fingerprint] = (cached, 'cache')
+                    continue
+                # Futures belong to one loop; calls from another loop compute their own
+                flight = self._inflight.get(key)
+                if flight and flight[0] is loop:
+                    self.stats['shared'] += 1
+                    waiting[fingerprint] = flight[1]
+                    continue
+                self.stats['misses'] += 1
+                owned[fingerprint] = loop.create_future()
+                self._inflight[key] = (loop, owned[fingerprint])
+
+        if owned:
+            computed: Dict[str, Dict[str, Any]] = {}
+            try:
+                computed = await compute(list(owned))
+            finally:
+                with self._lock:
+                    for fingerprint, future in owned.items():
+                        if self._inflight.get((kind, fingerprint), (None, None))[1] is future:
+                            del self._inflight[(kind, fingerprint)]
+                for fingerprint, future in owned.items():
+                    result = computed.get(fingerprint) or {
+                        'success': False, 'error': 'Shared Gemini request did not complete', 'response': None
+                    }
+                    self._store((kind, fingerprint), result)
+                    future.set_result(result)
+                    found[fingerprint] = (result, None)
+
+        for fingerprint, future in waiting.items():
+            found[fingerprint] = (await asyncio.shield(future), 'inflight')
+        return found
+
+    async def get(self, kind: str, fingerprint: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Lookup:
+        """Single-fingerprint get_many; counts a reused result in the dedup metric"""
+        async def compute_one(fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+            return {fingerprint: await compute()}
+
+        result, source = (await self.get_many(kind, [fingerprint], compute_one))[fingerprint]
+        if source is not None:
+            metrics.GEMINI_DEDUP.inc(kind=kind, source=source)
+        return result, source
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def fan_out(kind: str, tasks: Iterable[Any], found: Dict[str, Lookup]) -> Dict[str, Lookup]:
+    """
+    Per-task (result, source) from get_many results
+
+    The first task of a fingerprint computed by the call gets the result as
+    is; every other task gets a copy marked with how it was deduplicated
+    ('batch' for a duplicate in the same call, 'cache' or 'inflight').
+    """
+    per_task: Dict[str, Lookup] = {}
+    seen = set()
+    for task in tasks:
+        result, source = found[task.fingerprint]
+        if source is None and task.fingerprint in seen:
+            source = 'batch'
+        seen.add(task.fingerprint)
+        if source is not None:
+            metrics.GEMINI_DEDUP.inc(kind=kind, source=source)
+            result = {**result, 'dedup': source}
+        per_task[task.id] = (result, source)
+    return per_task
+
+
+def record_usage(progress: JobProgress, task: Any, gemini_result: Dict[str, Any]):
+    """Charge a Gemini call's tokens to the task, its job and its platform"""
+    usage = gemini_result.get('usage')
+    if not usage:
+        return
+    progress.record_usage(task, usage)
+    metrics.GEMINI_TOKENS.inc(usage['prompt_tokens'], platform=task.target_platform, type='prompt')
+    metrics.GEMINI_TOKENS.inc(usage['completion_tokens'], platform=task.target_platform, type='completion')
+
+
+async def enhance_tasks(gemini_service: Any, progress: JobProgress, tasks: List[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Gemini enhancements by task id
+
+    Each distinct fingerprint is enhanced once, through one process_batch
+    call (packed when enabled) per platform; identical prompts recently
+    enhanced or already in flight reuse that result. Reuse and token usage
+    are recorded on the job's progress.
+    """
+    by_fingerprint = {task.fingerprint: task for task in tasks}
+
+    async def enhance(fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        by_platform: Dict[str, List[str]] = {}
+        for fingerprint in fingerprints:
+            by_platform.setdefault(by_fingerprint[fingerprint].target_platform, []).append(fingerprint)
+
+        async def enhance_platform(platform: str, group: List[str]):
+            results = await gemini_service.process_batch(
+                [by_fingerprint[fingerprint].prompt for fingerprint in group],
+                context={'target_platform': platform}
+            )
+            return zip(group, results)
+
+        enhanced = await asyncio.gather(*(enhance_platform(p, group) for p, group in by_platform.items()))
+        return {fingerprint: result for pairs in enhanced for fingerprint, result in pairs}
+
+    found = await prompt_cache.get_many('enhancement', by_fingerprint, enhance)
+    per_task = fan_out('enhancement', tasks, found)
+    enhancements = {}
+    for task in tasks:
+        result, source = per_task[task.id]
+        if source:
+            progress.record_reuse('enhancement')
+        else:
+            record_usage(progress, task, result)
+        enhancements[task.id] = result
+    return enhancements
+
+
+# Global prompt result cache instance
+prompt_cache = PromptResultCache()
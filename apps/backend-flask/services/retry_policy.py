@@ -0,0 +1,262 @@
+"""
+Retry Policy - error-classified retries and per-domain circuit breakers
+
+Failed prompt submissions are classified from their error (selector missing,
+timeout, navigation, rate limited, browser crash). Each class has its own
+attempt limit and exponential backoff with jitter, so errors that will not
+go away on their own are not retried three times. A circuit breaker per
+target domain counts failures that point at the site rather than the
+prompt. Once it opens, submissions to that domain fail fast and queued
+prompts wait until a single probe submission succeeds.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from services.shard_coordinator import domain_of
+
+logger = logging.getLogger(__name__)
+
+SELECTOR_MISSING = 'selector_missing'
+TIMEOUT = 'timeout'
+NAVIGATION = 'navigation'
+RATE_LIMITED = 'rate_limited'
+CRASH = 'crash'
+UNKNOWN = 'unknown'
+
+# Checked in order; the first class with a matching fragment wins
+ERROR_PATTERNS = (
+    (RATE_LIMITED, ('429', 'rate limit', 'too many requests', 'quota')),
+    (CRASH, ('target closed', 'has been closed', 'crash', 'connection closed', 'failed to initialize playwright')),
+    (SELECTOR_MISSING, ('could not find input field', 'waiting for selector', 'waiting for locator', 'no node found')),
+    (NAVIGATION, ('net::err_', 'ns_error', 'navigation', 'page.goto', 'name not resolved', 'connection refused')),
+    (TIMEOUT, ('timeout', 'timed out')),
+)
+
+# Consecutive domain failures that open a breaker
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+
+# Seconds an open breaker waits before letting a probe through
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+
+# Longest reset timeout after repeated failed probes (seconds)
+CIRCUIT_MAX_RESET_TIMEOUT = float(os.getenv('CIRCUIT_MAX_RESET_TIMEOUT', '300'))
+
+# Seconds between breaker checks while waiting for it to close
+CIRCUIT_POLL_INTERVAL = 0.5
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    # Failure says the site is unhealthy, so it counts towards the breaker
+    domain_failure: bool = False
+    # Throw the browser away before the next attempt
+    restart_browser: bool = False
+
+    def delay(self, attempt: int) -> float:
+        """Backoff after the given failed attempt: exponential, half of it jittered"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+RETRY_POLICIES: Dict[str, RetryPolicy] = {
+    # The page loaded but has no chat input; one reload covers a slow render
+    SELECTOR_MISSING: RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=1.0),
+    TIMEOUT: RetryPolicy(max_attempts=3, base_delay=5.0, max_delay=30.0, domain_failure=True),
+    NAVIGATION: RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0, domain_failure=True),
+    RATE_LIMITED: RetryPolicy(max_attempts=4, base_delay=30.0, max_delay=300.0, domain_failure=True),
+    CRASH: RetryPolicy(max_attempts=2, base_delay=1.0, max_delay=5.0, restart_browser=True),
+    UNKNOWN: RetryPolicy(max_attempts=3, base_delay=3.0, max_delay=15.0),
+}
+
+
+def classify_error(error: Any) -> str:
+    """Error class of an exception or error message"""
+    message = str(error).lower()
+    for error_class, fragments in ERROR_PATTERNS:
+        if any(fragment in message for fragment in fragments):
+            return error_class
+    return UNKNOWN
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after CIRCUIT_FAILURE_THRESHOLD consecutive domain failures;
+    open -> half-open after the reset timeout, when exactly one probe may run.
+    A successful probe closes the breaker, a failed one reopens it with a
+    doubled reset timeout.
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        max_reset_timeout: float = CIRCUIT_MAX_RESET_TIMEOUT
+    ):
+        self.domain = domain
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def try_acquire(self) -> Optional[float]:
+        """None if a submission may run now, else seconds until it might"""
+        with self._lock:
+            if self.state == 'closed':
+                return None
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == 'open' and remaining <= 0:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                self._probing = True
+                self.stats['probes'] += 1
+                return None
+            self.stats['rejected'] += 1
+            return max(remaining, CIRCUIT_POLL_INTERVAL)
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"🟢 Circuit for {self.domain} closed")
+            self.state = 'closed'
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open':
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+            elif self.state == 'closed' and self.failures >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """End a probe that neither proved nor disproved the domain's health"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self._probing = False
+        self.stats['opened'] += 1
+        logger.warning(f"🔴 Circuit for {self.domain} open; retrying in {self.reset_timeout:.0f}s")
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'domain': self.domain,
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'reset_timeout': self.reset_timeout,
+                **self.stats
+            }
+
+
+class CircuitBreakerRegistry:
+    """One breaker per target domain, shared by every batch in the process"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        domain = domain_of(url)
+        with self._lock:
+            if domain not in self._breakers:
+                self._breakers[domain] = CircuitBreaker(domain)
+            return self._breakers[domain]
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.domain: b.get_status() for b in breakers}
+
+
+async def submit_with_retries(
+    submit: Callable[[], Awaitable[Dict[str, Any]]],
+    url: str,
+    max_retries: int = 3,
+    restart_browser: Optional[Callable[[], Awaitable[None]]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_circuit_open: Optional[Callable[[float], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Run submit() until it succeeds or its error class runs out of attempts
+
+    max_retries caps the attempts of every class. While the domain's breaker
+    is open, no attempt is made: the call waits (reporting through
+    on_circuit_open) until it may probe, or until should_stop() is true.
+
+    Returns:
+        Dict with status (completed or failed), result or error, error_class
+        and retry_count
+    """
+    breaker = circuit_breakers.for_url(url)
+    attempt = 0
+    while True:
+        wait = breaker.try_acquire()
+        if wait is not None:
+            if should_stop and should_stop():
+                return {
+                    'status': 'failed',
+                    'error': f'Circuit for {breaker.domain} is open',
+                    'error_class': 'circuit_open',
+                    'retry_count': attempt
+                }
+            if on_circuit_open:
+                await on_circuit_open(wait)
+            await asyncio.sleep(min(wait, CIRCUIT_RESET_TIMEOUT))
+            continue
+
+        attempt += 1
+        try:
+            result = await submit()
+            if not result.get('success'):
+                raise Exception(result.get('error', 'Unknown error'))
+            breaker.record_success()
+            return {'status': 'completed', 'result': result, 'retry_count': attempt - 1}
+        except Exception as e:
+            error_class = classify_error(e)
+            policy = RETRY_POLICIES[error_class]
+            if policy.domain_failure:
+                breaker.record_failure()
+            else:
+                breaker.release()
+
+            limit = min(max_retries, policy.max_attempts)
+            logger.warning(f"⚠️ Attempt {attempt}/{limit} failed ({error_class}): {str(e)}")
+            if attempt >= limit or (should_stop and should_stop()):
+                return {'status': 'failed', 'error': str(e), 'error_class': error_class, 'retry_count': attempt}
+
+            if policy.restart_browser and restart_browser:
+                await restart_browser()
+            delay = policy.delay(attempt)
+            logger.info(f"🔄 Retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Cancelled mid-attempt (batch cancel, pool shutdown): a half-open
+            # probe must not stay claimed, or the domain is rejected for good
+            breaker.release()
+            raise
+
+
+# Global breaker registry
+circuit_breakers = CircuitBreakerRegistry()
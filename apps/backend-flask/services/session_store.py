@@ -0,0 +1,127 @@
+"""
+Session Store - encrypted browser storage state per platform and account
+
+Playwright's storage_state (cookies and localStorage) is saved per platform
+and account so new browser contexts start logged in instead of running a
+login flow or a chain of auth redirects. States are encrypted with Fernet
+using SESSION_ENCRYPTION_KEY; without a key (or without the cryptography
+package) nothing is persisted, so session cookies never touch disk in
+plain text.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # pragma: no cover - optional dependency
+    Fernet = None
+    InvalidToken = Exception
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'sessions'
+)
+
+# Saved states older than this are discarded (seconds)
+SESSION_MAX_AGE = int(os.getenv('SESSION_MAX_AGE', str(7 * 24 * 3600)))
+
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def _slug(value: str) -> str:
+    return _UNSAFE_CHARS.sub('_', value).strip('._') or 'default'
+
+
+def _drop_expired_cookies(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove cookies past their expiry; session cookies (expires -1) are kept"""
+    now = time.time()
+    cookies = [c for c in state.get('cookies', []) if c.get('expires', -1) <= 0 or c['expires'] > now]
+    return {**state, 'cookies': cookies}
+
+
+class SessionStore:
+    """Encrypted storage_state files under data/sessions/<platform>/<account>.session"""
+
+    def __init__(self, directory: str = DEFAULT_SESSION_DIR, key: Optional[str] = None, max_age: int = SESSION_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        self._fernet = None
+        self._cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        if key and Fernet is None:
+            logger.warning("SESSION_ENCRYPTION_KEY is set but cryptography is not installed; sessions will not be saved")
+        elif key:
+            self._fernet = Fernet(key.encode('ascii'))
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def _path(self, platform: str, account: str) -> str:
+        return os.path.join(self.directory, _slug(platform), f'{_slug(account)}.session')
+
+    def load(self, platform: str, account: str) -> Optional[Dict[str, Any]]:
+        """Decrypted storage state, or None if missing, expired or unreadable"""
+        if not self.enabled:
+            return None
+        path = self._path(platform, account)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._cache.get((platform, account))
+        if cached and cached[0] == mtime:
+            return _drop_expired_cookies(cached[1])
+
+        try:
+            with open(path, 'rb') as f:
+                state = json.loads(self._fernet.decrypt(f.read(), ttl=self.max_age))
+        except InvalidToken:
+            # Too old, or encrypted with a different key
+            logger.info(f"Discarding stale session for {platform}/{account}")
+            self.delete(platform, account)
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read session for {platform}/{account}: {str(e)}")
+            return None
+
+        with self._lock:
+            self._cache[(platform, account)] = (mtime, state)
+        return _drop_expired_cookies(state)
+
+    def save(self, platform: str, account: str, state: Dict[str, Any]):
+        """Encrypt and atomically write a storage state"""
+        if not self.enabled:
+            return
+        path = self._path(platform, account)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self._fernet.encrypt(json.dumps(state, separators=(',', ':')).encode('utf-8')))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._cache[(platform, account)] = (os.stat(path).st_mtime, state)
+
+    def delete(self, platform: str, account: str):
+        with self._lock:
+            self._cache.pop((platform, account), None)
+        try:
+            os.remove(self._path(platform, account))
+        except OSError:
+            pass
+
+
+# Global session store instance
+session_store = SessionStore(
+    directory=os.getenv('SESSION_DIR', DEFAULT_SESSION_DIR),
+    key=os.getenv('SESSION_ENCRYPTION_KEY') or None
+)
@@ -0,0 +1,237 @@
+"""
+Shard Coordinator - domain-affinity routing of batches across backend nodes
+
+Each node heartbeats into the shared job store. Live nodes form a
+consistent-hash ring, and a batch goes to the ring owner of its target
+domain, so browser sessions, platform caches and warm pages for a domain
+stay on one node. A node that runs a batch for a domain holds a lease on it.
+While the lease is valid and its holder alive, batches keep going to the
+holder, so a node joining the ring does not split work that is already
+running. Leases of dead nodes are ignored, and because the ring is
+consistent only the dead node's domains move.
+
+Sharding is off unless NODE_URL is set; a single node always routes locally.
+"""
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import urlparse
+import logging
+
+from services.job_store import JobStore, job_store
+
+logger = logging.getLogger(__name__)
+
+# Virtual nodes per member; more gives a more even spread of domains
+VIRTUAL_NODES = 64
+
+# Header marking a request already forwarded by another node
+FORWARDED_HEADER = 'X-Shard-Forwarded-By'
+
+
+def domain_of(url: str) -> str:
+    """Shard key for a target URL: its hostname without a leading www."""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent-hash ring over node ids"""
+
+    def __init__(self, node_ids: List[str], virtual_nodes: int = VIRTUAL_NODES):
+        self.node_ids = sorted(node_ids)
+        points = sorted(
+            (_hash(f'{node_id}#{i}'), node_id)
+            for node_id in self.node_ids
+            for i in range(virtual_nodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._owners = [node_id for _, node_id in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+class ShardCoordinator:
+    """Membership, ring and lease handling for one node"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        node_id: str,
+        node_url: Optional[str],
+        heartbeat_interval: float = 5.0,
+        node_ttl: float = 15.0,
+        lease_ttl: float = 120.0
+    ):
+        self.store = store
+        self.node_id = node_id
+        self.node_url = node_url
+        self.heartbeat_interval = heartbeat_interval
+        self.node_ttl = node_ttl
+        self.lease_ttl = lease_ttl
+        self._ring = HashRing([])
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._active_domains: Dict[str, int] = {}
+        self._served_domains: Set[str] = set()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid: Optional[int] = None
+        self.stats = {'routed_local': 0, 'routed_remote': 0, 'warm_hits': 0, 'cold_starts': 0, 'lease_moves': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.node_url)
+
+    # Membership
+
+    def _ensure_started(self):
+        """Register this node and start heartbeating (again after a fork)"""
+        if not self.enabled or self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._heartbeat()
+            threading.Thread(target=self._heartbeat_loop, name='shard-heartbeat', daemon=True).start()
+            self._pid = os.getpid()
+            logger.info(f"Shard node {self.node_id} registered at {self.node_url}")
+
+    def _heartbeat(self):
+        self.store.heartbeat_node(self.node_id, self.node_url)
+        with self._lock:
+            active = list(self._active_domains)
+        self.store.renew_leases(self.node_id, active, self.lease_ttl)
+        self.refresh()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                logger.error(f"Shard heartbeat failed: {str(e)}")
+
+    def refresh(self):
+        """Reload live nodes and rebuild the ring if membership changed"""
+        nodes = {n['node_id']: n for n in self.store.live_nodes(self.node_ttl)}
+        if set(nodes) != set(self._nodes):
+            joined = set(nodes) - set(self._nodes)
+            left = set(self._nodes) - set(nodes)
+            if self._nodes:
+                logger.info(f"Shard ring changed: joined={sorted(joined)} left={sorted(left)}")
+            self._ring = HashRing(list(nodes))
+        self._nodes = nodes
+
+    def leave(self):
+        """Stop heartbeating and hand this node's shards back to the ring"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self.store.remove_node(self.node_id)
+        self._pid = None
+
+    # Routing
+
+    def route(self, target_url: str) -> Dict[str, Any]:
+        """
+        Pick the node that should run a batch for target_url
+
+        Returns the node record ({'node_id', 'url', ...}) plus 'local': bool.
+        """
+        if not self.enabled:
+            return {'node_id': self.node_id, 'url': self.node_url, 'local': True}
+        self._ensure_started()
+
+        domain = domain_of(target_url)
+        lease = self.store.get_lease(domain)
+        if lease and lease['expires_at'] > time.time() and lease['node_id'] in self._nodes:
+            target = lease['node_id']
+        else:
+            target = self._ring.owner(domain) or self.node_id
+
+        local = target == self.node_id or target not in self._nodes
+        self.stats['routed_local' if local else 'routed_remote'] += 1
+        if local:
+            return {'node_id': self.node_id, 'url': self.node_url, 'local': True}
+        return {**self._nodes[target], 'local': False}
+
+    def begin(self, target_url: str) -> Dict[str, Any]:
+        """
+        Take the domain lease before running a batch locally
+
+        Batches always run once they get here; the lease only steers later
+        batches for the same domain to this node.
+        """
+        domain = domain_of(target_url)
+        warm = domain in self._served_domains
+        self.stats['warm_hits' if warm else 'cold_starts'] += 1
+        with self._lock:
+            self._served_domains.add(domain)
+            self._active_domains[domain] = self._active_domains.get(domain, 0) + 1
+
+        if not self.enabled:
+            return {'domain': domain, 'warm': warm}
+        self._ensure_started()
+
+        dead = [
+            lease['node_id'] for lease in [self.store.get_lease(domain)]
+            if lease and lease['node_id'] not in self._nodes
+        ]
+        lease = self.store.acquire_lease(domain, self.node_id, self.lease_ttl, steal_from=dead)
+        if lease['node_id'] == self.node_id and lease['epoch'] > 1 and dead:
+            self.stats['lease_moves'] += 1
+        elif lease['node_id'] != self.node_id:
+            logger.info(f"Running {domain} batch on {self.node_id} while {lease['node_id']} holds its lease")
+        return {'domain': domain, 'warm': warm, 'lease': lease}
+
+    def end(self, target_url: str):
+        """Mark a local batch for target_url as finished; the lease then ages out"""
+        domain = domain_of(target_url)
+        with self._lock:
+            remaining = self._active_domains.get(domain, 0) - 1
+            if remaining > 0:
+                self._active_domains[domain] = remaining
+            else:
+                self._active_domains.pop(domain, None)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Cluster view from this node"""
+        if self.enabled:
+            self._ensure_started()
+            self.refresh()
+        served = self.stats['warm_hits'] + self.stats['cold_starts']
+        return {
+            'enabled': self.enabled,
+            'node_id': self.node_id,
+            'nodes': list(self._nodes.values()),
+            'leases': self.store.list_leases() if self.enabled else [],
+            'active_domains': sorted(self._active_domains),
+            'stats': {
+                **self.stats,
+                'warm_hit_rate': self.stats['warm_hits'] / served if served else None
+            }
+        }
+
+
+# Global coordinator instance
+shard_coordinator = ShardCoordinator(
+    store=job_store,
+    node_id=os.getenv('NODE_ID', socket.gethostname()),
+    node_url=os.getenv('NODE_URL') or None,
+    heartbeat_interval=float(os.getenv('SHARD_HEARTBEAT_INTERVAL', '5')),
+    node_ttl=float(os.getenv('SHARD_NODE_TTL', '15')),
+    lease_ttl=float(os.getenv('SHARD_LEASE_TTL', '120'))
+)
@@ -3,10 +3,15 @@ Target Completion Detector - Smart waiting logic for AI platforms
 Detects when a target system (lovable.dev, v0.dev, ChatGPT, etc.) has finished processing
 """
 import asyncio
-from typing import Dict, Any, Optional, List
-from playwright.async_api import Page
+from typing import TYPE_CHECKING, Dict, Any, Optional, List
 import logging
 
+from services.platform_profiles import GENERIC_PLATFORM, platform_profiles
+from services.platform_registry import platform_registry
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,136 +26,61 @@ class PlatformDetectionResult:
 class TargetCompletionDetector:
     """Detects when target AI system has completed processing and is ready for next prompt"""
     
-    # Platform-specific completion indicators
-    PLATFORM_SIGNATURES = {
-        'lovable.dev': {
-            'input_selector': 'textarea[placeholder*="message"]',
-            'submit_button': 'button[type="submit"]',
-            'processing_indicators': [
-                '.animate-pulse',
-                '[data-state="loading"]',
-                'button:has-text("Stop")',
-                '.building-indicator'
-            ],
-            'completion_indicators': [
-                'button:has-text("Send")',
-                'textarea:not([disabled])',
-                '.build-complete'
-            ],
-            'wait_strategy': 'button_state_change'
-        },
-        'v0.dev': {
-            'input_selector': 'textarea[placeholder*="Describe"]',
-            'submit_button': 'button[aria-label="Send"]',
-            'processing_indicators': [
-                '.generating',
-                'button:has-text("Stop generating")',
-                '[role="status"]'
-            ],
-            'completion_indicators': [
-                'button[aria-label="Send"]:not([disabled])',
-                '.generation-complete'
-            ],
-            'wait_strategy': 'generation_complete'
-        },
-        'chatgpt': {
-            'input_selector': '#prompt-textarea',
-            'submit_button': 'button[data-testid="send-button"]',
-            'processing_indicators': [
-                'button[data-testid="stop-button"]',
-                '.result-streaming'
-            ],
-            'completion_indicators': [
-                'button[data-testid="send-button"]:not([disabled])'
-            ],
-            'wait_strategy': 'stop_button_disappears'
-        },
-        'claude.ai': {
-            'input_selector': 'div[contenteditable="true"]',
-            'submit_button': 'button[aria-label="Send Message"]',
-            'processing_indicators': [
-                'button[aria-label="Stop"]',
-                '.typing-indicator'
-            ],
-            'completion_indicators': [
-                'button[aria-label="Send Message"]:not([disabled])'
-            ],
-            'wait_strategy': 'stop_button_disappears'
-        },
-        'cursor': {
-            'type': 'local',
-            'detection': 'electron_api'
-        },
-        'windsurf': {
-            'type': 'local',
-            'detection': 'electron_api'
-        },
-        'vscode': {
-            'type': 'local',
-            'detection': 'extension_api'
-        }
-    }
-
-    def __init__(self, page: Page):
+    def __init__(self, page: 'Page'):
         self.page = page
         self.detected_platform: Optional[PlatformDetectionResult] = None
         self.max_wait_time = 300  # 5 minutes max wait per prompt
         self.poll_interval = 1.0  # Check every 1 second
 
     async def detect_platform(self) -> PlatformDetectionResult:
-        """Detect which AI platform we're on based on URL and DOM structure"""
-        url = self.page.url.lower()
-        
-        logger.info(f"Detecting platform for URL: {url}")
-        
-        # Check URL patterns
-        for platform, config in self.PLATFORM_SIGNATURES.items():
-            if config.get('type') == 'local':
-                continue  # Skip local platforms for web detection
-                
-            if platform in url or platform.replace('.', '') in url:
-                logger.info(f"Platform detected: {platform}")
-                self.detected_platform = PlatformDetectionResult(
-                    platform_type=platform,
-                    selectors=config,
-                    wait_strategy=config['wait_strategy']
-                )
-                return self.detected_platform
-        
-        # Fallback: Try to detect based on DOM structure
-        logger.info("Platform not detected from URL, attempting DOM-based detection...")
-        for platform, config in self.PLATFORM_SIGNATURES.items():
-            if config.get('type') == 'local':
-                continue
-                
-            try:
-                input_exists = await self.page.query_selector(config['input_selector'])
-                if input_exists:
-                    logger.info(f"Platform detected from DOM: {platform}")
-                    self.detected_platform = PlatformDetectionResult(
-                        platform_type=platform,
-                        selectors=config,
-                        wait_strategy=config['wait_strategy']
-                    )
-                    return self.detected_platform
-            except:
-                continue
-        
-        # Ultimate fallback: Generic web-based AI
-        logger.warning("Using generic platform detection")
+        """
+        Detect which AI platform we're on based on URL and DOM structure
+
+        Known hosts resolve from the URL; other hosts are probed once and the
+        result is reused from the platform profile cache until it expires.
+        """
+        url = self.page.url
+        profile = platform_profiles.lookup(url)
+        if profile is None:
+            logger.info(f"Platform not known for {url}, probing DOM...")
+            profile = await platform_profiles.probe(self.page, url)
+
+        platform = profile['platform']
+        selectors = platform_registry.get(platform)
+        if selectors is None:
+            # Generic, or removed from the registry since it was detected
+            platform = GENERIC_PLATFORM
+            selectors = platform_registry.generic()
+
+        logger.info(f"Platform detected from {profile['source']}: {platform}")
         self.detected_platform = PlatformDetectionResult(
-            platform_type='generic',
-            selectors={
-                'input_selector': 'textarea, input[type="text"], [contenteditable="true"]',
-                'submit_button': 'button[type="submit"], button:has-text("Send")',
-                'processing_indicators': ['.loading', '.processing', '[aria-busy="true"]'],
-                'completion_indicators': ['button:not([disabled])'],
-                'wait_strategy': 'network_idle'
-            },
-            wait_strategy='network_idle'
+            platform_type=platform,
+            selectors=selectors,
+            wait_strategy=selectors['wait_strategy']
         )
         return self.detected_platform
 
+    async def _first_visible(self, combined: str, indicators: List[str]):
+        """
+        First visible element matching any indicator, in one query
+
+        Falls back to querying indicators one by one if the combined selector
+        is rejected (one bad indicator would otherwise hide the rest).
+        """
+        if combined:
+            try:
+                return await self.page.query_selector(combined)
+            except Exception:
+                pass
+        for indicator in indicators:
+            try:
+                element = await self.page.query_selector(indicator)
+                if element and await element.is_visible():
+                    return element
+            except:
+                continue
+        return None
+
     async def wait_for_processing_to_start(self, timeout: int = 10) -> bool:
         """Wait for the target to show signs of processing the prompt"""
         if not self.detected_platform:
@@ -164,14 +94,9 @@ class TargetCompletionDetector:
         start_time = asyncio.get_event_loop().time()
         while (asyncio.get_event_loop().time() - start_time) < timeout:
             # Check if any processing indicator is visible
-            for indicator in processing_indicators:
-                try:
-                    element = await self.page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        logger.info(f"Processing started - detected indicator: {indicator}")
-                        return True
-                except:
-                    continue
+            if await self._first_visible(selectors.get('processing_selector'), processing_indicators):
+                logger.info("Processing started - detected indicator")
+                return True
             
             await asyncio.sleep(0.5)
         
@@ -253,15 +178,9 @@ class TargetCompletionDetector:
         
         while asyncio.get_event_loop().time() < end_time:
             # Check if processing indicators are gone
-            all_processing_done = True
-            for indicator in processing_indicators:
-                try:
-                    element = await self.page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        all_processing_done = False
-                        break
-                except:
-                    continue
+            all_processing_done = not await self._first_visible(
+                selectors.get('processing_selector'), processing_indicators
+            )
             
             # Check if submit button is enabled
             if all_processing_done and submit_selector:
@@ -290,15 +209,9 @@ class TargetCompletionDetector:
         
         while asyncio.get_event_loop().time() < end_time:
             # Check if all processing indicators are gone
-            all_gone = True
-            for indicator in processing_indicators:
-                try:
-                    element = await self.page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        all_gone = False
-                        break
-                except:
-                    continue
+            all_gone = not await self._first_visible(
+                selectors.get('processing_selector'), processing_indicators
+            )
             
             if all_gone:
                 # Wait an additional 2 seconds to ensure completion
@@ -320,16 +233,14 @@ class TargetCompletionDetector:
         
         while asyncio.get_event_loop().time() < end_time:
             # Check for completion indicators
-            for indicator in completion_indicators:
+            if await self._first_visible(selectors.get('completion_selector'), completion_indicators):
                 try:
-                    element = await self.page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        # Additional check: wait for network idle
-                        await self.page.wait_for_load_state('networkidle', timeout=5000)
-                        logger.info("Generation complete indicator found - system ready")
-                        return True
+                    # Additional check: wait for network idle
+                    await self.page.wait_for_load_state('networkidle', timeout=5000)
+                    logger.info("Generation complete indicator found - system ready")
+                    return True
                 except:
-                    continue
+                    pass
             
             await asyncio.sleep(self.poll_interval)
         
@@ -363,15 +274,10 @@ class TargetCompletionDetector:
         end_time = asyncio.get_event_loop().time() + timeout
         
         while asyncio.get_event_loop().time() < end_time:
-            for indicator in completion_indicators:
-                try:
-                    element = await self.page.query_selector(indicator)
-                    if element and await element.is_visible():
-                        await asyncio.sleep(2)  # Buffer
-                        logger.info("Generic completion detected - system ready")
-                        return True
-                except:
-                    continue
+            if await self._first_visible(selectors.get('completion_selector'), completion_indicators):
+                await asyncio.sleep(2)  # Buffer
+                logger.info("Generic completion detected - system ready")
+                return True
             
             await asyncio.sleep(self.poll_interval)
         
@@ -0,0 +1,187 @@
+"""
+Token Budget - tokens-per-minute admission for Gemini requests
+
+Every request reserves its estimated tokens (prompt plus expected
+completion) from a bucket that refills at GEMINI_TOKENS_PER_MINUTE, and
+settles the reservation with the real usage once the response arrives.
+Waiting requests are admitted in order of a tag: the tokens admitted so far
+when they arrived plus their own cost. A small prompt is therefore not held
+behind a large one, and a large one still goes first once work as large as
+itself that arrived after it has been admitted, so neither starves. A rate-limit answer from the
+backend empties the bucket so queued work backs off instead of tripping
+the quota again.
+
+The budget is per process; divide the account quota between workers.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import logging
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Gemini tokens admitted per minute by this process; 0 disables the budget
+GEMINI_TOKENS_PER_MINUTE = int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '1000000'))
+
+
+@dataclass(order=True)
+class _Waiter:
+    tag: int
+    seq: int
+    cost: int = field(compare=False)
+    loop: Any = field(compare=False)
+    future: Any = field(compare=False)
+    granted: bool = field(default=False, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class TokenBudgetScheduler:
+    """Token bucket with fair, cost-ordered admission of waiting requests"""
+
+    def __init__(self, tokens_per_minute: int = GEMINI_TOKENS_PER_MINUTE):
+        self.tokens_per_minute = tokens_per_minute
+        self._available = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._admitted_tokens = 0  # Clock for the admission order tags
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup_at: Optional[float] = None
+        self._wakeup: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'queued': 0, 'throttled': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.tokens_per_minute > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._available = min(
+            float(self.tokens_per_minute),
+            self._available + (now - self._refilled_at) * self.tokens_per_minute / 60
+        )
+        self._refilled_at = now
+
+    async def acquire(self, tokens: int) -> int:
+        """
+        Wait until tokens can be spent without exceeding the budget
+
+        A reservation larger than the whole budget waits for a full bucket.
+        Returns the tokens actually reserved; pass them to settle() once the
+        real usage is known.
+        """
+        if not self.enabled:
+            return tokens
+        cost = min(max(1, tokens), self.tokens_per_minute)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._refill()
+            if not self._waiters and self._available >= cost:
+                self._admit(cost)
+                return cost
+            waiter = _Waiter(self._admitted_tokens + cost, next(self._seq), cost, loop, loop.create_future())
+            heapq.heappush(self._waiters, waiter)
+            self.stats['queued'] += 1
+        self._dispatch()
+
+        started = time.perf_counter()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._available += waiter.cost
+                else:
+                    waiter.cancelled = True
+            self._dispatch()
+            raise
+        metrics.GEMINI_BUDGET_WAIT_SECONDS.observe(time.perf_counter() - started)
+        return cost
+
+    def settle(self, reserved: int, used: int):
+        """Return an unused reservation to the bucket, or charge usage beyond it"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._available = min(float(self.tokens_per_minute), self._available + reserved - used)
+        self._dispatch()
+
+    def throttle(self):
+        """Empty the bucket after the backend reported a rate or quota limit"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._refill()
+            self._available = min(self._available, 0.0)
+            self.stats['throttled'] += 1
+        logger.warning("⏳ Gemini rate limited; holding queued requests until the token budget refills")
+
+    def _admit(self, cost: int):
+        self._available -= cost
+        self._admitted_tokens += cost
+        self.stats['admitted'] += 1
+
+    def _dispatch(self):
+        """
+        Admit waiters in tag order while the head fits; schedule a wakeup for when it will
+
+        The wakeup runs on a timer thread rather than on a waiter's loop, so it
+        still fires when that waiter is cancelled or its loop has exited.
+        """
+        with self._lock:
+            self._refill()
+            while self._waiters:
+                head = self._waiters[0]
+                # Waiters of a loop that has shut down will never be awaited
+                if head.cancelled or head.loop.is_closed():
+                    heapq.heappop(self._waiters)
+                    continue
+                if head.cost > self._available:
+                    now = time.monotonic()
+                    delay = (head.cost - self._available) * 60 / self.tokens_per_minute
+                    if self._wakeup is None or self._wakeup_at > now + delay:
+                        if self._wakeup is not None:
+                            self._wakeup.cancel()
+                        self._wakeup_at = now + delay
+                        self._wakeup = threading.Timer(delay, self._wake)
+                        self._wakeup.daemon = True
+                        self._wakeup.start()
+                    break
+                heapq.heappop(self._waiters)
+                head.granted = True
+                self._admit(head.cost)
+                head.loop.call_soon_threadsafe(_resolve, head.future)
+
+    def _wake(self):
+        with self._lock:
+            self._wakeup = None
+            self._wakeup_at = None
+        self._dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {
+                'tokens_per_minute': self.tokens_per_minute,
+                'available_tokens': int(self._available),
+                'waiting': len(self._waiters),
+                **self.stats
+            }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+# Global token budget instance
+token_budget = TokenBudgetScheduler()
+metrics.GEMINI_BUDGET_AVAILABLE.track(lambda: token_budget.snapshot()['available_tokens'])
+metrics.GEMINI_BUDGET_WAITING.track(lambda: len(token_budget._waiters))
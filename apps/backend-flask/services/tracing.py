@@ -0,0 +1,141 @@
+"""
+Tracing - per-prompt span trees and a flight recorder of recent traces
+
+A trace is a tree of timed spans (navigation, input probing, the
+processing-start and completion waits, ...) built with the trace() and
+span() context managers. The current span is tracked in a context variable,
+so nested calls attach to it without passing it around, and concurrent
+asyncio tasks each build their own tree. Finished root traces go into a
+ring buffer, from which the slowest recent prompts can be pulled with their
+phase breakdown.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Finished traces kept by the flight recorder
+FLIGHT_RECORDER_SIZE = int(os.getenv('FLIGHT_RECORDER_SIZE', '200'))
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'attributes', 'parent', 'children', 'started', 'ended', 'started_at')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, **attributes):
+        self.name = name
+        self.attributes: Dict[str, Any] = attributes
+        self.parent = parent
+        self.children: List['Span'] = []
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.started_at = datetime.utcnow().isoformat() if parent is None else None
+
+    @property
+    def duration(self) -> float:
+        return (self.ended or time.perf_counter()) - self.started
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """Span tree with start offsets relative to this span (or origin), in ms"""
+        origin = self.started if origin is None else origin
+        data = {
+            'name': self.name,
+            'start_ms': round((self.started - origin) * 1000, 1),
+            'duration_ms': round(self.duration * 1000, 1),
+        }
+        if self.started_at:
+            data['started_at'] = self.started_at
+        if self.attributes:
+            data['attributes'] = dict(self.attributes)
+        if self.children:
+            data['children'] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+@contextmanager
+def _enter(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.attributes['error'] = str(e) or type(e).__name__
+        raise
+    finally:
+        span.ended = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Span]:
+    """
+    Start a trace, or a child span when a trace is already active
+
+    Root traces are handed to the flight recorder when they end.
+    """
+    parent = _current_span.get()
+    span = Span(name, parent, **attributes)
+    if parent is not None:
+        parent.children.append(span)
+    try:
+        with _enter(span):
+            yield span
+    finally:
+        if parent is None:
+            flight_recorder.record(span.to_dict())
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Time a phase of the active trace; a no-op (yielding None) outside one"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent, **attributes)
+    parent.children.append(child)
+    with _enter(child):
+        yield child
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+class FlightRecorder:
+    """Ring buffer of recently finished traces"""
+
+    def __init__(self, capacity: int = FLIGHT_RECORDER_SIZE):
+        self.capacity = max(1, capacity)
+        self._traces: Deque[Dict[str, Any]] = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, trace: Dict[str, Any]):
+        with self._lock:
+            self._traces.append(trace)
+            self.recorded += 1
+
+    def slowest(self, limit: int = 10, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The slowest buffered traces, optionally only those with a given root name"""
+        with self._lock:
+            traces = [t for t in self._traces if name is None or t['name'] == name]
+        return sorted(traces, key=lambda t: t['duration_ms'], reverse=True)[:max(0, limit)]
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'capacity': self.capacity, 'buffered': len(self._traces), 'recorded': self.recorded}
+
+
+# Global flight recorder instance
+flight_recorder = FlightRecorder()
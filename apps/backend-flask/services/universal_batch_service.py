@@ -1,13 +1,25 @@
 import asyncio
 import logging
+import os
+import socket
+from datetime import datetime
 from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass
-from playwright_service import PlaywrightService
-from enhanced_orchestrator_service import EnhancedOrchestratorService
-from human_approval_service import HumanApprovalService
+from dataclasses import dataclass, asdict, fields
+from services.playwright_service import PlaywrightService
+from services.platform_profiles import platform_profiles
+from services.platform_registry import platform_registry
+from services.human_approval_service import ApprovalStatus, human_approval_service
+from services.job_store import job_store
+from services import metrics
 
 logger = logging.getLogger(__name__)
 
+# Queued prompts read per job store query while a batch runs
+PROMPT_FETCH_SIZE = 50
+
+# Persisted statuses a batch can be resumed from once its task is gone
+RESUMABLE_STATUSES = ('running', 'paused', 'failed')
+
 @dataclass
 class BatchRequest:
     """Universal batch processing request"""
@@ -32,16 +44,17 @@ class BatchProgress:
     progress_percentage: float
     current_action: str
     last_updated: str
+    created_at: Optional[str] = None
 
 class UniversalBatchService:
     """Universal batch processing service for all AI chatbot platforms"""
     
     def __init__(self):
         self.playwright_service = PlaywrightService()
-        self.orchestrator = EnhancedOrchestratorService()
-        self.approval_service = HumanApprovalService()
+        self.approval_service = human_approval_service
         self.active_batches: Dict[str, Dict] = {}
         self.batch_progress: Dict[str, BatchProgress] = {}
+        metrics.QUEUE_DEPTH.track(self.queue_depth, service='universal')
         
     async def initialize(self):
         """Initialize all services"""
@@ -49,13 +62,16 @@ class UniversalBatchService:
         logger.info("Universal Batch Service initialized")
         
     async def detect_platform(self, url: str) -> Dict[str, Any]:
-        """Detect the platform type and chat interface"""
+        """
+        Detect the platform type and chat interface
+        
+        Known hosts and hosts probed within PLATFORM_PROFILE_TTL are answered
+        without a browser; anything else is loaded once and probed.
+        """
         try:
-            await self.playwright_service.navigate_and_submit(url, "", None)
-            
-            # Platform detection logic
-            page_title = await self.playwright_service.page.title()
-            page_url = url.lower()
+            profile = platform_profiles.lookup(url)
+            if profile is None:
+                profile = await self.playwright_service.probe_platform(url)
             
             platform_info = {
                 'platform': 'unknown',
@@ -64,47 +80,17 @@ class UniversalBatchService:
                 'submit_methods': []
             }
             
-            # ChatGPT detection
-            if 'openai' in page_url or 'chatgpt' in page_url or 'chat.openai' in page_url:
-                platform_info.update({
-                    'platform': 'chatgpt',
-                    'confidence': 0.95,
-                    'chat_selectors': ['#prompt-textarea', 'textarea[data-id]', '[data-testid="textbox"]'],
-                    'submit_methods': ['Enter', 'button[data-testid="send-button"]']
-                })
+            signature = platform_registry.get(profile['platform'])
+            if signature and 'report' in signature:
+                platform_info.update(signature['report'])
+                platform_info['confidence'] = 0.95 if profile['source'] == 'url' else 0.85
             
-            # Claude detection
-            elif 'anthropic' in page_url or 'claude' in page_url:
-                platform_info.update({
-                    'platform': 'claude',
-                    'confidence': 0.95,
-                    'chat_selectors': ['div[contenteditable="true"]', 'textarea'],
-                    'submit_methods': ['Enter', 'button[type="submit"]']
-                })
-            
-            # Lovable detection
-            elif 'lovable' in page_url or 'lovableproject' in page_url:
-                platform_info.update({
-                    'platform': 'lovable',
-                    'confidence': 0.95,
-                    'chat_selectors': ['textarea[placeholder*="Message"]', 'textarea[placeholder*="Chat"]'],
-                    'submit_methods': ['Enter', '.send-button']
-                })
-            
-            # Generic detection for other platforms
-            else:
-                # Look for common chat elements
-                chat_elements = await self.playwright_service.page.query_selector_all(
-                    'textarea, input[type="text"], div[contenteditable="true"]'
-                )
-                if chat_elements:
-                    platform_info.update({
-                        'platform': 'generic-chat',
-                        'confidence': 0.7,
-                        'chat_selectors': ['textarea', 'input[type="text"]', 'div[contenteditable="true"]'],
-                        'submit_methods': ['Enter', 'button[type="submit"]']
-                    })
+            # Generic detection for other platforms with a chat input
+            elif profile['has_chat_input']:
+                platform_info.update(platform_registry.generic()['report'])
+                platform_info['confidence'] = 0.7
             
+            platform_info['detected_from'] = profile['source']
             return platform_info
             
         except Exception as e:
@@ -130,24 +116,25 @@ class UniversalBatchService:
                 failed_prompts=0,
                 progress_percentage=0.0,
                 current_action='Starting batch processing',
-                last_updated=str(asyncio.get_event_loop().time())
+                last_updated=str(asyncio.get_event_loop().time()),
+                created_at=datetime.utcnow().isoformat()
             )
             
             # Store batch info
-            self.active_batches[batch_id] = {
-                'request': batch_request,
-                'task': None,
-                'cancelled': False
-            }
+            self._register(batch_request, next_index=0)
+            
+            # Prompts go to the durable queue so a restart can continue from the
+            # checkpoint; rows of an earlier batch with this id are dropped
+            job_store.append_prompts(batch_id, 0, batch_request.prompts, replace=True)
             
             # Detect platform if not specified
             if batch_request.platform_type == 'auto-detect':
                 platform_info = await self.detect_platform(batch_request.target_url)
                 batch_request.platform_type = platform_info['platform']
+            self._save_progress(batch_id, sync=True)
             
             # Start processing task
-            task = asyncio.create_task(self._process_batch(batch_request))
-            self.active_batches[batch_id]['task'] = task
+            self._launch(batch_request, 0)
             
             return {
                 'success': True,
@@ -163,9 +150,61 @@ class UniversalBatchService:
                 'error': str(e)
             }
     
-    async def _process_batch(self, batch_request: BatchRequest):
-        """Internal batch processing logic"""
+    def _register(self, batch_request: BatchRequest, next_index: int):
+        resume_event = asyncio.Event()
+        resume_event.set()
+        self.active_batches[batch_request.batch_id] = {
+            'request': batch_request,
+            'task': None,
+            'cancelled': False,
+            # Cleared while paused; the batch waits on it at prompt boundaries
+            'resume_event': resume_event,
+            'next_index': next_index
+        }
+    
+    def _launch(self, batch_request: BatchRequest, start_index: int):
+        task = asyncio.create_task(self._process_batch(batch_request, start_index))
+        self.active_batches[batch_request.batch_id]['task'] = task
+    
+    async def _queued_prompts(self, batch_id: str, start_index: int):
+        """Yield the batch's prompts from the durable queue, from start_index on"""
+        position = start_index
+        while True:
+            queued = job_store.next_prompts(batch_id, position, PROMPT_FETCH_SIZE)
+            if not queued:
+                return
+            for prompt in queued:
+                yield prompt
+            position = queued[-1]['position'] + 1
+    
+    async def _wait_while_paused(self, batch_id: str) -> bool:
+        """Hold the batch at a prompt boundary while paused; False once cancelled"""
+        batch = self.active_batches[batch_id]
+        if not batch['resume_event'].is_set():
+            progress = self.batch_progress[batch_id]
+            progress.current_action = f"Paused before prompt {batch['next_index'] + 1}"
+            self._save_progress(batch_id, sync=True)
+            await batch['resume_event'].wait()
+        return not batch['cancelled']
+    
+    def _checkpoint(self, batch_id: str, position: int, status: str, record: Dict[str, Any]):
+        """Record a finished prompt and move the resume point past it"""
+        job_store.complete_prompt(batch_id, position, status, record)
+        self.active_batches[batch_id]['next_index'] = position + 1
+        progress = self.batch_progress[batch_id]
+        progress.progress_percentage = ((position + 1) / progress.total_prompts) * 100
+        self._save_progress(batch_id, sync=True)
+    
+    async def _process_batch(self, batch_request: BatchRequest, start_index: int = 0):
+        """
+        Internal batch processing logic
+        
+        Pause and cancel take effect between prompts. Every finished prompt is
+        checkpointed, so a resumed batch starts after the last one done.
+        """
         batch_id = batch_request.batch_id
+        batch = self.active_batches[batch_id]
+        progress = self.batch_progress[batch_id]
         
         try:
             # Navigate to target URL
@@ -173,13 +212,19 @@ class UniversalBatchService:
                 batch_request.target_url, "", None
             )
             
-            for i, prompt in enumerate(batch_request.prompts):
-                if self.active_batches[batch_id]['cancelled']:
+            async for prompt in self._queued_prompts(batch_id, start_index):
+                i = prompt['position']
+                if not await self._wait_while_paused(batch_id):
                     break
+                if prompt['status'] != 'pending':
+                    # Finished before a restart
+                    batch['next_index'] = i + 1
+                    continue
                 
                 # Update progress
-                self.batch_progress[batch_id].current_prompt = i
-                self.batch_progress[batch_id].current_action = f"Processing prompt {i+1}"
+                progress.current_prompt = i
+                progress.current_action = f"Processing prompt {i+1}"
+                self._save_progress(batch_id)
                 
                 try:
                     # Check if human approval needed
@@ -187,10 +232,24 @@ class UniversalBatchService:
                         confidence = prompt.get('confidence', 0.5)
                         if confidence < batch_request.confidence_threshold:
                             # Request human approval
-                            approval_result = await self.approval_service.request_approval(
-                                batch_id, f"prompt_{i}", prompt['text']
+                            approval_request = await self.approval_service.request_approval(
+                                task_id=f"{batch_id}-prompt-{i}",
+                                agent_id='universal-batch',
+                                action_type='submit_prompt',
+                                description=f"Submit prompt {i + 1}: {prompt['text'][:100]}...",
+                                context={
+                                    'batch_id': batch_id,
+                                    'position': i,
+                                    'prompt': prompt['text'],
+                                    'target_url': batch_request.target_url
+                                },
+                                confidence=confidence
                             )
-                            if not approval_result.get('approved'):
+                            progress.current_action = f"Waiting for approval of prompt {i+1}"
+                            self._save_progress(batch_id)
+                            approval = await self.approval_service.wait_for_approval(approval_request.id)
+                            if approval.status != ApprovalStatus.APPROVED:
+                                self._checkpoint(batch_id, i, 'skipped', {'reason': f"not approved: {approval.status.value}"})
                                 continue
                     
                     # Submit prompt
@@ -199,61 +258,124 @@ class UniversalBatchService:
                     )
                     
                     if result.get('success'):
-                        self.batch_progress[batch_id].completed_prompts += 1
+                        progress.completed_prompts += 1
+                        self._checkpoint(batch_id, i, 'completed', {'platform': result.get('platform'), 'trace': result.get('trace')})
                     else:
-                        self.batch_progress[batch_id].failed_prompts += 1
-                        
-                    # Update progress percentage
-                    progress = ((i + 1) / len(batch_request.prompts)) * 100
-                    self.batch_progress[batch_id].progress_percentage = progress
+                        progress.failed_prompts += 1
+                        self._checkpoint(batch_id, i, 'failed', {'error': result.get('error'), 'trace': result.get('trace')})
                     
                     # Delay between prompts
                     await asyncio.sleep(2)
                     
                 except Exception as prompt_error:
                     logger.error(f"Prompt {i} failed: {str(prompt_error)}")
-                    self.batch_progress[batch_id].failed_prompts += 1
+                    progress.failed_prompts += 1
+                    self._checkpoint(batch_id, i, 'failed', {'error': str(prompt_error)})
             
             # Mark as completed
-            self.batch_progress[batch_id].status = 'completed'
-            self.batch_progress[batch_id].current_action = 'Batch completed'
+            if not batch['cancelled']:
+                progress.status = 'completed'
+                progress.current_action = 'Batch completed'
+                self._save_progress(batch_id, sync=True)
             
         except Exception as e:
             logger.error(f"Batch processing failed: {str(e)}")
-            self.batch_progress[batch_id].status = 'failed'
-            self.batch_progress[batch_id].current_action = f'Failed: {str(e)}'
+            progress.status = 'failed'
+            progress.current_action = f'Failed: {str(e)}'
+            self._save_progress(batch_id, sync=True)
         
         finally:
-            # Cleanup
+            # Cleanup; finished progress is served from the job store from now on
+            if batch_id in self.batch_progress:
+                self._save_progress(batch_id, sync=True)
+                del self.batch_progress[batch_id]
             if batch_id in self.active_batches:
                 del self.active_batches[batch_id]
     
     async def pause_batch(self, batch_id: str) -> Dict[str, Any]:
-        """Pause an active batch"""
+        """Pause an active batch once the prompt in flight finishes"""
         if batch_id not in self.active_batches:
             return {'success': False, 'error': 'Batch not found'}
         
+        if self.batch_progress[batch_id].status != 'running':
+            return {'success': False, 'error': f"Batch is {self.batch_progress[batch_id].status}"}
+        
+        self.active_batches[batch_id]['resume_event'].clear()
         self.batch_progress[batch_id].status = 'paused'
+        self._save_progress(batch_id, sync=True)
         return {'success': True, 'status': 'paused'}
     
-    async def resume_batch(self, batch_id: str) -> Dict[str, Any]:
-        """Resume a paused batch"""
+    async def resume_batch(self, batch_id: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Resume a paused batch
+        
+        Batches whose process stopped (restart or crash) are restarted from
+        their checkpoint. A batch still marked running by a process on another
+        host is only taken over with force=True.
+        """
         if batch_id not in self.batch_progress:
-            return {'success': False, 'error': 'Batch not found'}
+            return self._resume_from_checkpoint(batch_id, force)
         
         if self.batch_progress[batch_id].status == 'paused':
             self.batch_progress[batch_id].status = 'running'
+            self.active_batches[batch_id]['resume_event'].set()
+            self._save_progress(batch_id, sync=True)
             return {'success': True, 'status': 'resumed'}
         
         return {'success': False, 'error': 'Batch is not paused'}
     
+    @staticmethod
+    def _owner_alive(owner: Optional[Dict[str, Any]]) -> bool:
+        """Whether the process recorded as running a batch may still be running it"""
+        if not owner:
+            return False
+        if owner.get('host') != socket.gethostname():
+            # Cannot check processes on other hosts
+            return True
+        if owner.get('pid') == os.getpid():
+            # Not in this process's active batches, so its task is gone
+            return False
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    
+    def _resume_from_checkpoint(self, batch_id: str, force: bool) -> Dict[str, Any]:
+        record = job_store.get_batch(batch_id)
+        checkpoint = (record or {}).get('checkpoint')
+        if not checkpoint:
+            return {'success': False, 'error': 'Batch not found'}
+        
+        status = record.get('status')
+        if status not in RESUMABLE_STATUSES:
+            return {'success': False, 'error': f'Batch is {status}'}
+        if status == 'running' and not force and self._owner_alive(checkpoint.get('owner')):
+            return {'success': False, 'error': 'Batch is still running in another worker'}
+        
+        next_index = checkpoint['next_index']
+        batch_request = BatchRequest(batch_id=batch_id, prompts=[], **checkpoint['request'])
+        progress = self._progress_from_record(record)
+        progress.status = 'running'
+        progress.current_action = f'Resuming from prompt {next_index + 1}'
+        self.batch_progress[batch_id] = progress
+        self._register(batch_request, next_index)
+        self._save_progress(batch_id, sync=True)
+        self._launch(batch_request, next_index)
+        
+        logger.info(f"Resuming batch {batch_id} from prompt {next_index + 1}/{progress.total_prompts}")
+        return {'success': True, 'status': 'resumed', 'resumed_from': next_index}
+    
     async def cancel_batch(self, batch_id: str) -> Dict[str, Any]:
         """Cancel an active batch"""
         if batch_id not in self.active_batches:
             return {'success': False, 'error': 'Batch not found'}
         
-        # Mark as cancelled
+        # Mark as cancelled and release a paused batch so it can exit
         self.active_batches[batch_id]['cancelled'] = True
+        self.active_batches[batch_id]['resume_event'].set()
         
         # Cancel the task
         task = self.active_batches[batch_id].get('task')
@@ -263,17 +385,52 @@ class UniversalBatchService:
         # Update progress
         self.batch_progress[batch_id].status = 'cancelled'
         self.batch_progress[batch_id].current_action = 'Batch cancelled by user'
+        self._save_progress(batch_id, sync=True)
         
         return {'success': True, 'status': 'cancelled'}
     
+    def _save_progress(self, batch_id: str, sync: bool = False):
+        """Write batch progress to the shared job store"""
+        record = asdict(self.batch_progress[batch_id])
+        if batch_id in self.active_batches:
+            batch = self.active_batches[batch_id]
+            request = asdict(batch['request'])
+            del request['batch_id'], request['prompts']
+            record['batch_name'] = request['batch_name']
+            # Everything needed to resume; the prompts themselves are in the job store queue
+            record['checkpoint'] = {
+                'next_index': batch['next_index'],
+                'request': request,
+                'owner': {'host': socket.gethostname(), 'pid': os.getpid()}
+            }
+        job_store.save_batch('universal', batch_id, record, sync=sync)
+    
+    @staticmethod
+    def _progress_from_record(record: Dict[str, Any]) -> BatchProgress:
+        names = {f.name for f in fields(BatchProgress)}
+        return BatchProgress(**{k: v for k, v in record.items() if k in names})
+    
     def get_batch_status(self, batch_id: str) -> Optional[BatchProgress]:
         """Get current status of a batch"""
-        return self.batch_progress.get(batch_id)
+        if batch_id in self.batch_progress:
+            return self.batch_progress[batch_id]
+        
+        # Batches started by other workers or before a restart
+        record = job_store.get_batch(batch_id)
+        return self._progress_from_record(record) if record else None
     
     def get_all_batches(self) -> Dict[str, BatchProgress]:
-        """Get status of all batches"""
+        """Get status of all in-flight batches in this process"""
         return self.batch_progress.copy()
     
+    def queue_depth(self) -> int:
+        """Prompts not yet finished across running and paused batches"""
+        return sum(
+            p.total_prompts - p.completed_prompts - p.failed_prompts
+            for p in list(self.batch_progress.values())
+            if p.status in ('running', 'paused')
+        )
+    
     async def cleanup(self):
         """Cleanup all resources"""
         # Cancel all active batches
@@ -0,0 +1,320 @@
+"""
+Worker Pool - runs batch prompts across several processes, one browser each
+
+A single process can only drive one page at a time, and CPU-heavy work in
+the Python side of Playwright (screenshots, DOM polling) is serialized by
+the GIL. The pool spawns N worker processes; each owns its own runner (by
+default a Playwright browser) and asks the supervisor for work whenever it
+is idle. Results and progress come back over a pipe per worker (a shared
+multiprocessing.Queue can deadlock every writer if one dies holding its
+lock). If a worker dies, its in-flight prompt is re-queued and the worker
+restarted.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RUNNER = 'services.worker_pool:PlaywrightPromptRunner'
+
+# Times a prompt is re-queued after crashing its worker before it is failed
+MAX_REQUEUES = 2
+
+# Consecutive restarts (without a finished prompt) before a worker slot is abandoned
+MAX_RESTARTS = 5
+
+# Seconds to wait for worker events before re-checking should_stop
+EVENT_POLL_INTERVAL = 0.2
+
+# Seconds workers get to close their browsers on shutdown
+SHUTDOWN_TIMEOUT = 10.0
+
+EventCallback = Callable[[str, int, Dict[str, Any]], Awaitable[None]]
+
+
+def worker_count(requested: Optional[int] = None) -> int:
+    """
+    Worker processes for a batch: the requested number, else BATCH_WORKERS,
+    capped at the number of CPUs
+    """
+    count = requested or int(os.getenv('BATCH_WORKERS', '1'))
+    return max(1, min(int(count), os.cpu_count() or 1))
+
+
+class PlaywrightPromptRunner:
+    """Submits prompts through a PlaywrightService owned by one worker process"""
+
+    async def start(self, target_url: str, options: Dict[str, Any]):
+        # Imported here so the pool itself does not require Playwright
+        from services.playwright_service import PlaywrightService
+
+        self.target_url = target_url
+        self.wait_for_completion = options.get('wait_for_completion', True)
+        self.max_retries = options.get('max_retries', 3)
+        self.playwright_service = PlaywrightService(account=options.get('account'))
+        await self.playwright_service.use_session(target_url)
+        await self.playwright_service.page.goto(target_url, wait_until='networkidle')
+
+    async def submit(self, prompt: Dict[str, Any]) -> Dict[str, Any]:
+        from services.retry_policy import submit_with_retries
+
+        return await submit_with_retries(
+            lambda: self.playwright_service.navigate_and_submit(
+                url=self.target_url,
+                prompt=prompt.get('text', ''),
+                wait_for_completion=self.wait_for_completion
+            ),
+            self.target_url,
+            self.max_retries,
+            restart_browser=self.playwright_service.cleanup
+        )
+
+    async def close(self):
+        await self.playwright_service.cleanup()
+
+
+def _load_runner(path: str):
+    module_name, _, class_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+async def _worker_loop(worker_id: int, runner_path: str, target_url: str, options: Dict[str, Any], inbox, events):
+    runner = _load_runner(runner_path)
+    await runner.start(target_url, options)
+    loop = asyncio.get_running_loop()
+    try:
+        events.send(('ready', None, None))
+        while True:
+            item = await loop.run_in_executor(None, inbox.recv)
+            if item is None:
+                break
+            position, prompt = item
+            events.send(('started', position, None))
+            started = time.monotonic()
+            record = {
+                'prompt_id': prompt.get('id', f'prompt_{position}'),
+                'prompt_text': prompt.get('text', ''),
+                **await runner.submit(prompt)
+            }
+            record['worker_id'] = worker_id
+            record['duration_seconds'] = time.monotonic() - started
+            events.send(('result', position, record))
+            events.send(('ready', None, None))
+    finally:
+        await runner.close()
+
+
+def _worker_main(worker_id: int, runner_path: str, target_url: str, options: Dict[str, Any], inbox, events):
+    """Process entry point; runs one worker until it receives a None sentinel"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - worker-{worker_id} - %(levelname)s - %(message)s')
+    asyncio.run(_worker_loop(worker_id, runner_path, target_url, options, inbox, events))
+
+
+class WorkerPool:
+    """
+    Supervises worker processes for one batch run
+
+    Workers announce 'ready' when idle and are handed exactly one prompt at a
+    time, so the supervisor always knows which prompt each worker holds.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        target_url: str,
+        options: Optional[Dict[str, Any]] = None,
+        runner: str = DEFAULT_RUNNER,
+        max_requeues: int = MAX_REQUEUES
+    ):
+        self.size = max(1, size)
+        self.target_url = target_url
+        self.options = options or {}
+        self.runner = runner
+        self.max_requeues = max_requeues
+        # Browsers and threads do not survive fork, so always spawn
+        self._ctx = multiprocessing.get_context('spawn')
+        self._processes: Dict[int, Any] = {}
+        self._inboxes: Dict[int, Any] = {}
+        self._events: Dict[int, Any] = {}
+        self._in_flight: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        self._idle: Deque[int] = deque()
+        self._retry: Deque[Tuple[int, Dict[str, Any]]] = deque()
+        self._requeues: Dict[int, int] = {}
+        self._restarts: Dict[int, int] = {}
+        self.stats = {'dispatched': 0, 'completed': 0, 'failed': 0, 'requeued': 0, 'restarts': 0}
+
+    def _start_worker(self, worker_id: int):
+        inbox_reader, inbox_writer = self._ctx.Pipe(duplex=False)
+        events_reader, events_writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.runner, self.target_url, self.options, inbox_reader, events_writer),
+            name=f'batch-worker-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        # Close the child's ends here so a dead worker shows up as EOF
+        inbox_reader.close()
+        events_writer.close()
+        self._processes[worker_id] = process
+        self._inboxes[worker_id] = inbox_writer
+        self._events[worker_id] = events_reader
+
+    def _wait(self) -> List[Any]:
+        """Block until a worker sends an event or exits, or the poll interval passes"""
+        handles = list(self._events.values()) + [p.sentinel for p in self._processes.values()]
+        return wait(handles, timeout=EVENT_POLL_INTERVAL)
+
+    def _drain(self, worker_id: int) -> List[Tuple[str, Optional[int], Optional[Dict[str, Any]]]]:
+        """Read every event a worker has sent so far"""
+        events = []
+        conn = self._events[worker_id]
+        try:
+            while conn.poll():
+                events.append(conn.recv())
+        except (EOFError, OSError):
+            pass
+        return events
+
+    async def _handle(self, worker_id: int, event: Tuple[str, Optional[int], Optional[Dict[str, Any]]], on_event: EventCallback):
+        kind, position, record = event
+        if kind == 'ready':
+            if worker_id not in self._idle and worker_id not in self._in_flight:
+                self._idle.append(worker_id)
+        elif kind == 'started':
+            await on_event('started', position, {'worker_id': worker_id})
+        elif kind == 'result':
+            self._in_flight.pop(worker_id, None)
+            self._restarts[worker_id] = 0
+            self.stats['completed' if record['status'] == 'completed' else 'failed'] += 1
+            await on_event('result', position, record)
+
+    async def _check_workers(self, on_event: EventCallback):
+        """Restart dead workers and re-queue (or fail) the prompt each was holding"""
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+
+            # Anything the worker sent before dying still counts
+            for event in self._drain(worker_id):
+                await self._handle(worker_id, event, on_event)
+
+            logger.warning(f"Batch worker {worker_id} exited with code {process.exitcode}")
+            if worker_id in self._idle:
+                self._idle.remove(worker_id)
+
+            held = self._in_flight.pop(worker_id, None)
+            if held:
+                position, prompt = held
+                attempts = self._requeues.get(position, 0) + 1
+                self._requeues[position] = attempts
+                if attempts > self.max_requeues:
+                    self.stats['failed'] += 1
+                    await on_event('result', position, {
+                        'prompt_id': prompt.get('id', f'prompt_{position}'),
+                        'prompt_text': prompt.get('text', ''),
+                        'status': 'failed',
+                        'error': f'Worker crashed {attempts} times on this prompt',
+                        'retry_count': attempts
+                    })
+                else:
+                    self.stats['requeued'] += 1
+                    self._retry.appendleft(held)
+
+            restarts = self._restarts.get(worker_id, 0) + 1
+            self._restarts[worker_id] = restarts
+            del self._processes[worker_id]
+            self._inboxes.pop(worker_id).close()
+            self._events.pop(worker_id).close()
+            if restarts > MAX_RESTARTS:
+                logger.error(f"Batch worker {worker_id} exceeded {MAX_RESTARTS} restarts; not restarting")
+                continue
+            self.stats['restarts'] += 1
+            self._start_worker(worker_id)
+
+        if not self._processes:
+            raise RuntimeError('All batch workers failed')
+
+    async def run(
+        self,
+        source: AsyncIterator[Tuple[int, Dict[str, Any]]],
+        on_event: EventCallback,
+        should_stop: Callable[[], bool] = lambda: False
+    ) -> Dict[str, Any]:
+        """
+        Dispatch prompts from source until it is exhausted and all results are in
+
+        Args:
+            source: Async iterator of (position, prompt) pairs
+            on_event: Awaited with ('started' | 'result', position, record)
+            should_stop: Checked before each dispatch; stops handing out work
+
+        Returns:
+            Pool statistics
+        """
+        loop = asyncio.get_running_loop()
+        source = source.__aiter__()
+        exhausted = False
+
+        for worker_id in range(self.size):
+            self._start_worker(worker_id)
+
+        try:
+            while True:
+                stopping = should_stop()
+
+                # Hand work to idle workers
+                while self._idle and not stopping:
+                    if self._retry:
+                        item = self._retry.popleft()
+                    elif not exhausted:
+                        try:
+                            item = await source.__anext__()
+                        except StopAsyncIteration:
+                            exhausted = True
+                            continue
+                    else:
+                        break
+                    worker_id = self._idle.popleft()
+                    self._in_flight[worker_id] = item
+                    self.stats['dispatched'] += 1
+                    try:
+                        self._inboxes[worker_id].send(item)
+                    except OSError:
+                        # Worker died while idle; _check_workers re-queues the prompt
+                        pass
+
+                if not self._in_flight and (stopping or (exhausted and not self._retry)):
+                    break
+
+                await loop.run_in_executor(None, self._wait)
+                for worker_id in list(self._events):
+                    for event in self._drain(worker_id):
+                        await self._handle(worker_id, event, on_event)
+                await self._check_workers(on_event)
+        finally:
+            await loop.run_in_executor(None, self._shutdown)
+
+        return {**self.stats, 'workers': self.size}
+
+    def _shutdown(self):
+        """Ask workers to exit, then terminate any that do not"""
+        for worker_id, process in self._processes.items():
+            if process.is_alive():
+                try:
+                    self._inboxes[worker_id].send(None)
+                except OSError:
+                    pass
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
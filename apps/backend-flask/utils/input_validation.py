@@ -4,6 +4,7 @@ Prevents prompt injection, XSS, and other injection attacks
 """
 import re
 import html
+from functools import lru_cache
 from typing import Dict, List, Tuple, Any
 from urllib.parse import urlparse
 import logging
@@ -35,12 +36,60 @@ DANGEROUS_PATTERNS = [
     (r'UPDATE\s+.*\s+SET', 'SQL update command'),
 ]
 
+# Lowercase literals that every match of the pattern at the same index must
+# contain. Python's re has no multi-pattern automaton and case-insensitive
+# patterns defeat its literal prefix search, so text is case-folded once and
+# checked with substring searches; only patterns whose literals are all
+# present are confirmed with the compiled regex.
+DANGEROUS_PATTERN_LITERALS = [
+    ('import', 'os'),
+    ('import', 'subprocess'),
+    ('eval', '('),
+    ('exec', '('),
+    ('__import__',),
+    ('<script', '>'),
+    ('javascript:',),
+    ('onerror', '='),
+    ('onclick', '='),
+    ('onload', '='),
+    ('<iframe',),
+    ('document.cookie',),
+    ('localstorage',),
+    ('sessionstorage',),
+    ('xmlhttprequest',),
+    ('fetch', '('),
+    ('.system', '('),
+    ('rm', '-rf'),
+    ('drop', 'table'),
+    ('delete', 'from'),
+    ('update', 'set'),
+]
+
+_THREAT_RULES = [
+    (literals, re.compile(pattern, re.IGNORECASE | re.MULTILINE), description)
+    for (pattern, description), literals in zip(DANGEROUS_PATTERNS, DANGEROUS_PATTERN_LITERALS)
+]
+
+# Non-ASCII characters that re.IGNORECASE matches to an ASCII letter but
+# str.lower() does not map to it
+_ASCII_CASE_FOLDS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's'})
+
+# Substrings that make sanitization do anything beyond trimming
+_SANITIZE_TRIGGERS = ('&', '<', '>', '"', "'", '\x00', '\t', '  ')
+_SANITIZE_TOKENS = re.compile(r'[&<>"\']|[ \t\x00]+')
+_HTML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'}
+
+# Prompts are often validated and sanitized more than once per request
+TEXT_CACHE_SIZE = 1024
+
 # Maximum lengths for different input types
 MAX_BATCH_NAME_LENGTH = 200
 MAX_PROMPT_LENGTH = 5000
 MAX_DESCRIPTION_LENGTH = 1000
 MAX_URL_LENGTH = 2048
 MAX_PROMPTS_PER_BATCH = 100
+MAX_PROMPTS_PER_STREAMED_BATCH = 100_000
+MAX_STREAM_LINE_BYTES = 64 * 1024
 
 # Allowed URL schemes
 ALLOWED_URL_SCHEMES = ['http', 'https']
@@ -58,6 +107,39 @@ class ValidationError(Exception):
     """Custom exception for validation errors"""
     pass
 
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def scan_threats(text: str) -> Tuple[str, ...]:
+    """
+    Find every dangerous pattern in text
+    
+    Args:
+        text: Raw prompt text
+        
+    Returns:
+        Descriptions of matching DANGEROUS_PATTERNS, in list order
+    """
+    folded = text if text.isascii() else text.translate(_ASCII_CASE_FOLDS)
+    folded = folded.lower()
+    return tuple(
+        description
+        for literals, pattern, description in _THREAT_RULES
+        if all(literal in folded for literal in literals) and pattern.search(text)
+    )
+
+def _sanitize_token(match: re.Match) -> str:
+    token = match.group()
+    escaped = _HTML_ESCAPES.get(token)
+    if escaped is not None:
+        return escaped
+    # Whitespace run, possibly interleaved with null bytes
+    return ' ' if token.strip('\x00') else ''
+
+@lru_cache(maxsize=TEXT_CACHE_SIZE)
+def _sanitize_text(text: str) -> str:
+    if any(trigger in text for trigger in _SANITIZE_TRIGGERS):
+        text = _SANITIZE_TOKENS.sub(_sanitize_token, text)
+    return text[:MAX_PROMPT_LENGTH].strip()
+
 class InputValidator:
     """Comprehensive input validation for batch processing"""
     
@@ -158,10 +240,10 @@ class InputValidator:
             return False, f"Prompt {index} exceeds maximum length of {MAX_PROMPT_LENGTH} characters"
         
         # Check for dangerous patterns
-        for pattern, description in DANGEROUS_PATTERNS:
-            if re.search(pattern, prompt_text, re.IGNORECASE | re.MULTILINE):
-                logger.warning(f"Dangerous pattern detected in prompt {index}: {description}")
-                return False, f"Prompt {index} contains dangerous pattern: {description}"
+        threats = scan_threats(prompt_text)
+        if threats:
+            logger.warning(f"Dangerous pattern detected in prompt {index}: {threats[0]}")
+            return False, f"Prompt {index} contains dangerous pattern: {threats[0]}"
         
         return True, ""
     
@@ -246,20 +328,9 @@ class InputValidator:
         Returns:
             Sanitized text
         """
-        # Escape HTML entities
-        sanitized = html.escape(text)
-        
-        # Remove null bytes
-        sanitized = sanitized.replace('\x00', '')
-        
-        # Normalize whitespace but preserve newlines
-        sanitized = re.sub(r'[ \t]+', ' ', sanitized)
-        
-        # Trim to max length
-        if len(sanitized) > MAX_PROMPT_LENGTH:
-            sanitized = sanitized[:MAX_PROMPT_LENGTH]
-        
-        return sanitized.strip()
+        # Escape HTML entities, remove null bytes and collapse spaces/tabs
+        # (preserving newlines) in one pass, then trim to max length
+        return _sanitize_text(text)
     
     @staticmethod
     def sanitize_batch_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -320,9 +391,9 @@ class InputValidator:
                 return False, f"Prompt exceeds maximum length of {MAX_PROMPT_LENGTH}"
             
             # Check for dangerous patterns
-            for pattern, description in DANGEROUS_PATTERNS:
-                if re.search(pattern, data['prompt'], re.IGNORECASE):
-                    return False, f"Prompt contains dangerous pattern: {description}"
+            threats = scan_threats(data['prompt'])
+            if threats:
+                return False, f"Prompt contains dangerous pattern: {threats[0]}"
         
         # Validate prompts array
         if 'prompts' in data:
@@ -342,8 +413,8 @@ class InputValidator:
                     return False, f"Prompt {i} exceeds maximum length"
                 
                 # Check for dangerous patterns
-                for pattern, description in DANGEROUS_PATTERNS:
-                    if re.search(pattern, prompt_text, re.IGNORECASE):
-                        return False, f"Prompt {i} contains dangerous pattern: {description}"
+                threats = scan_threats(prompt_text)
+                if threats:
+                    return False, f"Prompt {i} contains dangerous pattern: {threats[0]}"
         
         return True, ""
@@ -0,0 +1,83 @@
+"""
+Wire format helpers for the WebSocket protocol
+Supports compact JSON text frames and MessagePack binary frames
+"""
+import json
+from datetime import datetime, date
+from enum import Enum
+from typing import Any, Dict, Union
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+ENCODING_JSON = 'json'
+ENCODING_MSGPACK = 'msgpack'
+
+
+def available_encodings() -> list:
+    """List the encodings this process can produce"""
+    encodings = [ENCODING_JSON]
+    if msgpack is not None:
+        encodings.append(ENCODING_MSGPACK)
+    return encodings
+
+
+def negotiate_encoding(requested: Any) -> str:
+    """
+    Pick the wire encoding for a client
+
+    Accepts a single encoding name or a list in order of preference and falls
+    back to JSON when nothing requested is available.
+    """
+    if isinstance(requested, str):
+        requested = [requested]
+    if not isinstance(requested, list):
+        return ENCODING_JSON
+
+    supported = available_encodings()
+    for encoding in requested:
+        if isinstance(encoding, str) and encoding.lower() in supported:
+            return encoding.lower()
+    return ENCODING_JSON
+
+
+def _default(value: Any) -> Any:
+    """Serialize types the encoders don't handle natively"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def encode_message(message: Dict[str, Any], encoding: str = ENCODING_JSON) -> Union[str, bytes]:
+    """Encode a message as a text (JSON) or binary (MessagePack) frame payload"""
+    if encoding == ENCODING_MSGPACK and msgpack is not None:
+        return msgpack.packb(message, default=_default, use_bin_type=True)
+
+    if orjson is not None:
+        return orjson.dumps(message, default=_default).decode('utf-8')
+    return json.dumps(message, default=_default, separators=(',', ':'))
+
+
+def decode_message(payload: Union[str, bytes]) -> Dict[str, Any]:
+    """Decode an incoming frame; binary frames are MessagePack, text frames JSON"""
+    if isinstance(payload, (bytes, bytearray)):
+        if msgpack is None:
+            raise ValueError('Binary frames require msgpack')
+        return msgpack.unpackb(payload, raw=False)
+
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
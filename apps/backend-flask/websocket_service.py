@@ -4,28 +4,38 @@ WebSocket service for real-time communication
 import asyncio
 import json
 import logging
-from typing import Set, Dict, Any
+import time
+from typing import Set, Dict, Any, Union
 import websockets
 from websockets.server import WebSocketServerProtocol
 
+from services import metrics
+
+from utils.wire_format import (
+    ENCODING_JSON, available_encodings, negotiate_encoding, encode_message, decode_message
+)
+
 logger = logging.getLogger(__name__)
 
 class WebSocketService:
     def __init__(self):
         self.clients: Set[WebSocketServerProtocol] = set()
         self.client_subscriptions: Dict[WebSocketServerProtocol, Set[str]] = {}
+        self.client_encodings: Dict[WebSocketServerProtocol, str] = {}
         
     async def register_client(self, websocket: WebSocketServerProtocol):
         """Register a new WebSocket client"""
         self.clients.add(websocket)
         self.client_subscriptions[websocket] = set()
+        self.client_encodings[websocket] = ENCODING_JSON
         logger.info(f"WebSocket client registered. Total clients: {len(self.clients)}")
         
         # Send welcome message
         await self.send_to_client(websocket, {
             'type': 'connection_established',
             'message': 'Connected to AutoPromptr WebSocket service',
-            'client_id': id(websocket)
+            'client_id': id(websocket),
+            'encodings': available_encodings()
         })
     
     async def unregister_client(self, websocket: WebSocketServerProtocol):
@@ -33,12 +43,13 @@ class WebSocketService:
         self.clients.discard(websocket)
         if websocket in self.client_subscriptions:
             del self.client_subscriptions[websocket]
+        self.client_encodings.pop(websocket, None)
         logger.info(f"WebSocket client unregistered. Total clients: {len(self.clients)}")
     
-    async def handle_message(self, websocket: WebSocketServerProtocol, message: str):
-        """Handle incoming WebSocket message"""
+    async def handle_message(self, websocket: WebSocketServerProtocol, message: Union[str, bytes]):
+        """Handle incoming WebSocket message (JSON text or MessagePack binary frame)"""
         try:
-            data = json.loads(message)
+            data = decode_message(message)
             message_type = data.get('type')
             
             if message_type == 'subscribe':
@@ -56,6 +67,12 @@ class WebSocketService:
                 'type': 'error',
                 'message': 'Invalid JSON format'
             })
+        except ValueError as e:
+            logger.error(f"Invalid binary frame received from client: {str(e)}")
+            await self.send_to_client(websocket, {
+                'type': 'error',
+                'message': 'Invalid message format'
+            })
         except Exception as e:
             logger.error(f"Error handling WebSocket message: {str(e)}")
             await self.send_to_client(websocket, {
@@ -73,12 +90,18 @@ class WebSocketService:
         for channel in channels:
             self.client_subscriptions[websocket].add(channel)
         
+        # Clients may negotiate a binary encoding, e.g. {"encoding": ["msgpack", "json"]}
+        if 'encoding' in data:
+            self.client_encodings[websocket] = negotiate_encoding(data['encoding'])
+        encoding = self.client_encodings.get(websocket, ENCODING_JSON)
+        
         await self.send_to_client(websocket, {
             'type': 'subscription_confirmed',
-            'channels': list(self.client_subscriptions[websocket])
+            'channels': list(self.client_subscriptions[websocket]),
+            'encoding': encoding
         })
         
-        logger.info(f"Client subscribed to channels: {channels}")
+        logger.info(f"Client subscribed to channels: {channels} (encoding: {encoding})")
     
     async def handle_unsubscription(self, websocket: WebSocketServerProtocol, data: Dict[str, Any]):
         """Handle unsubscription request"""
@@ -98,7 +121,8 @@ class WebSocketService:
     async def send_to_client(self, websocket: WebSocketServerProtocol, message: Dict[str, Any]):
         """Send message to a specific client"""
         try:
-            await websocket.send(json.dumps(message))
+            encoding = self.client_encodings.get(websocket, ENCODING_JSON)
+            await websocket.send(encode_message(message, encoding))
         except websockets.exceptions.ConnectionClosed:
             await self.unregister_client(websocket)
         except Exception as e:
@@ -107,13 +131,19 @@ class WebSocketService:
     async def broadcast_to_channel(self, channel: str, message: Dict[str, Any]):
         """Broadcast message to all clients subscribed to a channel"""
         message['channel'] = channel
+        started = time.perf_counter()
         
         disconnected_clients = []
+        # Encode once per encoding rather than once per subscriber
+        frames: Dict[str, Union[str, bytes]] = {}
         
-        for websocket, subscriptions in self.client_subscriptions.items():
+        for websocket, subscriptions in list(self.client_subscriptions.items()):
             if channel in subscriptions:
                 try:
-                    await websocket.send(json.dumps(message))
+                    encoding = self.client_encodings.get(websocket, ENCODING_JSON)
+                    if encoding not in frames:
+                        frames[encoding] = encode_message(message, encoding)
+                    await websocket.send(frames[encoding])
                 except websockets.exceptions.ConnectionClosed:
                     disconnected_clients.append(websocket)
                 except Exception as e:
@@ -123,15 +153,21 @@ class WebSocketService:
         for websocket in disconnected_clients:
             await self.unregister_client(websocket)
         
+        metrics.WEBSOCKET_BROADCAST_SECONDS.observe(time.perf_counter() - started, scope='channel')
         logger.debug(f"Broadcasted message to channel '{channel}' to {len(self.client_subscriptions)} clients")
     
     async def broadcast_to_all(self, message: Dict[str, Any]):
         """Broadcast message to all connected clients"""
+        started = time.perf_counter()
         disconnected_clients = []
+        frames: Dict[str, Union[str, bytes]] = {}
         
-        for websocket in self.clients:
+        for websocket in list(self.clients):
             try:
-                await websocket.send(json.dumps(message))
+                encoding = self.client_encodings.get(websocket, ENCODING_JSON)
+                if encoding not in frames:
+                    frames[encoding] = encode_message(message, encoding)
+                await websocket.send(frames[encoding])
             except websockets.exceptions.ConnectionClosed:
                 disconnected_clients.append(websocket)
             except Exception as e:
@@ -141,6 +177,7 @@ class WebSocketService:
         for websocket in disconnected_clients:
             await self.unregister_client(websocket)
         
+        metrics.WEBSOCKET_BROADCAST_SECONDS.observe(time.perf_counter() - started, scope='all')
         logger.debug(f"Broadcasted message to all {len(self.clients)} clients")
     
     def get_stats(self) -> Dict[str, Any]:
@@ -150,10 +187,15 @@ class WebSocketService:
             for channel in subscriptions:
                 channel_stats[channel] = channel_stats.get(channel, 0) + 1
         
+        encoding_stats = {}
+        for encoding in self.client_encodings.values():
+            encoding_stats[encoding] = encoding_stats.get(encoding, 0) + 1
+        
         return {
             'total_clients': len(self.clients),
             'total_subscriptions': sum(len(subs) for subs in self.client_subscriptions.values()),
-            'channels': channel_stats
+            'channels': channel_stats,
+            'encodings': encoding_stats
         }
 
 # Global WebSocket service instance
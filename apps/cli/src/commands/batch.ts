@@ -175,7 +175,7 @@ batchCommand
   .option('-t, --tasks', 'Show individual task details')
   .action(async (jobId: string, options) => {
     try {
-      const status = await client.getBatchStatus(jobId);
+      const status = await client.getBatchStatus(jobId, Boolean(options.tasks));
       const job = status.job;
       const progress = status.progress;
       
@@ -243,7 +243,7 @@ batchCommand
   .option('-o, --output <file>', 'Output file path')
   .action(async (jobId: string, options) => {
     try {
-      const status = await client.getBatchStatus(jobId);
+      const status = await client.getBatchStatus(jobId, true);
       const job = status.job;
       
       const exportData = {
@@ -121,7 +121,8 @@ testCommand
             
             // Show results
             console.log('📋 Results:');
-            status.job.tasks.forEach((task, index) => {
+            const finalStatus = await client.getBatchStatus(batch.job_id, true);
+            finalStatus.job.tasks.forEach((task, index) => {
               console.log(`   ${index + 1}. ${task.status.toUpperCase()}`);
               console.log(`      Prompt: ${task.prompt}`);
               if (task.result) {
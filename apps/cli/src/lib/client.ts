@@ -53,8 +53,10 @@ export class AutoPromptClient {
     return response.data;
   }
 
-  async getBatchStatus(jobId: string) {
-    const response = await this.client.get(`/api/batches/${jobId}/status`);
+  async getBatchStatus(jobId: string, includeTasks = false) {
+    const response = await this.client.get(`/api/batches/${jobId}/status`, {
+      params: includeTasks ? { include_tasks: 1 } : undefined
+    });
     return response.data;
   }
 